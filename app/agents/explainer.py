@@ -5,41 +5,96 @@ from __future__ import annotations
 from app.audit.langsmith_tracing import traceable_fn
 from typing import Any, Dict, Optional
 import pandas as pd
+import pyarrow as pa
 
 from app.agents.llm_factory import get_llm
+from app.agents.result_profiler import format_profile, profile_result
 
-@traceable_fn("answer_explainer")
-def explain_answer(
+# results this small are cheaper to show verbatim than to describe
+INLINE_ROWS = 5
+
+
+def _templated(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """
+    Trivial results need no LLM call.
+    """
+    if df.empty:
+        return {
+            "summary": "No rows matched this question. The filters (time window, airport, metric) may be too narrow.",
+            "bullets": [],
+            "llm": False,
+        }
+    if df.shape == (1, 1):
+        col = df.columns[0]
+        value = df.iat[0, 0]
+        if isinstance(value, float):
+            value = round(value, 2)
+        return {
+            "summary": f"{col}: {value}",
+            "bullets": [],
+            "llm": False,
+        }
+    return None
+
+
+def prepare_explanation(
     user_question: str,
     sql: str,
-    df: Any,  # can be DataFrame OR your execute_sql output dict
-    intent: str = "UNKNOWN",                       # <-- added
-    entities: Optional[Dict[str, Any]] = None,     # <-- added
-    temperature: float = 0.0,
+    df: Any,  # DataFrame, Arrow table or execute_sql() output dict
+    intent: str = "UNKNOWN",
+    entities: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
-    Explain results in plain English for business users.
-
-    Accepts:
-      - df as a pandas DataFrame OR as execute_sql() output dict {df, preview_markdown, ...}
+    Everything the explainer needs, without the DataFrame: small and JSON-safe,
+    so it can be stored and explained later (deferred mode, /api/explain/{id}).
+    Trivial results already carry their templated explanation.
     """
-
-    entities = entities or {}
-
-    # If df is the executor output dict, extract the DataFrame
-    if isinstance(df, dict) and "df" in df:
-        df_obj = df["df"]
+    prepared: Dict[str, Any] = {
+        "user_question": user_question,
+        "sql": sql,
+        "intent": intent,
+        "entities": entities or {},
+        "profile": None,
+        "digest": "",
+        "explanation": None,
+    }
+
+    # executor output dict / Arrow table -> DataFrame (the profiler is pandas-based)
+    if isinstance(df, dict):
+        df_obj = df.get("table", df.get("df"))
     else:
         df_obj = df
+    if isinstance(df_obj, pa.Table):
+        df_obj = df_obj.to_pandas()
 
     if not isinstance(df_obj, pd.DataFrame):
-        return {
+        prepared["explanation"] = {
             "summary": "I could not generate an explanation because result is not a DataFrame.",
             "bullets": [],
         }
+        return prepared
+
+    templated = _templated(df_obj)
+    if templated is not None:
+        prepared["explanation"] = templated
+        return prepared
+
+    # statistics over the whole result instead of the first rows
+    prepared["profile"] = profile_result(df_obj)
+    digest = format_profile(prepared["profile"])
+    if len(df_obj) <= INLINE_ROWS:
+        digest += "\n\nAll rows:\n" + df_obj.to_markdown(index=False)
+    prepared["digest"] = digest
+    return prepared
 
-    # Use a small preview to avoid sending huge tables to LLM
-    preview_md = df_obj.head(20).to_markdown(index=False) if not df_obj.empty else "No rows returned."
+
+@traceable_fn("answer_explainer")
+def explain_prepared(prepared: Dict[str, Any], temperature: float = 0.0) -> Dict[str, Any]:
+    """
+    LLM explanation of a prepare_explanation() payload (no call for trivial results).
+    """
+    if prepared.get("explanation") is not None:
+        return prepared["explanation"]
 
     llm = get_llm(temperature=temperature)
 
@@ -48,19 +103,19 @@ You are an airport operations analytics assistant.
 Explain the answer clearly to a business user.
 
 User Question:
-{user_question}
+{prepared["user_question"]}
 
 Intent:
-{intent}
+{prepared["intent"]}
 
 Entities (JSON):
-{entities}
+{prepared["entities"]}
 
 SQL executed:
-{sql}
+{prepared["sql"]}
 
-Result preview (first rows):
-{preview_md}
+Result profile (computed over all rows):
+{prepared["digest"]}
 
 Return:
 1) A short 2-3 line summary
@@ -75,9 +130,30 @@ Return:
         return {
             "summary": text.strip(),
             "bullets": [],
+            "llm": True,
+            "profile": prepared["profile"],
         }
     except Exception as e:
         return {
             "summary": f"Explanation failed: {e}",
             "bullets": [],
-        }
\ No newline at end of file
+            "error": str(e),
+        }
+
+
+def explain_answer(
+    user_question: str,
+    sql: str,
+    df: Any,  # can be DataFrame OR your execute_sql output dict
+    intent: str = "UNKNOWN",                       # <-- added
+    entities: Optional[Dict[str, Any]] = None,     # <-- added
+    temperature: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Explain results in plain English for business users.
+
+    Accepts:
+      - df as a pandas DataFrame, an Arrow table OR as execute_sql() output dict {table, preview_markdown, ...}
+    """
+    prepared = prepare_explanation(user_question, sql, df, intent=intent, entities=entities)
+    return explain_prepared(prepared, temperature=temperature)
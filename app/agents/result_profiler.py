@@ -0,0 +1,202 @@
+# app/agents/result_profiler.py
+"""
+Statistical digest of a query result for the explainer.
+
+Instead of the first 20 rows as markdown, the LLM gets facts computed over
+the WHOLE result with vectorized pandas / NumPy:
+
+  - numeric columns: min / max / mean / std / nulls, and which row holds the max / min
+  - categorical columns: distinct count + top-k values
+  - time series (a datetime column + numeric columns): first / last value,
+    linear slope per day (overall and per group for a small categorical key), peak
+  - outliers: |z| > OUTLIER_Z rows per numeric column
+
+profile_result() returns a JSON-safe dict; format_profile() renders it as
+compact text lines for the prompt.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TOP_K = 5
+OUTLIER_Z = 3.0
+MAX_GROUPS = 10  # per-group slopes only for small categorical keys
+
+
+def _py(v: Any) -> Any:
+    # numpy / pandas scalars -> JSON-safe Python values
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return None
+    if isinstance(v, (pd.Timestamp, dt.datetime, dt.date)):
+        return v.isoformat()
+    if isinstance(v, np.generic):
+        v = v.item()
+        if isinstance(v, float):
+            return None if np.isnan(v) else round(v, 4)
+    if isinstance(v, float):
+        return round(v, 4)
+    return v
+
+
+def _time_column(df: pd.DataFrame) -> Optional[str]:
+    for c in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[c]):
+            return c
+    for c in df.select_dtypes(include="object").columns:
+        first = df[c].dropna().head(1)
+        if not first.empty and isinstance(first.iloc[0], (dt.date, dt.datetime)):
+            return c
+    return None
+
+
+def _slopes(x: np.ndarray, y: pd.DataFrame, groups: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Least-squares slope of every column of y against x, from grouped sums
+    (one pass, no per-group Python loop).
+    """
+    xs = pd.Series(x, index=y.index)
+    mask = y.notna()
+    yv = y.where(mask, 0.0)
+    xv = mask.mul(xs, axis=0)
+    parts = {
+        "n": mask.astype(float),
+        "sx": xv,
+        "sy": yv,
+        "sxx": xv.mul(xs, axis=0),
+        "sxy": yv.mul(xs, axis=0),
+    }
+    key = groups if groups is not None else pd.Series(0, index=y.index)
+    sums = {k: v.groupby(key).sum() for k, v in parts.items()}
+    denom = sums["n"] * sums["sxx"] - sums["sx"] ** 2
+    return (sums["n"] * sums["sxy"] - sums["sx"] * sums["sy"]) / denom.where(denom != 0)
+
+
+def profile_result(df: pd.DataFrame, top_k: int = TOP_K) -> Dict[str, Any]:
+    prof: Dict[str, Any] = {"row_count": int(len(df)), "columns": [str(c) for c in df.columns]}
+    if df.empty:
+        return prof
+
+    time_col = _time_column(df)
+    num = df.select_dtypes(include="number").drop(columns=[time_col] if time_col else [], errors="ignore")
+    num = num.loc[:, [c for c in num.columns if not pd.api.types.is_bool_dtype(num[c])]]
+    cat_cols = [c for c in df.columns if c not in num.columns and c != time_col]
+    label_col = cat_cols[0] if cat_cols else time_col
+
+    # numeric summary: one agg call for all columns
+    if not num.empty:
+        stats = num.agg(["min", "max", "mean", "std"]).T
+        stats["nulls"] = num.isna().sum()
+        arg_max = num.idxmax(skipna=True)
+        arg_min = num.idxmin(skipna=True)
+        numeric = {}
+        for c in num.columns:
+            s = {k: _py(stats.at[c, k]) for k in ("min", "max", "mean", "std")}
+            s["nulls"] = int(stats.at[c, "nulls"])
+            if label_col is not None and pd.notna(arg_max[c]):
+                s["max_at"] = _py(df.at[arg_max[c], label_col])
+                s["min_at"] = _py(df.at[arg_min[c], label_col])
+            numeric[str(c)] = s
+        prof["numeric"] = numeric
+
+        # outliers: z-scores for the whole frame at once
+        std = num.std().replace(0, np.nan)
+        z = (num - num.mean()) / std
+        flagged = z.abs() > OUTLIER_Z
+        outliers = {}
+        for c in num.columns[flagged.any().to_numpy()]:
+            idx = z[c].abs()[flagged[c]].nlargest(3).index
+            outliers[str(c)] = {
+                "count": int(flagged[c].sum()),
+                "examples": [
+                    {"at": _py(df.at[i, label_col]) if label_col is not None else int(i), "value": _py(num.at[i, c])}
+                    for i in idx
+                ],
+            }
+        if outliers:
+            prof["outliers"] = outliers
+
+    # categorical: distinct + top values
+    if cat_cols:
+        cats = {}
+        for c in cat_cols:
+            vc = df[c].value_counts(dropna=True)
+            cats[str(c)] = {
+                "distinct": int(vc.size),
+                "top": [[_py(k), int(v)] for k, v in vc.head(top_k).items()],
+            }
+        prof["categorical"] = cats
+
+    # time series
+    ts = pd.to_datetime(df[time_col], errors="coerce") if time_col is not None else None
+    if ts is not None and ts.nunique() >= 2 and not num.empty:
+        order = ts.sort_values().index
+        days = ((ts - ts.min()).dt.total_seconds() / 86400.0).to_numpy()
+        series: Dict[str, Any] = {
+            "time_column": str(time_col),
+            "start": _py(ts.min()),
+            "end": _py(ts.max()),
+            "points": int(ts.nunique()),
+        }
+        overall = _slopes(days, num).iloc[0]
+        trends = {}
+        for c in num.columns:
+            col = num[c].loc[order].dropna()
+            if col.empty:
+                continue
+            peak = num[c].idxmax()
+            trends[str(c)] = {
+                "first": _py(col.iloc[0]),
+                "last": _py(col.iloc[-1]),
+                "slope_per_day": _py(overall[c]),
+                "peak": {"at": _py(ts.at[peak]), "value": _py(num.at[peak, c])},
+            }
+        series["trends"] = trends
+
+        group_col = next((c for c in cat_cols if 1 < df[c].nunique() <= MAX_GROUPS), None)
+        if group_col is not None:
+            by_group = _slopes(days, num, df[group_col])
+            series["slope_per_day_by"] = {
+                "column": str(group_col),
+                "values": {str(c): {str(g): _py(v) for g, v in by_group[c].items()} for c in num.columns},
+            }
+        prof["time_series"] = series
+
+    return prof
+
+
+def format_profile(prof: Dict[str, Any]) -> str:
+    """
+    Compact text for the prompt (one fact per line).
+    """
+    lines: List[str] = [f"rows: {prof['row_count']}; columns: {', '.join(prof['columns'])}"]
+    for c, s in (prof.get("numeric") or {}).items():
+        line = f"{c}: min {s['min']}, max {s['max']}, mean {s['mean']}, std {s['std']}"
+        if "max_at" in s:
+            line += f"; max at {s['max_at']}, min at {s['min_at']}"
+        if s["nulls"]:
+            line += f"; {s['nulls']} nulls"
+        lines.append(line)
+    for c, s in (prof.get("categorical") or {}).items():
+        top = ", ".join(f"{k} ({n})" for k, n in s["top"])
+        lines.append(f"{c}: {s['distinct']} distinct; most frequent: {top}")
+    ts = prof.get("time_series")
+    if ts:
+        lines.append(f"time: {ts['time_column']} from {ts['start']} to {ts['end']} ({ts['points']} points)")
+        for c, t in ts["trends"].items():
+            lines.append(
+                f"{c} over time: first {t['first']}, last {t['last']}, slope {t['slope_per_day']}/day, "
+                f"peak {t['peak']['value']} at {t['peak']['at']}"
+            )
+        by = ts.get("slope_per_day_by")
+        if by:
+            for c, vals in by["values"].items():
+                parts = ", ".join(f"{g} {v}" for g, v in vals.items())
+                lines.append(f"{c} slope/day by {by['column']}: {parts}")
+    for c, o in (prof.get("outliers") or {}).items():
+        ex = ", ".join(f"{e['value']} at {e['at']}" for e in o["examples"])
+        lines.append(f"outliers in {c} (|z|>{OUTLIER_Z:g}): {o['count']}, e.g. {ex}")
+    return "\n".join(lines)
@@ -5,50 +5,101 @@ from __future__ import annotations
 
 from app.audit.langsmith_tracing import traceable_fn
 from typing import Any, Dict, Optional
-import pandas as pd
+import pyarrow as pa
 import re
+import time
 
-from app.db.duckdb_client import get_conn
+from app.db.duckdb_client import get_data_version, pooled_cursor, resolve_db_path
+from app.db.query_log import log_query
+from app.db.slow_queries import SLOW_QUERY_SEC, capture_slow_query
+from app.db.result_cache import RESULT_CACHE_ENABLED, cache_key, get_result_cache
 
 
 _LIMIT_REGEX = re.compile(r"\blimit\b", re.IGNORECASE)
 
+
+def _decimals_to_double(table: pa.Table) -> pa.Table:
+    # DuckDB's .df() returned DECIMAL (e.g. SUM of integers) as float64; keep that for pandas / the profiler
+    for i, f in enumerate(table.schema):
+        if pa.types.is_decimal(f.type):
+            table = table.set_column(i, f.name, table.column(i).cast(pa.float64()))
+    return table
+
+
 @traceable_fn("sql_executor")
 def execute_sql(
     final_sql: str,
     limit: Optional[int] = None,        # <-- added
     limit_preview: int = 20,
+    conn: Optional[Any] = None,         # DuckDB connection/cursor; default: pooled cursor
+    role: Optional[str] = None,         # caller role, recorded in the query log
+    question: Optional[str] = None,     # stored with the plan of a slow query
 ) -> Dict[str, Any]:
     """
     Executes SQL in DuckDB and returns:
-      - full dataframe (df)
+      - the full result as an Arrow table (table)
       - preview markdown
       - row_count
       - columns
+      - cache: "hit" | "miss" | "off" (result cache, see app.db.result_cache)
+      - slow_query_id: set when the run took >= SLOW_QUERY_SEC; its EXPLAIN ANALYZE
+        profile is captured in the background (app.db.slow_queries)
+
+    Every run (also failures and cache hits) goes to the query log (app.db.query_log).
 
     `limit`:
       Optional hard cap on rows (used by graph / UI safety).
       Applied ONLY if SQL does not already contain LIMIT.
     """
 
-    conn = get_conn()
-
     sql_to_run = final_sql.strip().rstrip(";")
 
     # Apply limit only if not already present
     if limit and limit > 0 and not _LIMIT_REGEX.search(sql_to_run):
         sql_to_run = f"{sql_to_run} LIMIT {int(limit)}"
 
-    df: pd.DataFrame = conn.execute(sql_to_run).df()
+    t0 = time.perf_counter()
+    cache_state = "off"
+    table: Optional[pa.Table] = None
+
+    # caller-supplied connections may point anywhere: only the shared DB is cached
+    key = cache_key(sql_to_run) if conn is None and RESULT_CACHE_ENABLED else None
+    use_cache = key is not None
+    if use_cache:
+        cache = get_result_cache()
+        version = (resolve_db_path(), get_data_version())
+        table = cache.get(key, version)
+        cache_state = "hit" if table is not None else "miss"
+
+    if table is None:
+        try:
+            if conn is not None:
+                table = _decimals_to_double(conn.execute(sql_to_run).fetch_arrow_table())
+            else:
+                with pooled_cursor() as cur:
+                    table = _decimals_to_double(cur.execute(sql_to_run).fetch_arrow_table())
+        except Exception as e:
+            log_query(sql_to_run, time.perf_counter() - t0, None, cache_state, role=role, error=str(e)[:500])
+            raise
+        if use_cache:
+            cache.put(key, version, table)
+
+    seconds = time.perf_counter() - t0
+    log_query(sql_to_run, seconds, table.num_rows, cache_state, role=role)
 
     out = {
-        "row_count": int(df.shape[0]),
-        "columns": list(df.columns),
-        "df": df,  # full dataframe for downstream agents
+        "row_count": table.num_rows,
+        "columns": table.column_names,
+        "table": table,  # the result, once; to_pandas() where a DataFrame is needed
         "preview_markdown": (
-            df.head(limit_preview).to_markdown(index=False)
-            if not df.empty
+            table.slice(0, limit_preview).to_pandas().to_markdown(index=False)
+            if table.num_rows
             else ""
         ),
+        "cache": cache_state,
+        "seconds": round(seconds, 4),
     }
+    # the shared DB only: a caller's own connection may not be reachable from the capture thread
+    if seconds >= SLOW_QUERY_SEC and cache_state != "hit" and conn is None:
+        out["slow_query_id"] = capture_slow_query(sql_to_run, question, seconds, table.num_rows)
     return out
\ No newline at end of file
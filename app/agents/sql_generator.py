@@ -52,6 +52,10 @@ DuckDB notes:
 - Date filters: WHERE ts >= NOW() - INTERVAL '7 days'
 - Use DATE_TRUNC('day', ts) or DATE_TRUNC('hour', ts) when needed
 - Aggregate using AVG/SUM/COUNT; group by proper keys
+- ANOMALY questions: read precomputed gold_anomaly_scores (one row per airport, ts, metric;
+  is_anomaly / score / expected) instead of computing z-scores in SQL
+- Daily / weekly / monthly trends and rankings: use gold_kpi_rollup (filter on grain, merge with
+  SUM(sum)/SUM(n)) rather than aggregating event tables
 
 Return JSON only."""
             ),
@@ -178,4 +182,99 @@ def generate_sql(
             "warnings": [f"SQL generation failed: {e}"],
             "confidence": 0.0,
             "timestamp_utc": datetime.utcnow().isoformat(),
-        }
\ No newline at end of file
+        }
+
+# -----------------------------
+# Follow-up: edit the previous SQL
+# -----------------------------
+class SQLEditOutput(BaseModel):
+    rewritten_query: str = Field(..., description="The follow-up restated as a complete, standalone question.")
+    sql: str = Field(..., description="The previous SQL edited to answer the follow-up. Read-only SELECT.")
+    entities: Dict[str, Any] = Field(default_factory=dict, description="Entities of the standalone question.")
+    assumptions: List[str] = Field(default_factory=list, description="Assumptions made.")
+    warnings: List[str] = Field(default_factory=list, description="Potential issues.")
+    confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score 0..1")
+
+
+def _edit_prompt(parser: PydanticOutputParser) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                """You edit DuckDB SQL for airport operations analytics in a conversation.
+
+The user asked a question, got an answer from the previous SQL, and now asks a follow-up.
+Change the previous SQL as little as needed to answer the follow-up (add / change filters,
+grain, grouping, ordering, LIMIT). Keep it read-only, keep a LIMIT, and use ONLY tables /
+columns from schema_context. Also restate the follow-up as a complete standalone question.
+
+Return JSON only."""
+            ),
+            (
+                "human",
+                """Previous question:
+{previous_question}
+
+Previous SQL:
+{previous_sql}
+
+Follow-up:
+{followup}
+
+Schema context (authoritative):
+{schema_context}
+
+{format_instructions}"""
+            ),
+        ]
+    )
+
+
+@traceable_fn("sql_editor")
+def edit_sql(
+    followup: str,
+    previous_question: str,
+    previous_sql: str,
+    schema_context: str,
+    temperature: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    One LLM call instead of rewrite + generate for a follow-up question.
+    Returns the generate_sql() shape plus rewritten_query / entities.
+    """
+    llm = get_llm(temperature=temperature)
+
+    parser = PydanticOutputParser(pydantic_object=SQLEditOutput)
+    prompt = _edit_prompt(parser)
+
+    try:
+        chain = prompt | llm | parser
+        result: SQLEditOutput = chain.invoke(
+            {
+                "previous_question": previous_question,
+                "previous_sql": previous_sql,
+                "followup": followup,
+                "schema_context": schema_context,
+                "format_instructions": parser.get_format_instructions(),
+            }
+        )
+
+        out = result.model_dump()
+        out["timestamp_utc"] = datetime.utcnow().isoformat()
+        safety_warnings = _basic_sql_safety_checks(out.get("sql", ""))
+        out["warnings"] = list(dict.fromkeys(out.get("warnings", []) + safety_warnings))
+        out["used_tables"] = _best_effort_extract_tables(out.get("sql", ""))
+        return out
+
+    except Exception as e:
+        logger.error("SQL edit failed", exc_info=True)
+        return {
+            "rewritten_query": followup,
+            "sql": "",
+            "entities": {},
+            "used_tables": [],
+            "assumptions": [],
+            "warnings": [f"SQL edit failed: {e}"],
+            "confidence": 0.0,
+            "timestamp_utc": datetime.utcnow().isoformat(),
+        }
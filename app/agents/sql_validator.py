@@ -11,7 +11,7 @@ from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 
-from app.db.duckdb_client import get_conn
+from app.db.duckdb_client import pooled_cursor
 from app.agents.llm_factory import get_llm
 
 logger = logging.getLogger(__name__)
@@ -27,10 +27,10 @@ def validate_sql_duckdb(sql: str) -> Dict[str, Any]:
     Validate SQL without executing it using DuckDB EXPLAIN.
     Returns: {ok: bool, error: str}
     """
-    conn = get_conn()
     try:
-        # EXPLAIN validates parsing + bindings (tables/columns), without running query
-        conn.execute("EXPLAIN " + sql)
+        with pooled_cursor() as cur:
+            # EXPLAIN validates parsing + bindings (tables/columns), without running query
+            cur.execute("EXPLAIN " + sql)
         return {"ok": True, "error": ""}
     except Exception as e:
         return {"ok": False, "error": str(e)}
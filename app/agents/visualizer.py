@@ -1,8 +1,17 @@
 from __future__ import annotations
 
-from typing import Dict, Any, Optional
+import json
+import os
+from typing import Dict, Any, List, Optional
+import numpy as np
 import pandas as pd
 
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+CHART_DOWNSAMPLE = os.getenv("CHART_DOWNSAMPLE", "lttb")  # lttb | minmax
+CHART_MAX_SERIES = 20
+CHART_MAX_BARS = 50
+
 
 def suggest_plot(df: pd.DataFrame) -> Dict[str, Any]:
     """
@@ -37,4 +46,157 @@ def suggest_plot(df: pd.DataFrame) -> Dict[str, Any]:
             "reason": "Category + numeric detected",
         }
 
-    return {"plot": None, "reason": "No clear chart mapping"}
\ No newline at end of file
+    return {"plot": None, "reason": "No clear chart mapping"}
+
+
+# -----------------------------
+# Downsampling (x sorted ascending; returns indices to keep)
+# -----------------------------
+def minmax_downsample(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min and max of each of n_out/2 equal-count bins, in one vectorized pass.
+    Keeps every spike, which a plain stride would drop.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_bins = max(1, n_out // 2)
+    size = -(-n // n_bins)
+    padded = np.full(n_bins * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(n_bins, size)
+    # the last bin may be all padding when n_bins * size overshoots by a full bin
+    valid = ~np.isnan(grid).all(axis=1)
+    grid = np.where(np.isnan(grid[valid]), -np.inf, grid[valid])
+    rows = np.flatnonzero(valid) * size
+    hi = rows + grid.argmax(axis=1)
+    lo = rows + np.where(np.isinf(grid), np.inf, grid).argmin(axis=1)
+    return np.unique(np.concatenate([lo, hi]))
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, n_out: int, minmax_ratio: int = 4) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets on min-max preselected candidates
+    (MinMaxLTTB): the vectorized min-max pass cuts the input to
+    minmax_ratio * n_out points, so the sequential LTTB loop only runs over
+    a few thousand candidates whatever the input size.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    cand = np.arange(n)
+    if n > n_out * minmax_ratio:
+        cand = np.unique(np.concatenate([[0], minmax_downsample(y, n_out * minmax_ratio), [n - 1]]))
+    m = len(cand)
+    if m <= n_out:
+        return cand
+
+    xc = x[cand].astype(float)
+    yc = y[cand].astype(float)
+
+    # n_out - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, m - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(xc[: m - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(yc[: m - 1], edges[:-1]) / counts
+    avg_x = np.append(avg_x[1:], xc[-1])  # each bucket looks at the next bucket's mean
+    avg_y = np.append(avg_y[1:], yc[-1])
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, m - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (xc[a] - avg_x[i]) * (yc[lo:hi] - yc[a])
+            - (xc[a] - xc[lo:hi]) * (avg_y[i] - yc[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return cand[keep]
+
+
+def downsample_series(df: pd.DataFrame, x: str, y: str, n_out: int, method: str = CHART_DOWNSAMPLE) -> pd.DataFrame:
+    df = df.dropna(subset=[x, y]).sort_values(x)
+    if len(df) <= n_out:
+        return df
+    yv = df[y].to_numpy(dtype=float)
+    if method == "minmax":
+        idx = minmax_downsample(yv, n_out)
+    else:
+        xv = pd.to_datetime(df[x]).astype("int64").to_numpy() if pd.api.types.is_datetime64_any_dtype(df[x]) \
+            else df[x].to_numpy(dtype=float)
+        idx = lttb_downsample(xv, yv, n_out)
+    return df.iloc[idx]
+
+
+# -----------------------------
+# Vega-Lite chart spec
+# -----------------------------
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def build_chart_spec(
+    df: pd.DataFrame,
+    suggestion: Optional[Dict[str, Any]] = None,
+    max_points: int = CHART_MAX_POINTS,
+    method: str = CHART_DOWNSAMPLE,
+) -> Optional[Dict[str, Any]]:
+    """
+    Ready-to-render Vega-Lite spec (data inlined) for the suggested plot, or
+    None when there is nothing to chart. Time series are downsampled to about
+    max_points in total (split across series); bar charts keep the top bars.
+    """
+    suggestion = suggestion or suggest_plot(df)
+    if not suggestion.get("plot"):
+        return None
+    x, y = suggestion["x"], suggestion["y"]
+    source_rows = int(len(df))
+
+    if suggestion["plot"] == "line":
+        # one line per value of a small categorical column (e.g. airport)
+        color = next(
+            (c for c in df.columns
+             if c not in (x, y) and not pd.api.types.is_numeric_dtype(df[c])
+             and not pd.api.types.is_datetime64_any_dtype(df[c])
+             and 1 < df[c].nunique() <= CHART_MAX_SERIES),
+            None,
+        )
+        cols = [x, y] + ([color] if color else [])
+        if color:
+            groups = [g for _, g in df[cols].groupby(color, sort=False)]
+            budget = max(50, max_points // len(groups))
+            data = pd.concat([downsample_series(g, x, y, budget, method) for g in groups], ignore_index=True)
+        else:
+            data = downsample_series(df[cols], x, y, max_points, method)
+
+        encoding: Dict[str, Any] = {
+            "x": {"field": x, "type": "temporal"},
+            "y": {"field": y, "type": "quantitative"},
+        }
+        if color:
+            encoding["color"] = {"field": color, "type": "nominal"}
+        mark: Dict[str, Any] = {"type": "line", "tooltip": True}
+    else:
+        data = df[[x, y]].dropna().sort_values(y, ascending=False).head(CHART_MAX_BARS)
+        encoding = {
+            "x": {"field": x, "type": "nominal", "sort": "-y"},
+            "y": {"field": y, "type": "quantitative"},
+        }
+        mark = {"type": "bar", "tooltip": True}
+
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "data": {"values": _records(data)},
+        "mark": mark,
+        "encoding": encoding,
+        "width": "container",
+        "usermeta": {
+            "source_rows": source_rows,
+            "points": int(len(data)),
+            "downsampling": method if len(data) < source_rows and suggestion["plot"] == "line" else None,
+            "reason": suggestion.get("reason"),
+        },
+    }
@@ -0,0 +1,65 @@
+# app/api/charts.py
+"""
+Charts for stored results, built off the request path.
+
+The answer never waits for a chart: with enable_viz the API only queues a
+build on a background thread once the result is stored, and
+GET /api/charts/{result_id} serves the spec (building it then if it isn't
+ready). Specs are Vega-Lite JSON from visualizer.build_chart_spec (time
+series downsampled to CHART_MAX_POINTS) and are kept as an artifact of the
+stored result, so they expire and are evicted with it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.agents.visualizer import build_chart_spec
+from app.api.result_store import get_store
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT = "chart.json"
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def chart_spec(result_id: str) -> Optional[Tuple[Optional[Dict[str, Any]], bool]]:
+    """
+    (spec or None if the result has nothing to chart, cached) or None for an
+    unknown / expired result.
+    """
+    store = get_store()
+    cached = store.get_artifact(result_id, ARTIFACT)
+    if cached is not None:
+        return json.loads(cached), True
+
+    loaded = store.load(result_id)
+    if loaded is None:
+        return None
+    table, _meta = loaded
+    spec = build_chart_spec(table.to_pandas())
+    store.put_artifact(result_id, ARTIFACT, json.dumps(spec).encode())
+    return spec, False
+
+
+def _build(result_id: str) -> None:
+    try:
+        chart_spec(result_id)
+    except Exception:
+        logger.warning("Chart build failed for %s", result_id, exc_info=True)
+
+
+def prebuild_chart(result_id: str) -> None:
+    """
+    Queue a chart build; returns immediately.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:  # created on first use, i.e. after fork in pre-fork mode
+            _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart")
+    _pool.submit(_build, result_id)
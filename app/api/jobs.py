@@ -0,0 +1,177 @@
+# app/api/jobs.py
+"""
+Asynchronous jobs for long-running questions.
+
+POST /api/jobs returns a job id immediately; a bounded thread pool runs the
+pipeline and records each stage's output as it completes. GET /api/jobs/{id}
+returns status + stages + final result.
+
+Jobs live in a local SQLite file (WAL) rather than process memory so they
+survive a page refresh and are visible from every API worker (pre-fork mode
+may route the GET to a different process than the POST). Rows expire after
+JOB_TTL_SEC.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("data", "jobs.sqlite"))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "50"))
+JOB_TTL_SEC = float(os.getenv("JOB_TTL_SEC", str(24 * 3600)))
+
+StageCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class JobStore:
+    def __init__(self, path: str = JOB_DB_PATH, ttl_sec: float = JOB_TTL_SEC):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL;")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,          -- queued | running | done | failed
+                    request TEXT NOT NULL,
+                    stages TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    pid INTEGER,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # one short-lived connection per call: safe across threads and forks
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:  # commit / rollback
+                yield db
+        finally:
+            db.close()
+
+    def create(self, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+            db.execute(
+                "INSERT INTO jobs (id, status, request, pid, created_at, updated_at, expires_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(request, default=str), os.getpid(), now, now, now + self.ttl_sec),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        for k in ("stages", "result"):
+            if k in fields and not isinstance(fields[k], str):
+                fields[k] = json.dumps(fields[k], default=str)
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, time.time())).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["stages"] = json.loads(job["stages"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+
+        # the process that owned it is gone (restart / crash): it will never finish
+        if job["status"] in ("queued", "running") and not _pid_alive(job["pid"]):
+            job["status"] = "failed"
+            job["error"] = "worker exited before the job finished"
+        return job
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobRunner:
+    """
+    Bounded pool: JOB_CONCURRENCY jobs run at once, at most JOB_MAX_PENDING are
+    queued or running in this process; beyond that submit() raises JobQueueFull.
+    """
+
+    def __init__(self, store: JobStore, concurrency: int = JOB_CONCURRENCY, max_pending: int = JOB_MAX_PENDING):
+        self.store = store
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, request: Dict[str, Any], fn: Callable[[Dict[str, Any], StageCallback], Dict[str, Any]]) -> str:
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull(f"{JOB_MAX_PENDING} jobs already pending")
+        try:
+            job_id = self.store.create(request)
+            self.pool.submit(self._run, job_id, request, fn)
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def _run(self, job_id: str, request: Dict[str, Any], fn) -> None:
+        stages: Dict[str, Any] = {}
+
+        def on_stage(name: str, output: Dict[str, Any]) -> None:
+            stages[name] = {**output, "at": time.time()}
+            self.store.update(job_id, stages=stages)
+
+        try:
+            self.store.update(job_id, status="running")
+            result = fn(request, on_stage)
+            self.store.update(job_id, status="done", result=result)
+        except Exception as e:
+            logger.error("Job %s failed", job_id, exc_info=True)
+            self.store.update(job_id, status="failed", error=str(e))
+        finally:
+            self._slots.release()
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """
+    One runner per process, created on first use (i.e. after fork in pre-fork mode).
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(JobStore())
+        return _runner
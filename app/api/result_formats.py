@@ -0,0 +1,101 @@
+# app/api/result_formats.py
+"""
+Result-set encodings for the text2sql endpoints.
+
+  markdown  (default) preview_markdown only, as before
+  json      + columns / rows (all rows of the executed query) in the JSON body
+  arrow     Arrow IPC stream   (application/vnd.apache.arrow.stream)
+  parquet   single Parquet file (application/vnd.apache.parquet)
+
+For arrow / parquet the body is the table itself; the usual response fields
+(final_sql, explanation, ...) travel as JSON in the schema metadata under
+b"text2sql". Formats can be asked for explicitly (`result_format`) or via the
+Accept header. JSON bodies are gzip'ed by the API middleware when the client
+sends Accept-Encoding: gzip; arrow / parquet use their own codecs.
+"""
+from __future__ import annotations
+
+import io
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+ARROW_STREAM_MIME = "application/vnd.apache.arrow.stream"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+RESULT_FORMATS = ("markdown", "json", "arrow", "parquet")
+BINARY_FORMATS = {"arrow": ARROW_STREAM_MIME, "parquet": PARQUET_MIME}
+
+_ACCEPT = {
+    ARROW_STREAM_MIME: "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    PARQUET_MIME: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+# codec used when the request doesn't name one
+DEFAULT_COMPRESSION = {"arrow": "lz4", "parquet": "zstd"}
+METADATA_KEY = b"text2sql"
+
+
+def negotiate(requested: Optional[str], accept: Optional[str]) -> str:
+    """
+    Explicit result_format wins; else the first binary type in Accept; else markdown.
+    """
+    if requested:
+        return requested
+    for part in (accept or "").split(","):
+        mime = part.split(";")[0].strip().lower()
+        if mime in _ACCEPT:
+            return _ACCEPT[mime]
+    return "markdown"
+
+
+def json_rows(df: Optional[Union[pa.Table, pd.DataFrame]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+    if df is None:
+        return [], []
+    if isinstance(df, pa.Table):
+        df = df.to_pandas()
+    # pandas handles NaN -> null and timestamps -> ISO strings
+    return list(df.columns), json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def to_arrow(df: Optional[Union[pa.Table, pd.DataFrame]], meta: Dict[str, Any]) -> pa.Table:
+    # the pipeline's result already is a table: new metadata, same buffers
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(
+        df if df is not None else pd.DataFrame(), preserve_index=False
+    )
+    return table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        METADATA_KEY: json.dumps(meta, default=str).encode(),
+    })
+
+
+def encode(table: pa.Table, fmt: str, compression: Optional[str] = None) -> bytes:
+    codec = compression or DEFAULT_COMPRESSION[fmt]
+    sink = io.BytesIO()
+    if fmt == "arrow":
+        options = ipc.IpcWriteOptions(compression=None if codec == "none" else codec)
+        with ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    elif fmt == "parquet":
+        pq.write_table(table, sink, compression=codec)
+    else:
+        raise ValueError(f"not a binary result format: {fmt}")
+    return sink.getvalue()
+
+
+def decode(body: bytes, fmt: str) -> Tuple[pa.Table, Dict[str, Any]]:
+    """
+    Client-side helper: table + the text2sql response fields.
+    """
+    if fmt == "arrow":
+        table = ipc.open_stream(io.BytesIO(body)).read_all()
+    else:
+        table = pq.read_table(io.BytesIO(body))
+    meta = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    return table, meta
@@ -0,0 +1,232 @@
+# app/api/result_store.py
+"""
+Server-side result sets.
+
+Every executed query's full result is spilled to an Arrow IPC file under
+RESULT_STORE_DIR and gets a result id. GET /api/results/{id}?cursor=&page_size=
+pages through it without re-running the SQL: the file is written in record
+batches of RESULT_BATCH_ROWS rows and memory-mapped on read, so a page only
+touches the batches it covers.
+
+Files live on disk (not in process memory) so any API worker can serve any
+page. A file expires RESULT_TTL_SEC after its last read; when the directory
+grows past RESULT_STORE_MAX_BYTES the least recently read files are evicted.
+
+Cursors are opaque to clients (url-safe base64 of the row offset).
+
+Derived artifacts of a result (e.g. its chart spec) are stored next to it as
+<id>.<name> and removed with it.
+"""
+from __future__ import annotations
+
+import base64
+import glob
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", os.path.join("data", "results"))
+RESULT_TTL_SEC = float(os.getenv("RESULT_TTL_SEC", "3600"))
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+RESULT_BATCH_ROWS = int(os.getenv("RESULT_BATCH_ROWS", "4096"))
+RESULT_COMPRESSION = os.getenv("RESULT_COMPRESSION", "lz4")  # lz4 | zstd | none
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 5000
+
+METADATA_KEY = b"result_store"
+_SUFFIX = ".arrow"
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(int(offset)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """
+    None / "" -> 0. Raises ValueError for anything that isn't one of our cursors.
+    """
+    if not cursor:
+        return 0
+    try:
+        offset = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return offset
+
+
+class ResultStore:
+    def __init__(
+        self,
+        root: str = RESULT_STORE_DIR,
+        ttl_sec: float = RESULT_TTL_SEC,
+        max_bytes: int = RESULT_STORE_MAX_BYTES,
+        batch_rows: int = RESULT_BATCH_ROWS,
+        compression: str = RESULT_COMPRESSION,
+    ):
+        self.root = root
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.batch_rows = max(1, batch_rows)
+        self.compression = None if compression == "none" else compression
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, result_id: str) -> Optional[str]:
+        if not _ID_RE.match(result_id or ""):
+            return None
+        return os.path.join(self.root, result_id + _SUFFIX)
+
+    def put(self, df: Optional[Union[pa.Table, pd.DataFrame]], meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Spill a result (the executor's Arrow table, or a DataFrame); returns its
+        id, or None if it doesn't fit the budget.
+        """
+        table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(
+            df if df is not None else pd.DataFrame(), preserve_index=False
+        )
+        # one chunk -> every batch except the last has exactly batch_rows rows
+        table = table.combine_chunks().replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            METADATA_KEY: json.dumps({
+                **(meta or {}),
+                "batch_rows": self.batch_rows,
+                "row_count": table.num_rows,
+                "created_at": time.time(),
+            }, default=str).encode(),
+        })
+
+        result_id = uuid.uuid4().hex
+        path = self._path(result_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        options = ipc.IpcWriteOptions(compression=self.compression)
+        with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema, options=options) as writer:
+            for batch in table.to_batches(max_chunksize=self.batch_rows):
+                writer.write_batch(batch)
+
+        size = os.path.getsize(tmp)
+        if size > self.max_bytes:
+            os.remove(tmp)
+            logger.warning("Result of %d bytes exceeds the store budget (%d); not kept", size, self.max_bytes)
+            return None
+
+        os.replace(tmp, path)  # readers in other workers never see a partial file
+        self._evict(keep=path)
+        return result_id
+
+    def page(
+        self, result_id: str, offset: int = 0, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Optional[Tuple[pa.Table, Dict[str, Any]]]:
+        """
+        Rows [offset, offset + page_size) + the stored metadata (row_count, ...),
+        or None for unknown / expired ids.
+        """
+        path = self._path(result_id)
+        if path is None or not os.path.exists(path):
+            return None
+        if os.path.getmtime(path) + self.ttl_sec < time.time():
+            self._remove(path)
+            return None
+
+        try:
+            with pa.memory_map(path, "r") as source:
+                reader = ipc.open_file(source)
+                meta = json.loads(reader.schema.metadata[METADATA_KEY])
+                batch_rows = int(meta["batch_rows"])
+                first = offset // batch_rows
+                last = min(reader.num_record_batches, -(-(offset + page_size) // batch_rows))
+                batches = [reader.get_batch(i) for i in range(first, last)]
+                table = pa.Table.from_batches(batches, schema=reader.schema)
+                # buffers keep the mapping alive after the file is closed
+                table = table.slice(offset - first * batch_rows, page_size)
+            os.utime(path)  # sliding TTL + LRU order for eviction
+        except FileNotFoundError:
+            return None  # evicted by another worker meanwhile
+
+        meta["expires_at"] = time.time() + self.ttl_sec
+        return table.replace_schema_metadata(None), meta
+
+    def load(self, result_id: str) -> Optional[Tuple[pa.Table, Dict[str, Any]]]:
+        """
+        The whole result (for derived artifacts such as charts).
+        """
+        return self.page(result_id, 0, 1 << 62)
+
+    def get_artifact(self, result_id: str, name: str) -> Optional[bytes]:
+        path = self._path(result_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(f"{path[:-len(_SUFFIX)]}.{name}", "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put_artifact(self, result_id: str, name: str, data: bytes) -> None:
+        path = self._path(result_id)
+        if path is None:
+            raise ValueError(f"Invalid result id: {result_id!r}")
+        target = f"{path[:-len(_SUFFIX)]}.{name}"
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def _remove(self, path: str) -> None:
+        # the result and its artifacts
+        paths = glob.glob(f"{path[:-len(_SUFFIX)]}.*") if path.endswith(_SUFFIX) else [path]
+        for p in paths:
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        now = time.time()
+        files: List[Tuple[float, int, str]] = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.endswith(_SUFFIX):
+                if st.st_mtime + self.ttl_sec < now:
+                    self._remove(path)
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+            elif name.endswith(".tmp"):
+                if st.st_mtime + 3600 < now:
+                    self._remove(path)  # left behind by a crashed writer
+            elif not os.path.exists(os.path.join(self.root, name.split(".", 1)[0] + _SUFFIX)):
+                self._remove(path)  # artifact of an evicted result
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                self._remove(path)
+                total -= size
+
+
+_store: Optional[ResultStore] = None
+
+
+def get_store() -> ResultStore:
+    global _store
+    if _store is None:
+        _store = ResultStore()
+    return _store
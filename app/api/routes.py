@@ -1,20 +1,63 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, List
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, Literal, Optional, List
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.graph.text2sql_graph import run_text2sql
+from app.api import result_formats
+from app.api.charts import chart_spec, prebuild_chart
+from app.api.result_store import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, get_store
+from app.api.jobs import JobQueueFull, get_runner
+from app.api.warmup import readiness
+from app.audit.profiling import PROFILE_HEADER, PROFILE_HEADER_ENABLED, load_profile, parse_mode, profile_call
+from app.db.slow_queries import get_slow_query_store
+from app.graph.text2sql_batch import BATCH_LLM_CONCURRENCY, BATCH_MAX_QUESTIONS, run_text2sql_batch
+from app.graph.text2sql_graph import explain_by_id, run_text2sql
+from app.state.checkpoints import CHECKPOINT_KEY_RE
+from app.state.sessions import SESSION_ID_RE, get_session_store
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
 
 class Text2SQLRequest(BaseModel):
     question: str = Field(..., description="User natural language question")
     top_k_schema: int = Field(5, ge=1, le=20)
     return_rows: int = Field(20, ge=1, le=500)
-    enable_viz: bool = Field(False, description="Reserved for future chart generation")
+    enable_viz: bool = Field(False, description="Build a Vega-Lite chart in the background (GET chart_url)")
+    result_format: Optional[Literal["markdown", "json", "arrow", "parquet"]] = Field(
+        None, description="Default: from the Accept header, else markdown preview only"
+    )
+    compression: Optional[Literal["none", "lz4", "zstd", "snappy", "gzip"]] = Field(
+        None, description="Codec for arrow (lz4 | zstd) / parquet results"
+    )
+    session_id: Optional[str] = Field(
+        None, pattern=SESSION_ID_RE.pattern, description="Conversation id chosen by the client; enables follow-ups"
+    )
+    followup: Optional[bool] = Field(
+        None, description="Edit the session's previous SQL (true), start over (false), or auto-detect (null)"
+    )
+    explain: Literal["none", "deferred", "inline"] = Field(
+        "inline", description="deferred: no LLM explanation now, fetch it from GET /api/explain/{explain_id}"
+    )
+    role: Optional[str] = Field(None, max_length=64, description="Caller role; recorded in the query log")
+    debug: bool = Field(False, description="Include the full rewriter / generator / validator outputs in debug")
+    idempotency_key: Optional[str] = Field(
+        None,
+        pattern=CHECKPOINT_KEY_RE.pattern,
+        description="Checkpoint stages under this key (or the Idempotency-Key header); a retry resumes",
+    )
+    resume_from: Optional[Literal["rewrite", "schema_rag", "sql_generation", "sql_validation", "sql_execution"]] = Field(
+        None, description="Re-run from this stage, reusing the key's earlier checkpoints (needs idempotency_key)"
+    )
 
 
 class Text2SQLResponse(BaseModel):
@@ -28,6 +71,16 @@ class Text2SQLResponse(BaseModel):
     debug: Optional[Dict[str, Any]] = None
     message: Optional[str] = None
     stage: Optional[str] = None
+    session_id: Optional[str] = None
+    explain_id: Optional[str] = None
+    # full result kept server-side: GET /api/results/{result_id}?cursor={next_cursor}
+    result_id: Optional[str] = None
+    next_cursor: Optional[str] = None
+    chart_url: Optional[str] = None
+    # result_format=json
+    row_count: Optional[int] = None
+    columns: Optional[List[str]] = None
+    rows: Optional[List[Dict[str, Any]]] = None
 
 
 @router.get("/")
@@ -36,7 +89,14 @@ def api_root() -> Dict[str, Any]:
         "message": "GARV API router is active",
         "endpoints": {
             "health": "/api/health",
+            "ready": "/api/ready",
             "text2sql": "/api/text2sql",
+            "text2sql_batch": "/api/text2sql/batch",
+            "jobs": "/api/jobs",
+            "results": "/api/results/{result_id}",
+            "charts": "/api/charts/{result_id}",
+            "sessions": "/api/sessions/{session_id}",
+            "explain": "/api/explain/{explain_id}",
         },
     }
 
@@ -46,43 +106,426 @@ def health() -> Dict[str, Any]:
     return {"status": "ok"}
 
 
-@router.post("/text2sql", response_model=Text2SQLResponse)
-def text2sql(req: Text2SQLRequest) -> Dict[str, Any]:
+@router.get("/ready")
+def ready():
+    """
+    Readiness (vs. liveness above): 503 until models, schema index and DuckDB are warm.
+    """
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+def _run_pipeline(req: Dict[str, Any], on_stage=None) -> Dict[str, Any]:
+    """
+    run_text2sql with conversation state: the session's last state goes in,
+    the new one is kept when the turn succeeds.
+    """
+    session_id = req.get("session_id")
+    previous = get_session_store().load(session_id) if session_id else None
+    out = run_text2sql(
+        user_question=req["question"],
+        top_k_schema=req["top_k_schema"],
+        return_rows=req["return_rows"],
+        enable_viz=req["enable_viz"],
+        on_stage=on_stage,
+        previous=previous,
+        followup=req.get("followup"),
+        explain=req.get("explain", "inline"),
+        role=req.get("role"),
+        debug=req.get("debug", False),
+        checkpoint_key=req.get("idempotency_key"),
+        resume_from=req.get("resume_from"),
+    )
+    if session_id:
+        out["session_id"] = session_id
+        if out.get("ok") and out.get("state") is not None:
+            get_session_store().save(session_id, out["state"])
+    return out
+
+
+def _spill(out: Dict[str, Any], preview_rows: int, chart: bool = False) -> None:
+    """
+    Keep the full result server-side; the cursor continues after the preview rows.
+    chart: queue a chart build for the stored result (never waited for here).
+    """
+    if not out.get("ok") or out.get("result_id"):
+        return
+    try:
+        result_id = get_store().put(out.get("result"), {"sql": out.get("final_sql")})
+    except Exception:
+        logger.warning("Could not store result", exc_info=True)
+        return
+    row_count = out.get("row_count") or 0
+    out["result_id"] = result_id
+    out["next_cursor"] = encode_cursor(preview_rows) if result_id and row_count > preview_rows else None
+    if chart and result_id:
+        prebuild_chart(result_id)
+        out["chart_url"] = f"/api/charts/{result_id}"
+
+
+def _to_response(out: Dict[str, Any], include_rows: bool = False) -> Dict[str, Any]:
+    if out.get("ok"):
+        resp = {
+            "ok": True,
+            "final_sql": out.get("final_sql"),
+            "preview_markdown": out.get("preview_markdown"),
+            "explanation": out.get("explanation"),
+            "intent": out.get("intent"),
+            "entities": out.get("entities"),
+            "retrieved_tables": out.get("retrieved_tables"),
+            "debug": out.get("debug"),
+            "session_id": out.get("session_id"),
+            "explain_id": out.get("explain_id"),
+            "result_id": out.get("result_id"),
+            "next_cursor": out.get("next_cursor"),
+            "chart_url": out.get("chart_url"),
+            "row_count": out.get("row_count"),
+        }
+        if include_rows:
+            resp["columns"], resp["rows"] = result_formats.json_rows(out.get("result"))
+        return resp
+
+    return {
+        "ok": False,
+        "stage": out.get("stage"),
+        "message": out.get("message"),
+        "intent": out.get("intent"),
+        "entities": out.get("entities"),
+        "retrieved_tables": out.get("retrieved_tables"),
+        "debug": out.get("debug"),
+        "session_id": out.get("session_id"),
+    }
+
+
+def _binary_result(out: Dict[str, Any], fmt: str, compression: Optional[str]) -> Response:
+    if not out.get("ok"):
+        # nothing to encode: report the pipeline failure as JSON
+        return JSONResponse(_to_response(out), status_code=422)
+
+    meta = {k: v for k, v in _to_response(out).items() if k != "preview_markdown"}
+    table = result_formats.to_arrow(out.get("result"), meta)
+    body = result_formats.encode(table, fmt, compression)
+    return Response(
+        content=body,
+        media_type=result_formats.BINARY_FORMATS[fmt],
+        headers={"X-Row-Count": str(table.num_rows), "X-Result-Format": fmt},
+    )
+
+
+@router.post(
+    "/text2sql",
+    response_model=Text2SQLResponse,
+    responses={
+        200: {"content": {result_formats.ARROW_STREAM_MIME: {}, result_formats.PARQUET_MIME: {}}},
+        422: {"description": "Pipeline failed (binary formats only)"},
+    },
+)
+def text2sql(req: Text2SQLRequest, request: Request) -> Any:
     """
     Runs the full Text2SQL pipeline and returns:
     - final_sql
     - preview markdown
     - explanation
+    - optionally the full result as JSON rows, Arrow IPC or Parquet (see result_formats)
+    - result_id / next_cursor to page through the full result (GET /api/results/{id})
     """
+    fmt = result_formats.negotiate(req.result_format, request.headers.get("accept"))
+    if fmt == "arrow" and req.compression in ("snappy", "gzip"):
+        raise HTTPException(status_code=400, detail="Arrow IPC supports lz4 or zstd compression")
+
+    body = req.model_dump()
+    if body["idempotency_key"] is None and request.headers.get(IDEMPOTENCY_HEADER):
+        body["idempotency_key"] = request.headers[IDEMPOTENCY_HEADER]
+        if not CHECKPOINT_KEY_RE.match(body["idempotency_key"]):
+            raise HTTPException(status_code=400, detail=f"Invalid {IDEMPOTENCY_HEADER} header")
+    if body["resume_from"] and not body["idempotency_key"]:
+        raise HTTPException(status_code=400, detail="resume_from needs an idempotency key")
+
+    # X-Profile: sample | cprofile -> debug.profile (+ GET /api/profiles/{profile_id}); off unless enabled
+    profile_mode = parse_mode(request.headers.get(PROFILE_HEADER)) if PROFILE_HEADER_ENABLED else None
+
     try:
-        out = run_text2sql(
-            user_question=req.question,
+        if profile_mode is None:
+            out = _run_pipeline(body)
+        else:
+            out, profile = profile_call(
+                _run_pipeline, body, mode=profile_mode, request_id=request.headers.get("x-request-id")
+            )
+            out["debug"] = {**(out.get("debug") or {}), "profile": profile}
+        _spill(out, req.return_rows, chart=req.enable_viz)
+        if fmt in result_formats.BINARY_FORMATS:
+            return _binary_result(out, fmt, req.compression)
+        return _to_response(out, include_rows=fmt == "json")
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# -----------------------------
+# Batch (NDJSON stream)
+# -----------------------------
+class Text2SQLBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUESTIONS)
+    top_k_schema: int = Field(5, ge=1, le=20)
+    return_rows: int = Field(20, ge=1, le=500)
+    concurrency: int = Field(BATCH_LLM_CONCURRENCY, ge=1, le=32, description="Max LLM pipelines in flight")
+    result_format: Literal["markdown", "json"] = Field("markdown", description="json adds columns/rows per line")
+    explain: Literal["none", "deferred", "inline"] = Field("inline", description="See Text2SQLRequest.explain")
+
+
+@router.post("/text2sql/batch")
+def text2sql_batch(req: Text2SQLBatchRequest) -> StreamingResponse:
+    """
+    Streams one JSON line per input question, in completion order:
+      {"index": i, "question": ..., "duplicate_of": j | null, ...Text2SQLResponse}
+    followed by a summary line {"done": true, ...}.
+    """
+    def _lines() -> Iterator[str]:
+        t0 = time.perf_counter()
+        unique = 0
+        for indices, _question, out in run_text2sql_batch(
+            req.questions,
             top_k_schema=req.top_k_schema,
             return_rows=req.return_rows,
-            enable_viz=req.enable_viz,
+            concurrency=req.concurrency,
+            explain=req.explain,
+        ):
+            unique += 1
+            _spill(out, req.return_rows)
+            resp = Text2SQLResponse(**_to_response(out, include_rows=req.result_format == "json")).model_dump()
+            for i in indices:
+                line = {
+                    "index": i,
+                    "question": req.questions[i],
+                    "duplicate_of": indices[0] if i != indices[0] else None,
+                    **resp,
+                }
+                yield json.dumps(line, default=str) + "\n"
+        yield json.dumps({
+            "done": True,
+            "questions": len(req.questions),
+            "unique": unique,
+            "seconds": round(time.perf_counter() - t0, 3),
+        }) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+# -----------------------------
+# Async jobs (long-running questions)
+# -----------------------------
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    poll: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    stages: Dict[str, Any] = Field(default_factory=dict)
+    result: Optional[Text2SQLResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+def _run_job(request: Dict[str, Any], on_stage) -> Dict[str, Any]:
+    out = _run_pipeline(request, on_stage=on_stage)
+    _spill(out, request["return_rows"], chart=request["enable_viz"])
+    return Text2SQLResponse(**_to_response(out)).model_dump()
+
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+def submit_job(req: Text2SQLRequest) -> Dict[str, Any]:
+    """
+    Queue a question and return immediately; poll GET /api/jobs/{job_id}.
+    """
+    try:
+        job_id = get_runner().submit(req.model_dump(), _run_job)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job_id, "status": "queued", "poll": f"/api/jobs/{job_id}"}
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = get_runner().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return {"job_id": job_id, **job}
+
+
+# -----------------------------
+# Server-side result sets (cursor pagination)
+# -----------------------------
+class ResultPageResponse(BaseModel):
+    result_id: str
+    offset: int
+    row_count: int
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    expires_at: float
+
+
+@router.get(
+    "/results/{result_id}",
+    response_model=ResultPageResponse,
+    responses={200: {"content": {result_formats.ARROW_STREAM_MIME: {}, result_formats.PARQUET_MIME: {}}}},
+)
+def get_result_page(
+    result_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    result_format: Optional[Literal["json", "arrow", "parquet"]] = None,
+) -> Any:
+    """
+    One page of a stored result; follow next_cursor until it is null.
+    The SQL is not re-run.
+    """
+    try:
+        offset = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    page = get_store().page(result_id, offset, page_size)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result id")
+    table, meta = page
+
+    end = offset + table.num_rows
+    next_cursor = encode_cursor(end) if end < meta["row_count"] else None
+
+    fmt = result_formats.negotiate(result_format, request.headers.get("accept"))
+    if fmt in result_formats.BINARY_FORMATS:
+        return Response(
+            content=result_formats.encode(table, fmt),
+            media_type=result_formats.BINARY_FORMATS[fmt],
+            headers={
+                "X-Row-Count": str(meta["row_count"]),
+                "X-Next-Cursor": next_cursor or "",
+                "X-Result-Format": fmt,
+            },
         )
 
-        if out.get("ok"):
-            return {
-                "ok": True,
-                "final_sql": out.get("final_sql"),
-                "preview_markdown": out.get("preview_markdown"),
-                "explanation": out.get("explanation"),
-                "intent": out.get("intent"),
-                "entities": out.get("entities"),
-                "retrieved_tables": out.get("retrieved_tables"),
-                "debug": out.get("debug"),
-            }
-
-        return {
-            "ok": False,
-            "stage": out.get("stage"),
-            "message": out.get("message"),
-            "intent": out.get("intent"),
-            "entities": out.get("entities"),
-            "retrieved_tables": out.get("retrieved_tables"),
-            "debug": out.get("debug"),
-        }
+    columns, rows = result_formats.json_rows(table.to_pandas())
+    return {
+        "result_id": result_id,
+        "offset": offset,
+        "row_count": meta["row_count"],
+        "columns": columns,
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "expires_at": meta["expires_at"],
+    }
+
+
+# -----------------------------
+# Charts (built off the request path)
+# -----------------------------
+class ChartResponse(BaseModel):
+    result_id: str
+    spec: Optional[Dict[str, Any]] = None  # Vega-Lite; null when the result has nothing to chart
+    cached: bool
+
+
+@router.get("/charts/{result_id}", response_model=ChartResponse)
+def get_chart(result_id: str) -> Dict[str, Any]:
+    try:
+        built = chart_spec(result_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if built is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result id")
+    spec, cached = built
+    return {"result_id": result_id, "spec": spec, "cached": cached}
 
+
+# -----------------------------
+# Conversation sessions
+# -----------------------------
+@router.delete("/sessions/{session_id}")
+def delete_session(session_id: str) -> Dict[str, Any]:
+    """
+    Forget a conversation; the next question starts from scratch.
+    """
+    return {"session_id": session_id, "deleted": get_session_store().delete(session_id)}
+
+
+# -----------------------------
+# Explanations (deferred / cached)
+# -----------------------------
+class ExplainResponse(BaseModel):
+    explain_id: str
+    explanation: Dict[str, Any]
+    cached: bool
+
+
+@router.get("/explain/{explain_id}", response_model=ExplainResponse)
+def get_explanation(explain_id: str) -> Dict[str, Any]:
+    """
+    Explanation for a previous answer; generated on the first request, then cached.
+    """
+    try:
+        hit = explain_by_id(explain_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    if hit is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explain id")
+    explanation, cached = hit
+    return {"explain_id": explain_id, "explanation": explanation, "cached": cached}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str) -> FileResponse:
+    """
+    Profile saved for a request sent with X-Profile (debug.profile.profile_id):
+    collapsed stacks (text) or a pstats file.
+    """
+    found = load_profile(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired profile id")
+    path, mode = found
+    if mode == "sample":
+        return FileResponse(path, media_type="text/plain")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
+# -----------------------------
+# Slow queries (EXPLAIN ANALYZE captures)
+# -----------------------------
+class SlowQuery(BaseModel):
+    id: str
+    created_at: float
+    sql: str
+    question: Optional[str] = None
+    seconds: float
+    rows: Optional[int] = None
+    status: str  # pending | captured | failed
+    summary: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class SlowQueryDetail(SlowQuery):
+    profile: Optional[Dict[str, Any]] = None
+
+
+@router.get("/slow-queries", response_model=List[SlowQuery])
+def list_slow_queries(limit: int = Query(50, ge=1, le=500)) -> List[Dict[str, Any]]:
+    """
+    Queries that ran longer than SLOW_QUERY_SEC, newest first (totals only; operators per id).
+    """
+    return get_slow_query_store().list(limit)
+
+
+@router.get("/slow-queries/{slow_query_id}", response_model=SlowQueryDetail)
+def get_slow_query(slow_query_id: str) -> Dict[str, Any]:
+    """
+    Plan of one slow query: operators with timing / cardinality / rows scanned + the raw DuckDB profile.
+    """
+    item = get_slow_query_store().get(slow_query_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Unknown slow query id")
+    return item
@@ -0,0 +1,116 @@
+# app/api/server.py
+"""
+Pre-fork API server.
+
+uvicorn's own --workers spawns fresh interpreters, so every worker loads the
+embedding model again. Here the parent loads the read-only assets once
+(warm_shared), freezes the GC so those objects' pages stay untouched, binds
+the socket and forks N uvicorn workers that all accept on it. Workers only
+warm per-process resources (schema index, DuckDB, LLM client): open SQLite /
+DuckDB connections must not be inherited across fork().
+
+The parent supervises: crashed workers are replaced, SIGINT/SIGTERM stop all.
+Platforms without fork fall back to a single process.
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    from app.main import build_api
+
+    config = uvicorn.Config(build_api(), log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: int = 1, log_level: str = "info") -> None:
+    import uvicorn
+
+    from app.api.warmup import warm_shared
+    from app.main import build_api
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.run(build_api(), host=host, port=port, log_level=log_level)
+        return
+
+    # HF tokenizers' thread pool must not be live across fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # a read-write DuckDB connection locks the file for one process
+    os.environ.setdefault("DUCKDB_READ_ONLY", "true")
+
+    t0 = time.perf_counter()
+    if not warm_shared():
+        logger.warning("Shared warm-up failed; workers will retry on their own")
+    print(f"✅ Shared assets loaded in {time.perf_counter() - t0:.1f}s, forking {workers} workers")
+
+    sock = _bind(host, port)
+    gc.collect()
+    gc.freeze()  # keep the GC from writing to pre-fork objects (breaks copy-on-write)
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def _spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                _run_worker(sock, log_level)
+            except BaseException:
+                logger.exception("Worker %s crashed", os.getpid())
+                code = 1
+            os._exit(code)
+        children[pid] = slot
+
+    def _stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    for slot in range(workers):
+        _spawn(slot)
+    print(f"✅ API listening on http://{host}:{port} with workers {sorted(children)}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            logger.warning("Worker %s exited (status %s); restarting", pid, status)
+            time.sleep(1)
+            _spawn(slot)
+
+    sock.close()
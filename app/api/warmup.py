@@ -0,0 +1,139 @@
+# app/api/warmup.py
+"""
+Warm-up of the heavy resources behind /api/text2sql, so the first user request
+doesn't pay for model loading.
+
+  warm_shared()   read-only assets: embedding model, schema catalog. Safe to
+                  load before fork -> pages shared copy-on-write.
+  warm_process()  per-process resources that must not cross a fork: Chroma
+                  schema index (its SQLite connection), DuckDB connection,
+                  LLM client.
+
+/api/health is liveness (process up). /api/ready is readiness: 503 until
+warm_all() has finished in this process.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+# a real LLM round trip loads the model in Ollama, but costs quota on hosted providers
+WARMUP_LLM_CALL = os.getenv("WARMUP_LLM_CALL", "false").lower() == "true"
+
+_status: Dict[str, Any] = {
+    "ready": False,
+    "phase": "cold",
+    "shared_warm": False,
+    "steps": {},
+    "errors": {},
+}
+_lock = threading.Lock()
+
+
+def _step(name: str, fn: Callable[[], Any], required: bool = True) -> bool:
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        _status["errors"][name] = str(e)
+        logger.warning("Warm-up step %s failed: %s", name, e, exc_info=required)
+        return not required
+    _status["steps"][name] = round(time.perf_counter() - t0, 3)
+    logger.info("Warm-up step %s done in %.2fs", name, _status["steps"][name])
+    return True
+
+
+def _warm_embeddings() -> None:
+    from app.rag.embeddings_factory import get_embeddings
+
+    get_embeddings().embed_query("airport security wait time")
+
+
+def _warm_schema_index() -> None:
+    from app.rag.schema_index import get_schema_vectorstore
+
+    get_schema_vectorstore().similarity_search("average security wait per airport", k=1)
+
+
+def _warm_catalog() -> None:
+    from app.db.duckdb_client import get_schema_version
+
+    get_schema_version()
+
+
+def _warm_duckdb() -> None:
+    from app.db.duckdb_client import get_conn
+
+    conn = get_conn()
+    # touches the catalog and the first blocks of every table
+    for (table,) in conn.execute("SELECT table_name FROM information_schema.tables").fetchall():
+        conn.execute(f"SELECT * FROM {table} LIMIT 1").fetchall()
+    conn.close()
+
+
+def _warm_llm() -> None:
+    from app.agents.llm_factory import get_llm
+
+    llm = get_llm()
+    if WARMUP_LLM_CALL:
+        llm.invoke("ping")
+
+
+def warm_shared() -> bool:
+    """
+    Load read-only assets. Call before forking workers.
+    """
+    with _lock:
+        if _status["shared_warm"]:
+            return True
+        _status["phase"] = "warming_shared"
+        ok = all([
+            _step("embeddings", _warm_embeddings),
+            _step("catalog", _warm_catalog),
+        ])
+        _status["shared_warm"] = ok
+        return ok
+
+
+def warm_process() -> bool:
+    with _lock:
+        _status["phase"] = "warming_process"
+        return all([
+            # Chroma's persistent client holds an open SQLite connection: opened after fork
+            _step("schema_index", _warm_schema_index),
+            _step("duckdb", _warm_duckdb),
+            _step("llm", _warm_llm, required=False),
+        ])
+
+
+def warm_all() -> bool:
+    t0 = time.perf_counter()
+    ok = warm_shared() and warm_process()
+    _status["ready"] = ok
+    _status["phase"] = "ready" if ok else "failed"
+    _status["warm_seconds"] = round(time.perf_counter() - t0, 3)
+    return ok
+
+
+def readiness() -> Dict[str, Any]:
+    return {**_status, "pid": os.getpid()}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    FastAPI lifespan: warm in a background thread so liveness answers immediately
+    and /api/ready flips once everything is loaded.
+    """
+    if WARMUP_ON_START:
+        threading.Thread(target=warm_all, name="warmup", daemon=True).start()
+    else:
+        _status.update({"ready": True, "phase": "ready"})
+    yield
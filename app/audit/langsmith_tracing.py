@@ -6,6 +6,8 @@ from contextlib import contextmanager
 
 from dotenv import load_dotenv
 
+from app.audit.local_tracing import record
+
 try:
     # works with langsmith 0.2.x
     from langsmith import traceable
@@ -32,9 +34,11 @@ def tracing_session():
 def traceable_fn(name: str):
     """
     Decorator helper to make any function show up in LangSmith traces.
-    If tracing isn't installed/available, it becomes a no-op.
+    If tracing isn't installed/available, only the local span recorder applies
+    (app/audit/local_tracing.py; LOCAL_TRACE_ENABLED=false turns that off too).
     """
     def decorator(fn):
+        fn = record(name)(fn)
         if traceable is None:
             return fn
         return traceable(name=name)(fn)
@@ -0,0 +1,416 @@
+# app/audit/local_tracing.py
+"""
+Local span recorder: traces without LangSmith (air-gapped boxes).
+
+traceable_fn() wraps every agent with record(); nested calls become child
+spans of the same trace through a contextvar. A span is a small tuple (ids,
+name, start, duration, truncated inputs / output, error) put on a queue;
+a daemon thread drains the queue in batches into
+
+  sqlite  <LOCAL_TRACE_DIR>/spans.sqlite   (oldest rows pruned past LOCAL_TRACE_MAX_SPANS)
+  jsonl   <LOCAL_TRACE_DIR>/spans.jsonl    (rotated at LOCAL_TRACE_MAX_BYTES, LOCAL_TRACE_KEEP files)
+
+so the traced call only pays for two ids, two clocks and a queue put (see
+`bench`). Inputs are summarized by type (strings cut to LOCAL_TRACE_MAX_CHARS,
+DataFrames as their shape), never repr()'d whole.
+
+CLI:
+  python -m app.audit.local_tracing slowest [--limit 20]
+  python -m app.audit.local_tracing flame <trace_id>
+  python -m app.audit.local_tracing summary
+  python -m app.audit.local_tracing bench
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import functools
+import glob
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TRACE_ENABLED = os.getenv("LOCAL_TRACE_ENABLED", "true").lower() == "true"
+LOCAL_TRACE_SINK = os.getenv("LOCAL_TRACE_SINK", "sqlite")  # sqlite | jsonl
+LOCAL_TRACE_DIR = os.getenv("LOCAL_TRACE_DIR", os.path.join("data", "traces"))
+LOCAL_TRACE_MAX_CHARS = int(os.getenv("LOCAL_TRACE_MAX_CHARS", "300"))
+LOCAL_TRACE_MAX_SPANS = int(os.getenv("LOCAL_TRACE_MAX_SPANS", "200000"))
+LOCAL_TRACE_MAX_BYTES = int(os.getenv("LOCAL_TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+LOCAL_TRACE_KEEP = int(os.getenv("LOCAL_TRACE_KEEP", "5"))
+FLUSH_SEC = 0.5
+FLUSH_SPANS = 500
+
+COLUMNS = (
+    "trace_id", "span_id", "parent_id", "name", "start", "duration_ms",
+    "inputs", "output", "error", "pid", "thread",
+)
+
+# (trace_id, span_id) of the innermost open span
+_current: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    cur = _current.get()
+    return cur[0] if cur else None
+
+
+# -----------------------------
+# Cheap summaries
+# -----------------------------
+def _summarize(v: Any, limit: int = LOCAL_TRACE_MAX_CHARS) -> Any:
+    if v is None or isinstance(v, (bool, int, float)):
+        return v
+    if isinstance(v, str):
+        return v if len(v) <= limit else v[:limit] + f"…(+{len(v) - limit})"
+    if isinstance(v, dict):
+        items = list(v.items())[:20]
+        return {str(k): _summarize(x, limit // 2 or 1) for k, x in items}
+    if isinstance(v, (list, tuple)):
+        return [_summarize(x, limit // 2 or 1) for x in v[:10]] + ([f"…(+{len(v) - 10})"] if len(v) > 10 else [])
+    shape = getattr(v, "shape", None)
+    if shape is not None:
+        return f"<{type(v).__name__} shape={tuple(shape)}>"
+    return f"<{type(v).__name__}>"
+
+
+# -----------------------------
+# Background writer
+# -----------------------------
+class _Writer:
+    def __init__(self, sink: str = LOCAL_TRACE_SINK, root: str = LOCAL_TRACE_DIR):
+        self.sink = sink
+        self.root = root
+        self.queue: "queue.SimpleQueue[tuple]" = queue.SimpleQueue()
+        self.pid = os.getpid()
+        self.dropped = 0
+        os.makedirs(root, exist_ok=True)
+        if sink == "sqlite":
+            with self._db() as db:
+                db.execute("PRAGMA journal_mode=WAL;")
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS spans (
+                        trace_id TEXT, span_id TEXT PRIMARY KEY, parent_id TEXT,
+                        name TEXT, start REAL, duration_ms REAL,
+                        inputs TEXT, output TEXT, error TEXT, pid INTEGER, thread TEXT
+                    )
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS spans_trace ON spans(trace_id)")
+                db.execute("CREATE INDEX IF NOT EXISTS spans_root ON spans(parent_id, duration_ms)")
+        self.thread = threading.Thread(target=self._loop, name="trace-writer", daemon=True)
+        self.thread.start()
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(os.path.join(self.root, "spans.sqlite"), timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def close(self) -> None:
+        """
+        Flush what is queued and stop the thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_SEC
+            while len(batch) < FLUSH_SPANS and batch[-1] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stop = True
+                batch.pop()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception:
+                self.dropped += len(batch)
+                logger.warning("Dropped %d spans", len(batch), exc_info=True)
+
+    def _write(self, batch: List[tuple]) -> None:
+        if self.sink == "jsonl":
+            path = os.path.join(self.root, "spans.jsonl")
+            with open(path, "a", encoding="utf-8") as f:
+                for row in batch:
+                    f.write(json.dumps(dict(zip(COLUMNS, row)), default=str, ensure_ascii=False) + "\n")
+            if os.path.getsize(path) > LOCAL_TRACE_MAX_BYTES:
+                self._rotate(path)
+            return
+
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [r[:6] + (json.dumps(r[6], default=str), json.dumps(r[7], default=str)) + r[8:] for r in batch],
+            )
+            db.execute(
+                "DELETE FROM spans WHERE rowid <= (SELECT max(rowid) FROM spans) - ?", (LOCAL_TRACE_MAX_SPANS,)
+            )
+
+    def _rotate(self, path: str) -> None:
+        for i in range(LOCAL_TRACE_KEEP - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+        stale = f"{path}.{LOCAL_TRACE_KEEP + 1}"
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    w = _writer
+    if w is not None and w.pid == os.getpid():
+        return w
+    with _writer_lock:
+        # first span, or first span after a fork (threads don't survive fork)
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = _Writer()
+        return _writer
+
+
+# -----------------------------
+# Recording
+# -----------------------------
+def _open() -> Tuple[Tuple[str, str], Optional[Tuple[str, str]], contextvars.Token]:
+    parent = _current.get()
+    ids = (parent[0] if parent else os.urandom(16).hex(), os.urandom(8).hex())
+    return ids, parent, _current.set(ids)
+
+
+def _close(
+    name: str,
+    ids: Tuple[str, str],
+    parent: Optional[Tuple[str, str]],
+    token: contextvars.Token,
+    start: float,
+    t0: int,
+    inputs: Any,
+    output: Any,
+    error: Optional[BaseException],
+) -> None:
+    duration_ms = (time.perf_counter_ns() - t0) / 1e6
+    _current.reset(token)
+    # a tuple, not a dict: the writer thread builds the row
+    _get_writer().queue.put((
+        ids[0], ids[1], parent[1] if parent else None, name, start, duration_ms,
+        inputs, _summarize(output),
+        f"{type(error).__name__}: {error}"[:LOCAL_TRACE_MAX_CHARS] if error is not None else None,
+        os.getpid(), threading.current_thread().name,
+    ))
+
+
+@contextmanager
+def span(name: str, inputs: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Record a block as a span; set rec["output"] inside the block to record an output.
+    """
+    rec: Dict[str, Any] = {"output": None}
+    if not LOCAL_TRACE_ENABLED:
+        yield rec
+        return
+    ids, parent, token = _open()
+    start, t0 = time.time(), time.perf_counter_ns()
+    try:
+        yield rec
+    except BaseException as e:
+        _close(name, ids, parent, token, start, t0, _summarize(inputs), None, e)
+        raise
+    _close(name, ids, parent, token, start, t0, _summarize(inputs), rec["output"], None)
+
+
+def record(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator: each call is a span named `name` with summarized args / result.
+    """
+    def decorator(fn: Callable) -> Callable:
+        if not LOCAL_TRACE_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            ids, parent, token = _open()
+            start, t0 = time.time(), time.perf_counter_ns()
+            try:
+                out = fn(*args, **kwargs)
+            except BaseException as e:
+                _close(name, ids, parent, token, start, t0, _inputs(args, kwargs), None, e)
+                raise
+            _close(name, ids, parent, token, start, t0, _inputs(args, kwargs), out, None)
+            return out
+
+        return wrapper
+
+    return decorator
+
+
+def _inputs(args: tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    inputs = _summarize(kwargs) if kwargs else {}
+    if args:
+        inputs["args"] = _summarize(list(args))
+    return inputs
+
+
+# -----------------------------
+# Reading (CLI)
+# -----------------------------
+def load_spans(root: str = LOCAL_TRACE_DIR, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    spans: List[Dict[str, Any]] = []
+    db_path = os.path.join(root, "spans.sqlite")
+    if os.path.exists(db_path):
+        db = sqlite3.connect(db_path)
+        db.row_factory = sqlite3.Row
+        sql = "SELECT * FROM spans" + (" WHERE trace_id = ?" if trace_id else "")
+        spans.extend(dict(r) for r in db.execute(sql, (trace_id,) if trace_id else ()))
+        db.close()
+    for path in sorted(glob.glob(os.path.join(root, "spans.jsonl*"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    s = json.loads(line)
+                except ValueError:
+                    continue  # partial last line of a live file
+                if trace_id is None or s["trace_id"] == trace_id:
+                    spans.append(s)
+    return spans
+
+
+def slowest(spans: List[Dict[str, Any]], limit: int = 20) -> List[Dict[str, Any]]:
+    roots = [s for s in spans if not s["parent_id"]]
+    return sorted(roots, key=lambda s: s["duration_ms"], reverse=True)[:limit]
+
+
+def flame_lines(spans: List[Dict[str, Any]], width: int = 40) -> List[str]:
+    """
+    Indented span tree of one trace: total / self time and a bar relative to the root.
+    """
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        children.setdefault(s["parent_id"], []).append(s)
+    roots = children.get(None, []) + [s for s in spans if s["parent_id"] and s["parent_id"] not in {x["span_id"] for x in spans}]
+    total = max((r["duration_ms"] for r in roots), default=0.0) or 1.0
+    lines: List[str] = []
+
+    def walk(s: Dict[str, Any], depth: int) -> None:
+        kids = sorted(children.get(s["span_id"], []), key=lambda k: k["start"])
+        self_ms = s["duration_ms"] - sum(k["duration_ms"] for k in kids)
+        bar = "█" * max(1, round(width * s["duration_ms"] / total))
+        err = "  ✗ " + s["error"] if s.get("error") else ""
+        lines.append(
+            f"{'  ' * depth}{s['name']:<{30 - 2 * min(depth, 10)}} {s['duration_ms']:>10.1f} ms "
+            f"(self {self_ms:>8.1f}) {bar}{err}"
+        )
+        for k in kids:
+            walk(k, depth + 1)
+
+    for r in sorted(roots, key=lambda r: r["start"]):
+        walk(r, 0)
+    return lines
+
+
+def summary_rows(spans: List[Dict[str, Any]]) -> List[Tuple[str, int, float, float, float, int]]:
+    by_name: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s["duration_ms"])
+        errors[s["name"]] = errors.get(s["name"], 0) + (1 if s.get("error") else 0)
+    rows = []
+    for name, ds in by_name.items():
+        ds.sort()
+        rows.append((name, len(ds), ds[len(ds) // 2], ds[min(len(ds) - 1, int(len(ds) * 0.95))], sum(ds), errors[name]))
+    return sorted(rows, key=lambda r: r[4], reverse=True)
+
+
+def bench(n: int = 100_000) -> Dict[str, float]:
+    """
+    Per-span overhead of record() on a no-op function, in microseconds, with
+    the writer draining into a throwaway directory (the real store is untouched).
+    """
+    global _writer
+
+    def noop(x, y=None):
+        return x
+
+    traced = record("bench")(noop)
+    saved = _writer
+    with tempfile.TemporaryDirectory() as tmp:
+        _writer = _Writer(root=tmp)
+        try:
+            t0 = time.perf_counter()
+            for i in range(n):
+                noop(i, y="abc")
+            base = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for i in range(n):
+                traced(i, y="abc")
+            spent = time.perf_counter() - t0
+        finally:
+            _writer.close()
+            _writer = saved
+    return {"spans": n, "overhead_us_per_span": (spent - base) / n * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect locally recorded traces")
+    parser.add_argument("--dir", default=LOCAL_TRACE_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("slowest", help="slowest requests (root spans)")
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("flame", help="span tree of one trace")
+    p.add_argument("trace_id")
+    sub.add_parser("summary", help="per-span-name count / p50 / p95 / total")
+    p = sub.add_parser("bench", help="measure per-span overhead")
+    p.add_argument("--n", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        res = bench(args.n)
+        print(f"✅ {res['overhead_us_per_span']:.2f} µs per span ({res['spans']} spans)")
+        return
+
+    if args.cmd == "flame":
+        spans = load_spans(args.dir, args.trace_id)
+        if not spans:
+            print(f"No spans for trace {args.trace_id}")
+            return
+        print("\n".join(flame_lines(spans)))
+        return
+
+    spans = load_spans(args.dir)
+    if args.cmd == "slowest":
+        for s in slowest(spans, args.limit):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["start"]))
+            err = "  ✗" if s.get("error") else ""
+            print(f"{s['trace_id']}  {when}  {s['duration_ms']:>10.1f} ms  {s['name']}{err}")
+    else:
+        print(f"{'span':<30} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'total ms':>12} {'errors':>7}")
+        for name, n, p50, p95, total, errs in summary_rows(spans):
+            print(f"{name:<30} {n:>7} {p50:>10.1f} {p95:>10.1f} {total:>12.1f} {errs:>7}")
+
+
+if __name__ == "__main__":
+    main()
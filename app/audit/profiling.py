@@ -0,0 +1,214 @@
+# app/audit/profiling.py
+"""
+Opt-in profiling of one pipeline run.
+
+Nothing here runs unless asked for: the API profiles a request only when it
+carries `X-Profile: sample | cprofile` and PROFILE_HEADER_ENABLED is turned
+on (off by default: the header makes the server write a file), the CLI only
+with `python -m app.main --profile ...`.
+
+  sample    a daemon thread snapshots the calling thread's stack every
+            PROFILE_INTERVAL_MS (sys._current_frames); output is collapsed
+            stacks ("a;b;c <count>" per line, for flamegraph.pl / speedscope)
+  cprofile  deterministic cProfile of the calling thread; output is a pstats
+            file (python -m pstats / snakeviz)
+
+Files go to PROFILE_DIR/<profile_id>.collapsed | .prof under a server-made
+id (the caller's X-Request-ID is only recorded in the summary); the oldest
+files beyond PROFILE_MAX_FILES are removed. The returned summary (self-time
+top frames) is attached to the response under debug.profile.
+"""
+from __future__ import annotations
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.audit.local_tracing import current_trace_id, span
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("data", "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+PROFILE_TOP = 15
+MODES = ("sample", "cprofile")
+
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_EXTENSIONS = ((".collapsed", "sample"), (".prof", "cprofile"))
+
+
+def parse_mode(value: Optional[str]) -> Optional[str]:
+    """
+    Header value -> mode; "1" / "true" mean sample. None = don't profile.
+    """
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value in ("1", "true", "yes"):
+        return "sample"
+    return value if value in MODES else None
+
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class _Sampler:
+    def __init__(self, thread_id: int, interval_sec: float):
+        self.thread_id = thread_id
+        self.interval_sec = interval_sec
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="profile-sampler", daemon=True)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            frame = sys._current_frames().get(self.thread_id)
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if codes:
+                # code objects only while sampling; labels are built once at the end
+                self.stacks[tuple(reversed(codes))] += 1
+
+    def __enter__(self) -> "_Sampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> Counter:
+        out: Counter = Counter()
+        labels: Dict[Any, str] = {}
+        for codes, n in self.stacks.items():
+            out[";".join(labels.setdefault(c, _frame_label(c)) for c in codes)] += n
+        return out
+
+
+def _top_self(collapsed: Counter, top: int) -> List[Tuple[str, float]]:
+    total = sum(collapsed.values()) or 1
+    leaf: Counter = Counter()
+    for stack, n in collapsed.items():
+        leaf[stack.rsplit(";", 1)[-1]] += n
+    return [(frame, round(100.0 * n / total, 1)) for frame, n in leaf.most_common(top)]
+
+
+def _top_cprofile(prof: cProfile.Profile, top: int) -> List[Tuple[str, float]]:
+    stats = pstats.Stats(prof)
+    total = stats.total_tt or 1.0
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top]
+    return [
+        (f"{os.path.splitext(os.path.basename(f))[0]}:{name}", round(100.0 * tt / total, 1))
+        for (f, _line, name), (_cc, _nc, tt, _ct, _callers) in rows
+    ]
+
+
+def _prune(out_dir: str, keep: int = PROFILE_MAX_FILES) -> None:
+    files = []
+    for name in os.listdir(out_dir):
+        if name.endswith(tuple(ext for ext, _ in _EXTENSIONS)):
+            try:
+                files.append((os.path.getmtime(os.path.join(out_dir, name)), name))
+            except FileNotFoundError:
+                continue
+    for _, name in sorted(files, reverse=True)[keep:]:
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def profile_call(
+    fn: Callable[..., Any],
+    *args: Any,
+    mode: str = "sample",
+    request_id: Optional[str] = None,
+    out_dir: str = PROFILE_DIR,
+    **kwargs: Any,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run fn(*args, **kwargs) under the profiler; returns (fn result, summary).
+    Only the calling thread is profiled. The file is named by a new
+    profile_id; request_id (the caller's) is kept in the summary only.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    if request_id is not None and not REQUEST_ID_RE.match(request_id):
+        request_id = None
+    profile_id = uuid.uuid4().hex
+    os.makedirs(out_dir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    # the profiled call's spans hang under this one, so the profile and the trace share an id
+    with span("profiled_request", {"profile_id": profile_id, "request_id": request_id, "mode": mode}):
+        trace_id = current_trace_id()
+        if mode == "sample":
+            with _Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0) as sampler:
+                result = fn(*args, **kwargs)
+        else:
+            prof = cProfile.Profile()
+            result = prof.runcall(fn, *args, **kwargs)
+    seconds = time.perf_counter() - t0
+
+    if mode == "sample":
+        collapsed = sampler.collapsed()
+        path = os.path.join(out_dir, f"{profile_id}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in collapsed.most_common():
+                f.write(f"{stack} {n}\n")
+        top = _top_self(collapsed, PROFILE_TOP)
+        extra = {"samples": sum(collapsed.values()), "interval_ms": PROFILE_INTERVAL_MS}
+    else:
+        path = os.path.join(out_dir, f"{profile_id}.prof")
+        prof.dump_stats(path)
+        top = _top_cprofile(prof, PROFILE_TOP)
+        extra = {}
+    _prune(out_dir)
+
+    summary = {
+        "profile_id": profile_id,
+        "request_id": request_id,
+        "mode": mode,
+        "seconds": round(seconds, 4),
+        "file": path,
+        "trace_id": trace_id,
+        # % of samples (sample) / of total time (cprofile) spent in the frame itself
+        "top_self_pct": top,
+        **extra,
+    }
+    return result, summary
+
+
+def load_profile(profile_id: str, out_dir: str = PROFILE_DIR) -> Optional[Tuple[str, str]]:
+    """
+    (path, mode) of a saved profile, or None.
+    """
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    for ext, mode in _EXTENSIONS:
+        path = os.path.join(out_dir, profile_id + ext)
+        if os.path.exists(path):
+            return path, mode
+    return None
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"profile {summary['profile_id']} ({summary['mode']}, {summary['seconds']}s) -> {summary['file']}",
+    ]
+    for frame, pct in summary["top_self_pct"]:
+        lines.append(f"  {pct:>5.1f}%  {frame}")
+    return "\n".join(lines)
@@ -21,6 +21,8 @@ ROLE_POLICIES: Dict[str, AccessPolicy] = {
             "gold_airport_kpi_hourly",
             "gold_delay_reason_daily",
             "gold_anomaly_scores",
+            "gold_kpi_rollup",
+            "gold_kpi_rollup_stats",
             "presecurity_events",
             "checkin_events",
         },
@@ -31,6 +33,8 @@ ROLE_POLICIES: Dict[str, AccessPolicy] = {
             "gold_airport_kpi_hourly",
             "gold_delay_reason_daily",
             "gold_anomaly_scores",
+            "gold_kpi_rollup",
+            "gold_kpi_rollup_stats",
         },
         redacted_columns=set(),
     ),
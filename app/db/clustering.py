@@ -0,0 +1,193 @@
+# app/db/clustering.py
+"""
+Physical layout helpers for the time-series tables.
+
+Almost every generated query filters on airport + a time window. DuckDB keeps
+min/max zonemaps per row group (~122k rows), so tables sorted by (airport, time)
+let those filters skip most row groups; insertion order lets them skip almost none.
+
+Also supports exporting the same tables as hive-partitioned Parquet
+(<dir>/<table>/day=YYYY-MM-DD/airport=XXX/*.parquet) and exposing them to a
+connection as views, so the API can query the Parquet files in place.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import duckdb
+
+# table -> (airport column, time column)
+CLUSTER_KEYS: Dict[str, Tuple[str, str]] = {
+    "checkin_events": ("airport", "ts"),
+    "presecurity_events": ("airport", "ts"),
+    "boarding_events": ("airport", "ts"),
+    "disruption_events": ("airport", "ts"),
+    "gold_airport_kpi_hourly": ("airport", "hour"),
+    "gold_delay_reason_daily": ("airport", "day"),
+    "gold_anomaly_scores": ("airport", "ts"),
+    "gold_kpi_rollup": ("airport", "period_start"),
+}
+
+LAYOUT_MANIFEST = "_layout.json"
+
+
+def existing_tables(conn: duckdb.DuckDBPyConnection) -> List[str]:
+    rows = conn.execute("""
+        SELECT table_name
+        FROM information_schema.tables
+        WHERE table_schema = 'main' AND table_type = 'BASE TABLE'
+    """).fetchall()
+    return [r[0] for r in rows]
+
+
+def _escape(text: str) -> str:
+    return text.replace("'", "''")
+
+
+def cluster_table(conn: duckdb.DuckDBPyConnection, table: str) -> None:
+    """
+    Rewrite a table sorted by its (airport, time) cluster key.
+    Table / column comments (schema docs read them) are carried over.
+    """
+    ap_col, ts_col = CLUSTER_KEYS[table]
+    comment = conn.execute("SELECT comment FROM duckdb_tables() WHERE table_name = ?", [table]).fetchone()
+    col_comments = conn.execute(
+        "SELECT column_name, comment FROM duckdb_columns() WHERE table_name = ? AND comment IS NOT NULL", [table]
+    ).fetchall()
+
+    conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {table} ORDER BY {ap_col}, {ts_col};")
+
+    # COMMENT ON doesn't take parameters
+    if comment and comment[0]:
+        conn.execute(f"COMMENT ON TABLE {table} IS '{_escape(comment[0])}';")
+    for col, text in col_comments:
+        conn.execute(f"COMMENT ON COLUMN {table}.{col} IS '{_escape(text)}';")
+
+
+def cluster_tables(conn: duckdb.DuckDBPyConnection, tables: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Cluster the given tables (default: every known table that exists). Returns tables rewritten.
+    """
+    present = set(existing_tables(conn))
+    todo = [t for t in (tables or CLUSTER_KEYS) if t in CLUSTER_KEYS and t in present]
+    for t in todo:
+        cluster_table(conn, t)
+    return todo
+
+
+# -----------------------------
+# Hive-partitioned Parquet export
+# -----------------------------
+def export_parquet(
+    conn: duckdb.DuckDBPyConnection,
+    out_dir: str,
+    tables: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Export clustered tables as Parquet partitioned by (day, airport), sorted by time
+    inside each file. Writes a small manifest so views can restore column order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    present = set(existing_tables(conn))
+    manifest: Dict[str, Any] = {}
+
+    for table in tables or CLUSTER_KEYS:
+        if table not in CLUSTER_KEYS or table not in present:
+            continue
+        ap_col, ts_col = CLUSTER_KEYS[table]
+        columns = [r[0] for r in conn.execute(f"DESCRIBE {table}").fetchall()]
+
+        # `day` is added as a partition column unless the table already has one
+        added_day = "day" not in columns
+        select = f"*, CAST({ts_col} AS DATE) AS day" if added_day else "*"
+
+        target = os.path.join(out_dir, table)
+        conn.execute(f"""
+            COPY (SELECT {select} FROM {table} ORDER BY {ap_col}, {ts_col})
+            TO '{target}'
+            (FORMAT PARQUET, PARTITION_BY (day, {ap_col}), OVERWRITE_OR_IGNORE);
+        """)
+        manifest[table] = {"columns": columns, "partition_by": ["day", ap_col]}
+
+    with open(os.path.join(out_dir, LAYOUT_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def attach_parquet_views(conn: duckdb.DuckDBPyConnection, parquet_dir: str) -> List[str]:
+    """
+    Create TEMP views over an exported Parquet layout. Temp views shadow same-named
+    tables in `main`, so existing SQL runs unchanged against the Parquet files.
+    """
+    path = os.path.join(parquet_dir, LAYOUT_MANIFEST)
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as f:
+        manifest = json.load(f)
+
+    attached = []
+    for table, spec in manifest.items():
+        cols = ", ".join(spec["columns"])
+        glob = os.path.join(parquet_dir, table, "**", "*.parquet")
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP VIEW {table} AS
+            SELECT {cols}
+            FROM read_parquet('{glob}', hive_partitioning = true);
+        """)
+        attached.append(table)
+    return attached
+
+
+# -----------------------------
+# Zonemap inspection (benchmarks / debugging)
+# -----------------------------
+_MINMAX = re.compile(r"Min: (?P<min>[^,\]]*), Max: (?P<max>[^,\]]*)")
+
+
+def row_group_ranges(conn: duckdb.DuckDBPyConnection, table: str, columns: List[str]) -> Dict[int, Dict[str, Tuple[str, str]]]:
+    """
+    Per row group min/max (as strings) for the given columns, from pragma_storage_info.
+    """
+    rows = conn.execute(f"""
+        SELECT row_group_id, column_name, stats
+        FROM pragma_storage_info('{table}')
+        WHERE column_name IN ({", ".join("?" for _ in columns)})
+    """, columns).fetchall()
+
+    out: Dict[int, Dict[str, Tuple[str, str]]] = {}
+    for rg, col, stats in rows:
+        m = _MINMAX.search(stats or "")
+        if not m:
+            continue
+        lo, hi = m.group("min"), m.group("max")
+        cur = out.setdefault(rg, {}).get(col)
+        if cur:
+            lo, hi = min(lo, cur[0]), max(hi, cur[1])
+        out[rg][col] = (lo, hi)
+    return out
+
+
+def count_scanned_row_groups(
+    conn: duckdb.DuckDBPyConnection,
+    table: str,
+    airport: str,
+    ts_from: str,
+) -> Tuple[int, int]:
+    """
+    How many row groups an `airport = ? AND <time> >= ?` filter can NOT prune.
+    ts_from must be an ISO string ('YYYY-MM-DD HH:MM:SS') so string comparison works.
+    Returns (scanned, total).
+    """
+    ap_col, ts_col = CLUSTER_KEYS[table]
+    ranges = row_group_ranges(conn, table, [ap_col, ts_col])
+    scanned = 0
+    for cols in ranges.values():
+        ap_lo, ap_hi = cols.get(ap_col, ("", "\uffff"))
+        _, ts_hi = cols.get(ts_col, ("", "9999"))
+        if ap_lo <= airport <= ap_hi and ts_hi >= ts_from:
+            scanned += 1
+    return scanned, len(ranges)
@@ -2,14 +2,163 @@
 from __future__ import annotations
 
 import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
 import duckdb
 from dotenv import load_dotenv
 
+from app.db.snapshots import read_pointer, schema_hash, writable_snapshot
+
 load_dotenv()
 
 DEFAULT_DB_PATH = os.path.join("data", "amadeus_ops.duckdb")
 
+
+def resolve_db_path(db_path: str | None = None) -> str:
+    """
+    explicit path > DUCKDB_PATH > current blue/green snapshot > default file.
+    """
+    if db_path:
+        return db_path
+    env_path = os.getenv("DUCKDB_PATH")
+    if env_path:
+        return env_path
+    pointer = read_pointer()
+    if pointer:
+        return pointer["path"]
+    return DEFAULT_DB_PATH
+
+
+def get_data_version(db_path: str | None = None) -> str:
+    """
+    Changes whenever new data is published; use it in cache keys.
+    Snapshot version when snapshots are in use, else the mtimes of the DB file
+    and its WAL (writers append to the WAL until the next checkpoint).
+    """
+    if not db_path and not os.getenv("DUCKDB_PATH"):
+        pointer = read_pointer()
+        if pointer:
+            return f"snapshot:{pointer['version']}"
+    path = resolve_db_path(db_path)
+    try:
+        version = f"file:{os.stat(path).st_mtime_ns}"
+    except FileNotFoundError:
+        return "missing"
+    try:
+        version += f":wal:{os.stat(path + '.wal').st_mtime_ns}"
+    except FileNotFoundError:
+        pass
+    return version
+
+
+_schema_version_cache: dict = {}
+
+
+def get_schema_version(db_path: str | None = None) -> str:
+    """
+    Hash of the DB schema; use it in cache keys for schema-derived artifacts.
+    Read from the snapshot pointer when possible, else computed once per data version.
+    """
+    if not db_path and not os.getenv("DUCKDB_PATH"):
+        pointer = read_pointer()
+        if pointer:
+            return pointer.get("schema_hash", "")
+
+    key = (resolve_db_path(db_path), get_data_version(db_path))
+    if key not in _schema_version_cache:
+        conn = get_conn(db_path)
+        _schema_version_cache.clear()
+        _schema_version_cache[key] = schema_hash(conn)
+        conn.close()
+    return _schema_version_cache[key]
+
+
 def get_conn(db_path: str | None = None) -> duckdb.DuckDBPyConnection:
-    path = db_path or os.getenv("DUCKDB_PATH", DEFAULT_DB_PATH)
+    path = resolve_db_path(db_path)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    return duckdb.connect(path)
\ No newline at end of file
+
+    # published snapshots are immutable: open read-only so readers never take the write lock
+    # DUCKDB_READ_ONLY: set by the multi-worker API, several processes can only share a file read-only
+    pointer = None if (db_path or os.getenv("DUCKDB_PATH")) else read_pointer()
+    read_only = bool(pointer and pointer["path"] == path) or os.getenv("DUCKDB_READ_ONLY", "false").lower() == "true"
+    conn = duckdb.connect(path, read_only=read_only)
+
+    # Optional: query an exported hive-partitioned Parquet layout in place
+    parquet_dir = os.getenv("DUCKDB_PARQUET_DIR")
+    if parquet_dir:
+        from app.db.clustering import attach_parquet_views
+        attach_parquet_views(conn, parquet_dir)
+
+    return conn
+
+
+@contextmanager
+def standalone_write_path() -> Iterator[str]:
+    """
+    DB file for a pipeline run on its own (python -m app.pipelines.<step>).
+    DUCKDB_PATH / the default file while snapshots aren't in use; once they are,
+    a new blue/green snapshot that is published when the run succeeds, since
+    the published file is read-only for the API. Close connections before exit.
+    """
+    if os.getenv("DUCKDB_PATH") or not read_pointer():
+        path = resolve_db_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        yield path
+        return
+    with writable_snapshot() as path:
+        yield path
+
+
+_shared: dict = {"key": None, "conn": None}
+# open pooled cursors per connection (by id); a replaced connection is closed at 0
+_users: Dict[int, Tuple[duckdb.DuckDBPyConnection, int]] = {}
+_shared_lock = threading.Lock()
+
+
+def _acquire_shared_conn() -> duckdb.DuckDBPyConnection:
+    """
+    Process-wide connection for the query path (validator / executor), reopened
+    when the published data version changes (new snapshot). The replaced one
+    is closed as soon as no pooled cursor uses it, so in-flight queries finish
+    on the old file and the old file's handle doesn't outlive them.
+    """
+    key = (resolve_db_path(), get_data_version())
+    with _shared_lock:
+        if _shared["key"] != key:
+            old = _shared["conn"]
+            _shared.update(key=key, conn=get_conn())
+            if old is not None and _users.get(id(old), (old, 0))[1] == 0:
+                _users.pop(id(old), None)
+                old.close()
+        conn = _shared["conn"]
+        _users[id(conn)] = (conn, _users.get(id(conn), (conn, 0))[1] + 1)
+        return conn
+
+
+def _release_shared_conn(conn: duckdb.DuckDBPyConnection) -> None:
+    with _shared_lock:
+        n = _users[id(conn)][1] - 1
+        if n or conn is _shared["conn"]:
+            _users[id(conn)] = (conn, n)
+        else:
+            del _users[id(conn)]
+            conn.close()
+
+
+@contextmanager
+def pooled_cursor() -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    A cursor on the shared connection: same database instance (catalog, buffer
+    pool), but safe to use from its own thread.
+    """
+    conn = _acquire_shared_conn()
+    try:
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+    finally:
+        _release_shared_conn(conn)
@@ -0,0 +1,601 @@
+# app/db/query_log.py
+"""
+Executed-query log + materialization recommendations.
+
+execute_sql() records every query (also failed ones and result-cache hits):
+fingerprint, tables, runtime, rows returned, cache state and caller role, in
+a small SQLite file next to the other local stores. The request thread only
+enqueues the record; a background thread fingerprints and inserts in batches. The fingerprint is the
+normalized SQL with literals replaced by `?`, so "airport = 'LHR'" and
+"airport = 'DXB'" count as one query shape.
+
+`report` ranks fingerprints by total time and, for the top ones, parses a
+sample with DuckDB's own parser (json_serialize_sql) to suggest
+
+  - answering it from gold_kpi_rollup, when it is a mergeable KPI aggregate
+    the cube already holds (app/pipelines/rollup_cube.py)
+  - otherwise a materialized gold table of the shape (group keys + filter
+    columns, mergeable aggregates: avg is stored as sum + count)
+  - a sort order per table from the columns the expensive queries filter on,
+    when it differs from the table's cluster key (app/db/clustering.py)
+
+`--out` writes the materializations as JSON; `python -m app.pipelines.dag
+--materializations <file>` builds them as regular DAG steps (and the schema
+index picks them up, so the generator can use them).
+
+  python -m app.db.query_log report [--days 7] [--top 10] [--out data/materializations.json]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import duckdb
+
+from app.auth.sql_guard import extract_tables
+from app.db.clustering import CLUSTER_KEYS
+from app.db.result_cache import TOKEN_RE, normalize_sql
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", os.path.join("data", "query_log.sqlite"))
+QUERY_LOG_RETENTION_DAYS = float(os.getenv("QUERY_LOG_RETENTION_DAYS", "30"))
+QUERY_LOG_FLUSH_SEC = float(os.getenv("QUERY_LOG_FLUSH_SEC", "1.0"))
+QUERY_LOG_BATCH = 500
+
+_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_PUNCT_SPACE_RE = re.compile(r"\s*([=<>!,+*/-])\s*|\s*(\()\s*|\s*(\))")
+
+
+def fingerprint_sql(sql: str) -> Tuple[str, str]:
+    """
+    (fingerprint, template): literals -> ?, IN lists of any length -> (?+),
+    no whitespace around operators / punctuation.
+    """
+    parts = []
+    for tok in TOKEN_RE.findall(normalize_sql(sql)):
+        if tok[0] == "'":
+            parts.append("?")
+        elif tok[0] == '"' or tok.isspace():
+            parts.append(tok)
+        else:
+            parts.append(_NUMBER_RE.sub("?", tok))
+    template = _IN_LIST_RE.sub("(?+)", _PUNCT_SPACE_RE.sub(lambda m: m.group(m.lastindex), "".join(parts)))
+    return hashlib.sha1(template.encode()).hexdigest()[:16], template
+
+
+def sql_tables(sql: str) -> List[str]:
+    try:
+        return sorted(duckdb.get_table_names(sql))
+    except Exception:
+        return extract_tables(sql)
+
+
+class QueryLog:
+    def __init__(self, path: str = QUERY_LOG_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL;")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS queries (
+                    ts REAL NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    template TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    tables TEXT NOT NULL,
+                    seconds REAL NOT NULL,
+                    rows INTEGER,
+                    cache TEXT,
+                    role TEXT,
+                    error TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS queries_ts ON queries(ts)")
+        self._pruned_at = 0.0
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            db.execute("PRAGMA synchronous=NORMAL;")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def record(
+        self,
+        sql: str,
+        seconds: float,
+        rows: Optional[int],
+        cache: str,
+        role: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        self.record_many([(time.time(), sql, seconds, rows, cache, role, error)])
+
+    def record_many(self, entries: List[Tuple]) -> None:
+        """
+        entries: (ts, sql, seconds, rows, cache, role, error) tuples, one transaction.
+        """
+        values = []
+        for ts, sql, seconds, rows, cache, role, error in entries:
+            fingerprint, template = fingerprint_sql(sql)
+            values.append((ts, fingerprint, template, sql, json.dumps(sql_tables(sql)), seconds, rows, cache, role, error))
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO queries (ts, fingerprint, template, sql, tables, seconds, rows, cache, role, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            if now - self._pruned_at > 3600:
+                db.execute("DELETE FROM queries WHERE ts < ?", (now - QUERY_LOG_RETENTION_DAYS * 86400,))
+                self._pruned_at = now
+
+    def fingerprints(self, since: float) -> List[Dict[str, Any]]:
+        """
+        Per-fingerprint totals since `since` (epoch seconds), by total time.
+        """
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                """
+                SELECT fingerprint, template, tables, seconds, rows, cache, role, error, sql
+                FROM queries WHERE ts >= ? ORDER BY ts
+                """,
+                (since,),
+            ).fetchall()
+
+        by_fp: Dict[str, Dict[str, Any]] = {}
+        for r in rows:
+            fp = by_fp.setdefault(r["fingerprint"], {
+                "fingerprint": r["fingerprint"],
+                "template": r["template"],
+                "tables": json.loads(r["tables"]),
+                "seconds": [],
+                "rows": 0,
+                "cache_hits": 0,
+                "errors": 0,
+                "roles": {},
+                "sample_sql": r["sql"],
+            })
+            fp["seconds"].append(r["seconds"])
+            fp["rows"] += r["rows"] or 0
+            fp["cache_hits"] += r["cache"] == "hit"
+            fp["errors"] += r["error"] is not None
+            role = r["role"] or "-"
+            fp["roles"][role] = fp["roles"].get(role, 0) + 1
+            if r["error"] is None:
+                fp["sample_sql"] = r["sql"]  # latest successful run
+
+        out = []
+        for fp in by_fp.values():
+            ds = sorted(fp.pop("seconds"))
+            n = len(ds)
+            out.append({
+                **fp,
+                "count": n,
+                "total_seconds": round(sum(ds), 4),
+                "p50_seconds": ds[n // 2],
+                "p95_seconds": ds[min(n - 1, int(n * 0.95))],
+                "avg_rows": round(fp["rows"] / n, 1),
+                "cache_hit_rate": round(fp["cache_hits"] / n, 3),
+            })
+        return sorted(out, key=lambda f: f["total_seconds"], reverse=True)
+
+
+_log: Optional[QueryLog] = None
+
+
+def get_query_log() -> QueryLog:
+    global _log
+    if _log is None:
+        _log = QueryLog()
+    return _log
+
+
+class _Writer:
+    """
+    Background writer (like app.audit.local_tracing's): the request thread only
+    enqueues; fingerprinting and the SQLite insert happen here, in batches.
+    """
+
+    def __init__(self, log: QueryLog):
+        self.log = log
+        self.queue: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self.pid = os.getpid()
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._loop, name="query-log-writer", daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        """
+        Flush what is queued and stop the thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + QUERY_LOG_FLUSH_SEC
+            while len(batch) < QUERY_LOG_BATCH and batch[-1] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stop = True
+                batch.pop()
+            if not batch:
+                continue
+            try:
+                self.log.record_many(batch)
+            except Exception:
+                self.dropped += len(batch)
+                logger.warning("Dropped %d query log records", len(batch), exc_info=True)
+
+
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    w = _writer
+    if w is not None and w.pid == os.getpid():
+        return w
+    with _writer_lock:
+        # first query, or first query after a fork (threads don't survive fork)
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = _Writer(get_query_log())
+        return _writer
+
+
+def flush_query_log() -> None:
+    """
+    Write out everything queued so far (the next log_query starts a new writer).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer.pid == os.getpid():
+            _writer.close()
+        _writer = None
+
+
+def log_query(
+    sql: str,
+    seconds: float,
+    rows: Optional[int],
+    cache: str,
+    role: Optional[str] = None,
+    error: Optional[str] = None,
+) -> None:
+    # never let bookkeeping fail (or slow down) a query: written in the background
+    if not QUERY_LOG_ENABLED:
+        return
+    try:
+        _get_writer().queue.put((time.time(), sql, seconds, rows, cache, role, error))
+    except Exception:
+        logger.warning("Could not record query", exc_info=True)
+
+
+# -----------------------------
+# Shape analysis (DuckDB parser)
+# -----------------------------
+# aggregates that can be stored and re-aggregated exactly
+_MERGEABLE = {"sum", "min", "max", "count", "avg", "mean"}
+_GRAIN_FUNCS = {"date_trunc", "time_bucket"}
+_RANGE_OPS = {
+    "COMPARE_GREATERTHAN", "COMPARE_GREATERTHANOREQUALTO", "COMPARE_LESSTHAN",
+    "COMPARE_LESSTHANOREQUALTO", "COMPARE_BETWEEN",
+}
+_EQ_OPS = {"COMPARE_EQUAL", "COMPARE_IN"}
+
+
+def _parse(sql: str) -> Optional[Dict[str, Any]]:
+    con = duckdb.connect()
+    try:
+        doc = json.loads(con.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+    finally:
+        con.close()
+    if doc.get("error") or len(doc.get("statements") or []) != 1:
+        return None
+    return doc["statements"][0]["node"]
+
+
+def _column(expr: Optional[Dict[str, Any]]) -> Optional[str]:
+    if expr and expr.get("class") == "COLUMN_REF":
+        return expr["column_names"][-1]
+    if expr and expr.get("class") == "CAST":
+        return _column(expr.get("child"))
+    return None
+
+
+def _has_column(expr: Any) -> bool:
+    if isinstance(expr, dict):
+        if expr.get("class") == "COLUMN_REF":
+            return True
+        return any(_has_column(v) for v in expr.values())
+    if isinstance(expr, list):
+        return any(_has_column(v) for v in expr)
+    return False
+
+
+def _filters(expr: Optional[Dict[str, Any]], out: Dict[str, str]) -> None:
+    """
+    column -> "eq" | "range" for column-vs-constant predicates under ANDs.
+    """
+    if not expr:
+        return
+    cls, typ = expr.get("class"), expr.get("type")
+    if cls == "CONJUNCTION" and typ == "CONJUNCTION_AND":
+        for child in expr["children"]:
+            _filters(child, out)
+    elif cls == "COMPARISON" and typ in _EQ_OPS | _RANGE_OPS:
+        col, other = _column(expr.get("left")), expr.get("right")
+        if col is None:
+            col, other = _column(expr.get("right")), expr.get("left")
+        if col is not None and not _has_column(other):
+            out.setdefault(col, "eq" if typ in _EQ_OPS else "range")
+    elif cls == "BETWEEN" and _column(expr.get("input")):
+        out.setdefault(_column(expr["input"]), "range")
+    elif cls == "OPERATOR" and typ == "COMPARE_IN":
+        col = _column(expr["children"][0])
+        if col is not None and not _has_column(expr["children"][1:]):
+            out.setdefault(col, "eq")
+
+
+def query_shape(sql: str) -> Optional[Dict[str, Any]]:
+    """
+    Single-table aggregate shape: table, dimensions ((column, grain or None)),
+    measures ((func, column or None)), filters {column: eq|range}.
+    None when the query is anything else (joins, subqueries, window functions, ...).
+    """
+    try:
+        node = _parse(sql)
+    except Exception:
+        return None
+    if not node or node.get("type") != "SELECT_NODE":
+        return None
+    if (node.get("cte_map") or {}).get("map"):
+        return None
+    src = node.get("from_table") or {}
+    if src.get("type") != "BASE_TABLE":
+        return None
+
+    dims: List[Tuple[str, Optional[str]]] = []
+    measures: List[Tuple[str, Optional[str]]] = []
+    for item in node["select_list"]:
+        col = _column(item)
+        if col is not None:
+            dims.append((col, None))
+            continue
+        if item.get("class") != "FUNCTION":
+            return None
+        name = item["function_name"].lower()
+        children = item.get("children") or []
+        if name in _GRAIN_FUNCS and len(children) == 2 and children[0].get("class") == "CONSTANT":
+            col = _column(children[1])
+            if col is None:
+                return None
+            dims.append((col, str(children[0]["value"]["value"]).lower()))
+        elif name in _MERGEABLE and not item.get("distinct") and not item.get("filter"):
+            if not children and name == "count":
+                measures.append(("count", None))  # count(*)
+            elif len(children) == 1 and _column(children[0]) is not None:
+                measures.append(("avg" if name == "mean" else name, _column(children[0])))
+            else:
+                return None
+        elif name == "count_star":
+            measures.append(("count", None))
+        else:
+            return None
+    if not measures:
+        return None
+
+    filters: Dict[str, str] = {}
+    _filters(node.get("where_clause"), filters)
+    return {"table": src["table_name"], "dimensions": dims, "measures": measures, "filters": filters}
+
+
+def _rollup_fit(shape: Dict[str, Any]) -> Optional[str]:
+    """
+    Suggestion text when gold_kpi_rollup already holds this aggregate.
+    """
+    from app.pipelines.rollup_cube import CUBE_METRICS, CUBE_TABLE
+
+    table = shape["table"]
+    ap_col, ts_col = CLUSTER_KEYS.get(table, (None, None))
+    metrics = {col: m for m, (t, col) in CUBE_METRICS.items() if t == table}
+    if ts_col is None or not metrics:
+        return None
+    grains = {g for c, g in shape["dimensions"] if c == ts_col}
+    if any(c not in (ap_col, ts_col) for c, _g in shape["dimensions"]):
+        return None
+    if any(c not in (ap_col, ts_col) for c in shape["filters"]):
+        return None
+    if not grains <= {"hour", "day", "week"} or len(grains) > 1:
+        return None
+    # count(*) counts rows, the cube's n counts non-null values per metric
+    if any(col not in metrics for _f, col in shape["measures"]):
+        return None
+    used = sorted({metrics[col] for _f, col in shape["measures"] if col is not None})
+    grain = next(iter(grains), "day")
+    return (
+        f"serve from {CUBE_TABLE} (grain='{grain}', metric in {used}): "
+        f"avg = SUM(sum) / SUM(n), min / max / count merge directly"
+    )
+
+
+def materialization_for(shape: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gold table that can answer every query of this shape: the query's
+    dimensions + filter columns, mergeable aggregates (avg -> sum + count).
+    """
+    table = shape["table"]
+    ts_col = CLUSTER_KEYS.get(table, (None, None))[1]
+    grain = next((g for c, g in shape["dimensions"] if g is not None), None)
+
+    keys: List[Tuple[str, str]] = []  # (expression, name)
+
+    def add(col: str, g: Optional[str]) -> None:
+        name = g or col
+        if all(name != n for _e, n in keys):
+            keys.append((f"date_trunc('{g}', {col})" if g else col, name))
+
+    for col, g in shape["dimensions"]:
+        add(col, g)
+    dim_cols = {c for c, _g in shape["dimensions"]}
+    for col in shape["filters"]:
+        if col not in dim_cols:
+            # time filters keep working at the query's grain (hour if it has none)
+            add(col, (grain or "hour") if col == ts_col else None)
+
+    aggs: List[str] = []
+    for func, col in shape["measures"]:
+        if col is None:
+            aggs.append("count(*) AS n_rows")
+        elif func == "avg":
+            aggs += [f"sum({col}) AS {col}_sum", f"count({col}) AS {col}_n"]
+        else:
+            aggs.append(f"{func}({col}) AS {col}_{func}")
+    aggs = list(dict.fromkeys(aggs))
+
+    # equality-filtered columns first, then ranges / time: what zonemaps prune best
+    order = sorted(keys, key=lambda k: 0 if shape["filters"].get(k[1]) == "eq" else 1)
+    select = ", ".join([f"{e} AS {n}" if e != n else n for e, n in keys] + aggs)
+    sql = f"SELECT {select} FROM {table} GROUP BY ALL ORDER BY {', '.join(n for _e, n in order)}"
+    name = f"gold_mv_{table}_{hashlib.sha1(sql.encode()).hexdigest()[:8]}"
+    dims = ", ".join(n for _e, n in keys)
+    return {
+        "name": name,
+        "source_table": table,
+        "sql": sql,
+        "comment": (
+            f"Pre-aggregated {table} by {dims}. "
+            "avg(x) = SUM(x_sum) / SUM(x_n); x_min / x_max / x_count / n_rows re-aggregate with MIN / MAX / SUM."
+        ),
+    }
+
+
+def recommend(fingerprints: List[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """
+    Suggestions for the `top` most expensive fingerprints + sort orders per table.
+    """
+    suggestions: List[Dict[str, Any]] = []
+    materializations: Dict[str, Dict[str, Any]] = {}
+    filter_time: Dict[str, Dict[str, float]] = {}
+    filter_kind: Dict[Tuple[str, str], str] = {}
+
+    for fp in fingerprints[:top]:
+        shape = query_shape(fp["sample_sql"])
+        item = {"fingerprint": fp["fingerprint"], "total_seconds": fp["total_seconds"]}
+        if shape is None:
+            item["suggestion"] = None
+            suggestions.append(item)
+            continue
+
+        for col, kind in shape["filters"].items():
+            per_table = filter_time.setdefault(shape["table"], {})
+            per_table[col] = per_table.get(col, 0.0) + fp["total_seconds"]
+            filter_kind[(shape["table"], col)] = kind
+
+        rollup = _rollup_fit(shape)
+        if rollup:
+            item["suggestion"] = rollup
+        elif shape["table"].startswith("gold_"):
+            item["suggestion"] = None  # already a gold table; sort order below
+        else:
+            mv = materialization_for(shape)
+            entry = materializations.setdefault(mv["name"], {**mv, "serves": [], "total_seconds": 0.0})
+            entry["serves"].append(fp["fingerprint"])
+            entry["total_seconds"] = round(entry["total_seconds"] + fp["total_seconds"], 4)
+            item["suggestion"] = f"materialize as {mv['name']}"
+        suggestions.append(item)
+
+    sort_orders = []
+    for table, cols in filter_time.items():
+        ranked = sorted(cols, key=lambda c: (filter_kind[(table, c)] != "eq", -cols[c]))[:2]
+        current = list(CLUSTER_KEYS.get(table, ()))
+        if ranked and current[: len(ranked)] != ranked:
+            sort_orders.append({
+                "table": table,
+                "current": current,
+                "recommended": ranked,
+                "total_seconds": round(sum(cols[c] for c in ranked), 4),
+            })
+
+    return {
+        "suggestions": suggestions,
+        "materializations": sorted(materializations.values(), key=lambda m: m["total_seconds"], reverse=True),
+        "sort_orders": sorted(sort_orders, key=lambda s: s["total_seconds"], reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executed-query log report")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("report", help="rank query shapes by total time and suggest materializations")
+    p.add_argument("--days", type=float, default=7)
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--out", default=None, help="write materializations JSON (for app.pipelines.dag --materializations)")
+    p.add_argument("--path", default=QUERY_LOG_PATH)
+    args = parser.parse_args()
+
+    fps = QueryLog(args.path).fingerprints(since=time.time() - args.days * 86400)
+    if not fps:
+        print("No queries logged in this window")
+        return
+    rec = recommend(fps, top=args.top)
+    suggestion = {s["fingerprint"]: s["suggestion"] for s in rec["suggestions"]}
+
+    total = sum(f["total_seconds"] for f in fps) or 1.0
+    print(f"{sum(f['count'] for f in fps)} queries, {len(fps)} fingerprints, {total:.2f}s total\n")
+    for fp in fps[: args.top]:
+        print(
+            f"{fp['fingerprint']}  {fp['total_seconds']:>9.2f}s ({100 * fp['total_seconds'] / total:4.1f}%)  "
+            f"n={fp['count']}  p95={fp['p95_seconds']:.3f}s  rows~{fp['avg_rows']:.0f}  "
+            f"cache={fp['cache_hit_rate']:.0%}  tables={','.join(fp['tables'])}"
+        )
+        print(f"    {fp['template'][:160]}")
+        if suggestion.get(fp["fingerprint"]):
+            print(f"    -> {suggestion[fp['fingerprint']]}")
+
+    if rec["materializations"]:
+        print("\nMaterializations:")
+        for mv in rec["materializations"]:
+            print(f"  {mv['name']}  (serves {len(mv['serves'])} shapes, {mv['total_seconds']:.2f}s)")
+            print(f"    CREATE TABLE {mv['name']} AS {mv['sql']}")
+    if rec["sort_orders"]:
+        print("\nSort orders:")
+        for so in rec["sort_orders"]:
+            print(f"  {so['table']}: currently {tuple(so['current']) or '-'}, filtered most on {tuple(so['recommended'])}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"materializations": rec["materializations"], "sort_orders": rec["sort_orders"]}, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
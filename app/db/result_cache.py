@@ -0,0 +1,140 @@
+# app/db/result_cache.py
+"""
+Exact result cache for the executor.
+
+Key: normalized SQL (the row limit is in it: the executor appends LIMIT
+before looking up) + (DB path, data version). The data version changes
+whenever a snapshot is published or the DB file / its WAL is written, so
+entries never outlive the data they were computed from; a version change
+drops the whole cache at once.
+
+Values are the executor's Arrow tables, shared with the callers as-is (Arrow
+tables are immutable, so a hit needs no copy). Eviction is LRU by table.nbytes within
+RESULT_CACHE_MAX_BYTES.
+
+Queries calling random() / uuid() / nextval() etc. are never cached. Queries
+that only read the clock (now(), current_date, ...) are what the generator
+writes for date windows ("ts >= NOW() - INTERVAL '7 days'"), so they are
+cached per RESULT_CACHE_CLOCK_BUCKET_SEC window of wall time: a hit may be
+that many seconds behind the clock (never behind the data). 0 turns this off,
+and then most generated SQL is not cached at all.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pyarrow as pa
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# a single result bigger than this is never cached (it would flush everything else)
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESULT_CACHE_MAX_ENTRY_BYTES", str(RESULT_CACHE_MAX_BYTES // 4)))
+RESULT_CACHE_CLOCK_BUCKET_SEC = float(os.getenv("RESULT_CACHE_CLOCK_BUCKET_SEC", "60"))
+
+# quoted strings / identifiers are kept verbatim; everything else is case- and whitespace-folded
+TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+_CLOCK_RE = re.compile(
+    r"\b(now|today|current_date|current_time|current_timestamp|localtime|localtimestamp|get_current_time)\b",
+    re.IGNORECASE,
+)
+_VOLATILE_RE = re.compile(r"\b(random|uuid|gen_random_uuid|setseed|nextval)\b", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    parts = []
+    for tok in TOKEN_RE.findall((sql or "").strip().rstrip(";").strip()):
+        if tok.isspace():
+            parts.append(" ")
+        elif tok[0] in "'\"":
+            parts.append(tok)
+        else:
+            parts.append(tok.lower())
+    return "".join(parts)
+
+
+def _unquoted(sql: str) -> str:
+    # literals can't make a query volatile, so only look outside them
+    return " ".join(t for t in TOKEN_RE.findall(sql or "") if t[0] not in "'\"")
+
+
+def cache_key(sql: str, now: Optional[float] = None) -> Optional[Tuple]:
+    """
+    Cache key for sql, or None if it must not be cached. Clock-reading queries
+    get the current RESULT_CACHE_CLOCK_BUCKET_SEC window in their key.
+    """
+    unquoted = _unquoted(sql)
+    if _VOLATILE_RE.search(unquoted):
+        return None
+    if not _CLOCK_RE.search(unquoted):
+        return (normalize_sql(sql),)
+    if RESULT_CACHE_CLOCK_BUCKET_SEC <= 0:
+        return None
+    return (normalize_sql(sql), int((time.time() if now is None else now) // RESULT_CACHE_CLOCK_BUCKET_SEC))
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, max_entry_bytes: int = RESULT_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[Tuple, pa.Table]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[Tuple[str, str]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _roll(self, version: Tuple[str, str]) -> None:
+        # called with the lock held
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: Tuple, version: Tuple[str, str]) -> Optional[pa.Table]:
+        with self._lock:
+            self._roll(version)
+            table = self._entries.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def put(self, key: Tuple, version: Tuple[str, str], table: pa.Table) -> bool:
+        size = table.nbytes
+        if size > self.max_entry_bytes:
+            return False
+        with self._lock:
+            self._roll(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = table
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    return _cache
@@ -0,0 +1,232 @@
+# app/db/slow_queries.py
+"""
+Plans of slow queries.
+
+When execute_sql() takes longer than SLOW_QUERY_SEC, the query is re-run as
+EXPLAIN ANALYZE with DuckDB's JSON profiling on a background thread (the
+answer is not held up, and the profiling settings stay on that one cursor).
+The JSON profile is stored with the SQL and the question; the executor
+returns the id right away, the plan shows up once the re-run finishes:
+
+  GET /api/slow-queries            newest first, with per-query totals
+  GET /api/slow-queries/{id}       operators (timing, cardinality, rows scanned,
+                                   filters) + the raw DuckDB profile
+
+The same SQL is profiled at most once per SLOW_QUERY_DEDUP_SEC; later slow
+runs of it reuse that capture.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.db.duckdb_client import pooled_cursor
+from app.db.result_cache import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_ENABLED = os.getenv("SLOW_QUERY_ENABLED", "true").lower() == "true"
+SLOW_QUERY_SEC = float(os.getenv("SLOW_QUERY_SEC", "1.0"))
+SLOW_QUERY_DB_PATH = os.getenv("SLOW_QUERY_DB_PATH", os.path.join("data", "slow_queries.sqlite"))
+SLOW_QUERY_MAX = int(os.getenv("SLOW_QUERY_MAX", "500"))
+SLOW_QUERY_DEDUP_SEC = float(os.getenv("SLOW_QUERY_DEDUP_SEC", "3600"))
+
+
+def summarize_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Operator list (pre-order, with depth) + totals from a DuckDB JSON profile.
+    """
+    operators: List[Dict[str, Any]] = []
+
+    def walk(node: Dict[str, Any], depth: int) -> None:
+        if (node.get("operator_name") or node.get("operator_type")) == "EXPLAIN_ANALYZE":
+            for child in node.get("children") or []:
+                walk(child, depth)  # the wrapper, not part of the query
+            return
+        info = node.get("extra_info") or {}
+        operators.append({
+            "depth": depth,
+            "operator": node.get("operator_name") or node.get("operator_type"),
+            "ms": round(1000 * (node.get("operator_timing") or 0.0), 3),
+            "cardinality": node.get("operator_cardinality"),
+            "estimated": info.get("Estimated Cardinality"),
+            "rows_scanned": node.get("operator_rows_scanned"),
+            "table": info.get("Table"),
+            "filters": info.get("Filters"),
+        })
+        for child in node.get("children") or []:
+            walk(child, depth + 1)
+
+    for child in profile.get("children") or []:
+        walk(child, 0)
+
+    hottest = max(operators, key=lambda o: o["ms"], default=None)
+    return {
+        "latency_ms": round(1000 * (profile.get("latency") or 0.0), 3),
+        "rows_scanned": profile.get("cumulative_rows_scanned"),
+        "peak_buffer_memory": profile.get("system_peak_buffer_memory"),
+        "hottest_operator": hottest["operator"] if hottest else None,
+        "operators": operators,
+    }
+
+
+class SlowQueryStore:
+    def __init__(self, path: str = SLOW_QUERY_DB_PATH, max_entries: int = SLOW_QUERY_MAX):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL;")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS slow_queries (
+                    id TEXT PRIMARY KEY,
+                    sql_hash TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    sql TEXT NOT NULL,
+                    question TEXT,
+                    seconds REAL NOT NULL,
+                    rows INTEGER,
+                    status TEXT NOT NULL,
+                    summary TEXT,
+                    profile TEXT,
+                    error TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS slow_queries_hash ON slow_queries(sql_hash, created_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, sql: str, question: Optional[str], seconds: float, rows: Optional[int]) -> Tuple[str, bool]:
+        """
+        (id, new): a new pending capture, or the existing one when this SQL was
+        captured within SLOW_QUERY_DEDUP_SEC.
+        """
+        sql_hash = hashlib.sha1(normalize_sql(sql).encode()).hexdigest()
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM slow_queries WHERE sql_hash = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (sql_hash, now - SLOW_QUERY_DEDUP_SEC),
+            ).fetchone()
+            if row is not None:
+                return row[0], False
+            slow_id = uuid.uuid4().hex[:16]
+            db.execute(
+                "INSERT INTO slow_queries (id, sql_hash, created_at, sql, question, seconds, rows, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')",
+                (slow_id, sql_hash, now, sql, question, seconds, rows),
+            )
+            db.execute(
+                "DELETE FROM slow_queries WHERE id NOT IN "
+                "(SELECT id FROM slow_queries ORDER BY created_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+        return slow_id, True
+
+    def finish(self, slow_id: str, profile: Optional[Dict[str, Any]], error: Optional[str] = None) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE slow_queries SET status = ?, summary = ?, profile = ?, error = ? WHERE id = ?",
+                (
+                    "failed" if error else "captured",
+                    json.dumps(summarize_profile(profile)) if profile else None,
+                    json.dumps(profile) if profile else None,
+                    error,
+                    slow_id,
+                ),
+            )
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT id, created_at, sql, question, seconds, rows, status, summary, error "
+                "FROM slow_queries ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        out = []
+        for r in rows:
+            item = dict(r)
+            summary = json.loads(item.pop("summary")) if r["summary"] else None
+            if summary:
+                summary.pop("operators")
+            item["summary"] = summary
+            out.append(item)
+        return out
+
+    def get(self, slow_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute(
+                "SELECT id, created_at, sql, question, seconds, rows, status, summary, profile, error "
+                "FROM slow_queries WHERE id = ?",
+                (slow_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        item["summary"] = json.loads(row["summary"]) if row["summary"] else None
+        item["profile"] = json.loads(row["profile"]) if row["profile"] else None
+        return item
+
+
+_store: Optional[SlowQueryStore] = None
+_pool: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_slow_query_store() -> SlowQueryStore:
+    global _store
+    if _store is None:
+        _store = SlowQueryStore()
+    return _store
+
+
+def _profile(slow_id: str, sql: str) -> None:
+    try:
+        with pooled_cursor() as cur:
+            # settings are per cursor: nothing else runs with profiling on
+            cur.execute("PRAGMA enable_profiling = 'json'")
+            row = cur.execute(f"EXPLAIN ANALYZE {sql}").fetchone()
+        get_slow_query_store().finish(slow_id, json.loads(row[1]))
+    except Exception as e:
+        logger.warning("Slow query capture failed for %s", slow_id, exc_info=True)
+        get_slow_query_store().finish(slow_id, None, error=str(e)[:500])
+
+
+def capture_slow_query(sql: str, question: Optional[str], seconds: float, rows: Optional[int]) -> Optional[str]:
+    """
+    Id under which the plan of this slow query is (or will be) stored; the
+    EXPLAIN ANALYZE re-run is queued, never waited for.
+    """
+    global _pool
+    if not SLOW_QUERY_ENABLED:
+        return None
+    try:
+        slow_id, new = get_slow_query_store().add(sql, question, seconds, rows)
+        if not new:
+            return slow_id
+        with _lock:
+            if _pool is None:  # created on first use, i.e. after fork in pre-fork mode
+                _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query")
+        _pool.submit(_profile, slow_id, sql)
+        return slow_id
+    except Exception:
+        logger.warning("Could not queue slow query capture", exc_info=True)
+        return None
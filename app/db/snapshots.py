@@ -0,0 +1,181 @@
+# app/db/snapshots.py
+"""
+Blue/green DuckDB snapshots.
+
+DuckDB allows one writer per file, so rebuilds never write the file the API reads:
+
+  1) begin_snapshot()    -> copy of the current snapshot at snapshots/ops_<version>.duckdb
+  2) pipelines write into that new file
+  3) publish_snapshot()  -> atomically replace snapshots/CURRENT (os.replace)
+  4) gc_snapshots()      -> delete superseded files after a grace period
+
+Readers resolve the path through CURRENT on every get_conn() (cheap stat, see
+duckdb_client). Connections already open keep reading the old file until
+closed, so in-flight queries finish on the snapshot they started on.
+
+CURRENT also carries a schema hash; caches keyed on get_data_version() /
+get_schema_version() roll over automatically when a new snapshot is published.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import duckdb
+
+SNAPSHOT_DIR = os.getenv("DUCKDB_SNAPSHOT_DIR", os.path.join("data", "snapshots"))
+POINTER_FILE = "CURRENT"
+SNAPSHOT_GRACE_SEC = float(os.getenv("DUCKDB_SNAPSHOT_GRACE_SEC", "600"))
+SNAPSHOT_KEEP = int(os.getenv("DUCKDB_SNAPSHOT_KEEP", "2"))
+
+_pointer_cache: Dict[str, Any] = {"mtime": None, "data": None}
+
+
+def _pointer_path(snapshot_dir: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(snapshot_dir, POINTER_FILE)
+
+
+def read_pointer(snapshot_dir: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Current snapshot metadata, or None when snapshots aren't in use.
+    Re-parsed only when the pointer file's mtime changes.
+    """
+    path = _pointer_path(snapshot_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    if _pointer_cache["mtime"] != (path, mtime):
+        with open(path) as f:
+            _pointer_cache["data"] = json.load(f)
+        _pointer_cache["mtime"] = (path, mtime)
+    return _pointer_cache["data"]
+
+
+def schema_hash(conn: duckdb.DuckDBPyConnection) -> str:
+    # comments are part of the schema docs the RAG index is built from
+    rows = conn.execute("""
+        SELECT table_name, column_name, data_type, comment
+        FROM duckdb_columns()
+        WHERE schema_name = 'main' AND NOT internal
+        ORDER BY table_name, column_index
+    """).fetchall()
+    comments = conn.execute("""
+        SELECT table_name, comment FROM duckdb_tables() WHERE schema_name = 'main'
+        UNION ALL
+        SELECT view_name, comment FROM duckdb_views() WHERE schema_name = 'main' AND NOT internal
+        ORDER BY 1
+    """).fetchall()
+    return hashlib.sha256(json.dumps([rows, comments]).encode()).hexdigest()[:16]
+
+
+def begin_snapshot(snapshot_dir: str = SNAPSHOT_DIR, base_path: Optional[str] = None) -> str:
+    """
+    Create a new versioned DB file for writers and return its path.
+    Starts as a copy of the current snapshot (or base_path) so steps that
+    skip-if-fresh still find their inputs; published snapshots are never
+    written, so copying them while readers are open is safe.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    now = time.time()
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"_{int(now * 1e6) % 1_000_000:06d}"
+    path = os.path.join(snapshot_dir, f"ops_{version}.duckdb")
+
+    pointer = read_pointer(snapshot_dir)
+    src = base_path or (pointer or {}).get("path")
+    if src and os.path.exists(src):
+        shutil.copyfile(src, path)
+    return path
+
+
+def publish_snapshot(path: str, snapshot_dir: str = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """
+    Checkpoint the new file and atomically point CURRENT at it.
+    Writers must have closed their connections to `path` first.
+    """
+    conn = duckdb.connect(path)
+    conn.execute("CHECKPOINT;")
+    shash = schema_hash(conn)
+    conn.close()
+
+    previous = read_pointer(snapshot_dir)
+    version = os.path.basename(path)[len("ops_"):-len(".duckdb")]
+    data = {
+        "version": version,
+        "path": path,
+        "schema_hash": shash,
+        "published_at": time.time(),
+        "previous": (previous or {}).get("path"),
+    }
+
+    tmp = _pointer_path(snapshot_dir) + f".{uuid.uuid4().hex[:6]}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _pointer_path(snapshot_dir))
+
+    # mark when the old snapshot was superseded (its mtime is the GC grace clock)
+    if data["previous"] and os.path.exists(data["previous"]):
+        os.utime(data["previous"])
+    return data
+
+
+def list_snapshots(snapshot_dir: str = SNAPSHOT_DIR) -> List[str]:
+    if not os.path.isdir(snapshot_dir):
+        return []
+    files = [f for f in os.listdir(snapshot_dir) if f.startswith("ops_") and f.endswith(".duckdb")]
+    return [os.path.join(snapshot_dir, f) for f in sorted(files)]
+
+
+def gc_snapshots(
+    snapshot_dir: str = SNAPSHOT_DIR,
+    keep: int = SNAPSHOT_KEEP,
+    grace_sec: float = SNAPSHOT_GRACE_SEC,
+) -> List[str]:
+    """
+    Delete old snapshot files: never the current one, always keep the newest `keep`,
+    and only files superseded more than grace_sec ago (publish touches the previous
+    file), long enough for in-flight readers to finish.
+    """
+    pointer = read_pointer(snapshot_dir) or {}
+    current = pointer.get("path")
+    files = list_snapshots(snapshot_dir)
+    candidates = [f for f in files[:-keep] if f != current] if keep > 0 else [f for f in files if f != current]
+
+    removed = []
+    now = time.time()
+    for f in candidates:
+        if now - os.path.getmtime(f) < grace_sec:
+            continue
+        for p in (f, f + ".wal"):
+            if os.path.exists(p):
+                os.remove(p)
+        removed.append(f)
+    return removed
+
+
+@contextmanager
+def writable_snapshot(snapshot_dir: str = SNAPSHOT_DIR, base_path: Optional[str] = None) -> Iterator[str]:
+    """
+    with writable_snapshot() as path:
+        conn = duckdb.connect(path); ...; conn.close()
+    Publishes on success; on error the half-built file is deleted and CURRENT is untouched.
+    """
+    path = begin_snapshot(snapshot_dir, base_path=base_path)
+    try:
+        yield path
+    except Exception:
+        for p in (path, path + ".wal"):
+            if os.path.exists(p):
+                os.remove(p)
+        raise
+    publish_snapshot(path, snapshot_dir)
+    gc_snapshots(snapshot_dir)
@@ -0,0 +1,567 @@
+# app/fakedb/vectorized_gen.py
+"""
+NumPy-vectorized synthetic ops generator for benchmarking / load testing.
+
+Same distributions as build_fake_db.gen_ops_events (rush-hour multipliers,
+disruption impacts, reason weights) but every column is drawn as a whole array
+per (airport block x time block) instead of row by row in Python.
+
+Output goes straight to DuckDB or to hive-partitioned Parquet via Arrow tables
+(no pandas DataFrames in between).
+
+Examples:
+  python -m app.fakedb.vectorized_gen --airports 50 --days 365 --step-minutes 1
+  python -m app.fakedb.vectorized_gen --airports 20 --days 90 --parquet-dir data/parquet
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+from app.db.clustering import cluster_tables
+from app.db.duckdb_client import get_conn
+
+# Real airports first (same codes / base volumes as build_fake_db), synthetic ones after
+BASE_AIRPORTS: List[Tuple[str, str, int]] = [
+    ("LHR", "London Heathrow", 110),
+    ("CDG", "Paris Charles de Gaulle", 95),
+    ("FRA", "Frankfurt", 90),
+    ("AMS", "Amsterdam Schiphol", 85),
+    ("DXB", "Dubai", 120),
+]
+
+# rush hours: morning + evening, quiet at night (index = hour of day)
+RUSH_MULTIPLIER = np.ones(24, dtype=np.float64)
+RUSH_MULTIPLIER[6:11] = 1.6
+RUSH_MULTIPLIER[16:21] = 1.5
+RUSH_MULTIPLIER[0:5] = 0.6
+
+DISRUPTION_PROB = 0.01
+DISRUPTION_TYPES = ["SECURITY", "WEATHER", "ATC", "SYSTEM"]
+DISRUPTION_TYPE_WEIGHTS = [0.35, 0.25, 0.25, 0.15]
+SEVERITIES = ["LOW", "MED", "HIGH"]
+SEVERITY_WEIGHTS = [0.5, 0.35, 0.15]
+IMPACTED_AREAS = ["CHECKIN", "SECURITY", "BOARDING"]
+IMPACTED_AREA_WEIGHTS = [0.2, 0.6, 0.2]
+
+BOARDING_EVENT_PROB = 0.4
+BOARDING_HEAVY_DELAY_PROB = 0.06
+REASON_CODES = ["CREW", "GATE", "WX", "SEC", "ATC", "BAG", "TECH"]
+REASON_WEIGHTS = [0.12, 0.18, 0.10, 0.12, 0.16, 0.18, 0.14]
+
+OPS_TABLES = ["checkin_events", "presecurity_events", "boarding_events", "disruption_events"]
+
+# plan_blocks aims for at least this many blocks (of >= 10k rows) so a process pool stays busy
+PLAN_MIN_BLOCKS = 64
+
+
+@dataclass
+class ScaleFactor:
+    """
+    Size of a synthetic dataset: airports x days x event frequency.
+
+    step_minutes is the check-in / security sampling interval (5 in the demo DB);
+    boarding events are sampled every 3 * step_minutes like the original 5/15 split.
+    """
+    airports: int = 5
+    days: float = 7
+    step_minutes: int = 5
+
+    @property
+    def minutes(self) -> int:
+        return int(self.days * 24 * 60)
+
+    @property
+    def slots(self) -> int:
+        # inclusive end, same as build_fake_db._ts_range
+        return self.minutes // self.step_minutes + 1
+
+    @property
+    def boarding_step_minutes(self) -> int:
+        return self.step_minutes * 3
+
+    def estimated_rows(self) -> int:
+        """Rough total across the four ops tables (for progress / sizing)."""
+        per_airport = (
+            2 * self.slots
+            + self.slots * DISRUPTION_PROB
+            + (self.minutes // self.boarding_step_minutes + 1) * BOARDING_EVENT_PROB
+        )
+        return int(self.airports * per_airport)
+
+
+def airports_for_scale(n: int, seed: int = 42) -> List[Tuple[str, str, int]]:
+    """
+    Returns n (code, name, base_volume) tuples.
+    The 5 demo airports come first; the rest are synthetic (S001, S002, ...).
+    """
+    out = list(BASE_AIRPORTS[:n])
+    extra = n - len(out)
+    if extra > 0:
+        rng = np.random.default_rng(seed)
+        volumes = rng.integers(60, 140, size=extra)
+        for i in range(extra):
+            out.append((f"S{i + 1:03d}", f"Synthetic Airport {i + 1}", int(volumes[i])))
+    return out
+
+
+def _dict_array(indices: np.ndarray, values: List[str]) -> pa.DictionaryArray:
+    return pa.DictionaryArray.from_arrays(pa.array(indices.astype(np.int32)), pa.array(values))
+
+
+def _ts_grid(start: np.datetime64, first_slot: int, n_slots: int, step_minutes: int) -> np.ndarray:
+    offsets = (np.arange(first_slot, first_slot + n_slots, dtype=np.int64) * step_minutes).astype("timedelta64[m]")
+    return (start + offsets).astype("datetime64[us]")
+
+
+def gen_ops_block(
+    rng: np.random.Generator,
+    airports: List[Tuple[str, str, int]],
+    start: np.datetime64,
+    first_slot: int,
+    n_slots: int,
+    step_minutes: int = 5,
+) -> Dict[str, pa.Table]:
+    """
+    Generate check-in / security / disruption rows for a block of airports x slots,
+    ordered by (airport, ts). Returns Arrow tables keyed by target table name.
+    """
+    codes = [a[0] for a in airports]
+    n_ap = len(airports)
+    n = n_ap * n_slots
+
+    ts_one = _ts_grid(start, first_slot, n_slots, step_minutes)
+    ts = np.tile(ts_one, n_ap)
+    ap_idx = np.repeat(np.arange(n_ap), n_slots)
+    base = np.repeat(np.array([a[2] for a in airports], dtype=np.float64), n_slots)
+
+    hours = ((ts_one - ts_one.astype("datetime64[D]")).astype("timedelta64[h]").astype(np.int64))
+    rush = np.tile(RUSH_MULTIPLIER[hours], n_ap)
+
+    pax = np.maximum(0, rng.normal(base * rush, 18)).astype(np.int32)
+    counters_open = np.clip(rng.normal(14 * rush, 3), 6, 35).astype(np.int32)
+    lanes_open = np.clip(rng.normal(7 * rush, 2), 3, 18).astype(np.int32)
+    queue_len = np.maximum(0, rng.normal(pax * 0.6, pax * 0.25)).astype(np.int32)
+
+    # waits correlated with load vs capacity
+    checkin_wait = np.maximum(0, pax / np.maximum(1, counters_open) * rng.uniform(0.6, 1.2, n))
+    security_wait = np.maximum(0, queue_len / np.maximum(1, lanes_open) * rng.uniform(0.4, 0.9, n))
+
+    # disruptions: low probability but increases wait
+    d_idx = np.flatnonzero(rng.random(n) < DISRUPTION_PROB)
+    n_d = d_idx.size
+    d_type = rng.choice(len(DISRUPTION_TYPES), size=n_d, p=DISRUPTION_TYPE_WEIGHTS)
+    d_sev = rng.choice(len(SEVERITIES), size=n_d, p=SEVERITY_WEIGHTS)
+    d_area = rng.choice(len(IMPACTED_AREAS), size=n_d, p=IMPACTED_AREA_WEIGHTS)
+
+    sec_hit = d_idx[d_area == 1]
+    security_wait[sec_hit] *= rng.uniform(1.6, 2.6, sec_hit.size)
+    queue_len[sec_hit] = (queue_len[sec_hit] * rng.uniform(1.3, 1.9, sec_hit.size)).astype(np.int32)
+    chk_hit = d_idx[d_area == 0]
+    checkin_wait[chk_hit] *= rng.uniform(1.4, 2.2, chk_hit.size)
+    brd_hit = d_idx[d_area == 2]
+    security_wait[brd_hit] *= rng.uniform(1.1, 1.4, brd_hit.size)
+
+    airport_col = _dict_array(ap_idx, codes)
+
+    checkin = pa.table({
+        "airport": airport_col,
+        "ts": ts,
+        "pax_count": pax,
+        "avg_wait_min": np.round(checkin_wait, 2),
+        "counters_open": counters_open,
+    })
+    presecurity = pa.table({
+        "airport": airport_col,
+        "ts": ts,
+        "pax_count": pax,
+        "avg_wait_min": np.round(security_wait, 2),
+        "lanes_open": lanes_open,
+        "queue_len": queue_len,
+    })
+
+    notes = np.char.add(
+        np.char.add(np.array(DISRUPTION_TYPES)[d_type], " event - "),
+        np.array(SEVERITIES)[d_sev],
+    )
+    disruption = pa.table({
+        "airport": _dict_array(ap_idx[d_idx], codes),
+        "ts": ts[d_idx],
+        "disruption_type": _dict_array(d_type, DISRUPTION_TYPES),
+        "severity": _dict_array(d_sev, SEVERITIES),
+        "impacted_area": _dict_array(d_area, IMPACTED_AREAS),
+        "notes": pa.array(notes.astype(object), type=pa.string()),
+    })
+
+    return {
+        "checkin_events": checkin,
+        "presecurity_events": presecurity,
+        "disruption_events": disruption,
+    }
+
+
+def gen_boarding_block(
+    rng: np.random.Generator,
+    airports: List[Tuple[str, str, int]],
+    start: np.datetime64,
+    first_slot: int,
+    n_slots: int,
+    step_minutes: int = 15,
+) -> pa.Table:
+    """
+    Generic boarding delay events (flight_id left NULL, enriched later if needed).
+    """
+    codes = [a[0] for a in airports]
+    n_ap = len(airports)
+    n = n_ap * n_slots
+
+    ts = np.tile(_ts_grid(start, first_slot, n_slots, step_minutes), n_ap)
+    ap_idx = np.repeat(np.arange(n_ap), n_slots)
+
+    keep = np.flatnonzero(rng.random(n) < BOARDING_EVENT_PROB)
+    k = keep.size
+
+    delay = np.maximum(0, rng.normal(4, 8, k))
+    heavy = rng.random(k) < BOARDING_HEAVY_DELAY_PROB
+    delay[heavy] += rng.integers(20, 81, heavy.sum())
+    reason = rng.choice(len(REASON_CODES), size=k, p=REASON_WEIGHTS)
+
+    return pa.table({
+        "airport": _dict_array(ap_idx[keep], codes),
+        "ts": ts[keep],
+        "flight_id": pa.nulls(k, type=pa.string()),
+        "boarding_delay_min": np.round(delay, 2),
+        "reason_code": _dict_array(reason, REASON_CODES),
+    })
+
+
+def plan_blocks(scale: ScaleFactor, target_rows: int = 2_000_000) -> List[Tuple[int, int, int, int]]:
+    """
+    Split the (airport x slot) grid into blocks of roughly target_rows ops rows
+    (smaller when needed for PLAN_MIN_BLOCKS blocks, so a process pool has work to spread).
+    Returns (airport_lo, airport_hi, slot_lo, slot_hi) tuples, airport-major.
+
+    Each block gets its own seed, so the plan depends only on the scale and
+    target_rows, never on the worker count: the output is the same for any workers.
+    """
+    target_rows = min(target_rows, max(10_000, scale.airports * scale.slots // PLAN_MIN_BLOCKS))
+    slots_per_block = max(1, min(scale.slots, target_rows))
+    airports_per_block = max(1, min(scale.airports, target_rows // slots_per_block))
+
+    # keep slot blocks aligned to the boarding step so boarding slots split cleanly
+    ratio = scale.boarding_step_minutes // scale.step_minutes
+    if slots_per_block < scale.slots:
+        slots_per_block = max(ratio, slots_per_block - slots_per_block % ratio)
+
+    blocks = []
+    for a_lo in range(0, scale.airports, airports_per_block):
+        a_hi = min(scale.airports, a_lo + airports_per_block)
+        for s_lo in range(0, scale.slots, slots_per_block):
+            blocks.append((a_lo, a_hi, s_lo, min(scale.slots, s_lo + slots_per_block)))
+    return blocks
+
+
+def gen_block_tables(
+    scale: ScaleFactor,
+    airports: List[Tuple[str, str, int]],
+    start: np.datetime64,
+    block: Tuple[int, int, int, int],
+    seed_seq: np.random.SeedSequence,
+) -> Dict[str, pa.Table]:
+    """
+    Generate all four ops tables for one block. Deterministic for a given seed_seq,
+    so blocks can be produced in any order (or in parallel).
+    """
+    a_lo, a_hi, s_lo, s_hi = block
+    rng = np.random.default_rng(seed_seq)
+    aps = airports[a_lo:a_hi]
+
+    out = gen_ops_block(rng, aps, start, s_lo, s_hi - s_lo, scale.step_minutes)
+
+    ratio = scale.boarding_step_minutes // scale.step_minutes
+    b_lo = -(-s_lo // ratio)
+    b_hi = -(-s_hi // ratio)
+    out["boarding_events"] = gen_boarding_block(rng, aps, start, b_lo, b_hi - b_lo, scale.boarding_step_minutes)
+    return out
+
+
+def iter_ops_tables(
+    scale: ScaleFactor,
+    start_utc: datetime,
+    seed: int = 42,
+    target_rows: int = 2_000_000,
+) -> Iterator[Dict[str, pa.Table]]:
+    """
+    Yields one dict of Arrow tables per block; memory stays bounded by target_rows.
+    """
+    airports = airports_for_scale(scale.airports, seed=seed)
+    start = np.datetime64(start_utc.replace(tzinfo=None), "m")
+    blocks = plan_blocks(scale, target_rows=target_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+
+    for block, ss in zip(blocks, seeds):
+        yield gen_block_tables(scale, airports, start, block, ss)
+
+
+def gen_ops_tables(start_utc: datetime, hours: int = 24 * 7, seed: int = 42) -> Dict[str, pa.Table]:
+    """
+    Small-scale helper: the 5 demo airports at 5-minute resolution, as single Arrow tables.
+    """
+    scale = ScaleFactor(airports=len(BASE_AIRPORTS), days=hours / 24, step_minutes=5)
+    parts = list(iter_ops_tables(scale, start_utc, seed=seed))
+    return {t: pa.concat_tables([p[t] for p in parts]) for t in OPS_TABLES}
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+def write_dim_airport(conn, airports: List[Tuple[str, str, int]]) -> None:
+    tbl = pa.table({
+        "airport": [a[0] for a in airports],
+        "airport_name": [a[1] for a in airports],
+    })
+    conn.execute("DELETE FROM dim_airport;")
+    conn.register("dim_airport_arrow", tbl)
+    conn.execute("INSERT INTO dim_airport SELECT * FROM dim_airport_arrow;")
+    conn.unregister("dim_airport_arrow")
+
+
+def append_to_duckdb(conn, table: str, tbl: pa.Table) -> None:
+    """Append an Arrow table to an existing DuckDB table (columns in table order)."""
+    conn.register("arrow_batch", tbl)
+    conn.execute(f"INSERT INTO {table} SELECT * FROM arrow_batch;")
+    conn.unregister("arrow_batch")
+
+
+def write_parquet_partitioned(conn, table: str, tbl: pa.Table, out_dir: str) -> None:
+    """
+    Append an Arrow table as hive-partitioned Parquet: <out_dir>/<table>/day=.../airport=.../*.parquet
+    """
+    target = os.path.join(out_dir, table)
+    conn.register("arrow_batch", tbl)
+    conn.execute(f"""
+        COPY (SELECT *, CAST(ts AS DATE) AS day FROM arrow_batch)
+        TO '{target}'
+        (FORMAT PARQUET, PARTITION_BY (day, airport), OVERWRITE_OR_IGNORE, FILENAME_PATTERN 'part_{{uuid}}');
+    """)
+    conn.unregister("arrow_batch")
+
+
+# -----------------------------
+# Parallel fan-out + bulk load
+# -----------------------------
+def _run_block(
+    scale: ScaleFactor,
+    airports: List[Tuple[str, str, int]],
+    start: np.datetime64,
+    block: Tuple[int, int, int, int],
+    seed_seq: np.random.SeedSequence,
+    parquet_dir: Optional[str] = None,
+) -> Tuple[Dict[str, int], Optional[Dict[str, pa.Table]]]:
+    """
+    Worker entry point (top-level so it pickles under spawn as well as fork).
+    With parquet_dir the worker writes its own shards and only returns counts;
+    otherwise the Arrow tables are handed back for a bulk append.
+    """
+    tables = gen_block_tables(scale, airports, start, block, seed_seq)
+    counts = {t: tbl.num_rows for t, tbl in tables.items()}
+    if parquet_dir is None:
+        return counts, tables
+
+    conn = duckdb.connect()
+    for t, tbl in tables.items():
+        write_parquet_partitioned(conn, t, tbl, parquet_dir)
+    conn.close()
+    return counts, None
+
+
+def iter_block_results(
+    scale: ScaleFactor,
+    start_utc: datetime,
+    seed: int = 42,
+    target_rows: int = 2_000_000,
+    workers: int = 1,
+    parquet_dir: Optional[str] = None,
+) -> Iterator[Tuple[Dict[str, int], Optional[Dict[str, pa.Table]]]]:
+    """
+    Runs _run_block for every (airport x time) partition, in a process pool when
+    workers > 1. Results arrive in completion order; at most 2 * workers blocks
+    are in flight so memory stays bounded. The blocks (and their data) are the
+    same for every worker count.
+    """
+    airports = airports_for_scale(scale.airports, seed=seed)
+    start = np.datetime64(start_utc.replace(tzinfo=None), "m")
+
+    blocks = plan_blocks(scale, target_rows=target_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    jobs = [(scale, airports, start, b, ss, parquet_dir) for b, ss in zip(blocks, seeds)]
+
+    if workers <= 1:
+        for job in jobs:
+            yield _run_block(*job)
+        return
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        it = iter(jobs)
+        for job in it:
+            pending.add(pool.submit(_run_block, *job))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.add(pool.submit(_run_block, *nxt))
+
+
+class _Progress:
+    """Prints block progress and running rows/sec."""
+
+    def __init__(self, total_rows: int, every_sec: float = 2.0):
+        self.total_rows = total_rows
+        self.every_sec = every_sec
+        self.rows = 0
+        self.blocks = 0
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+
+    def update(self, rows: int) -> None:
+        self.rows += rows
+        self.blocks += 1
+        now = time.perf_counter()
+        if now - self._last >= self.every_sec:
+            self._last = now
+            pct = 100.0 * self.rows / max(1, self.total_rows)
+            rate = self.rows / max(now - self.t0, 1e-9)
+            print(f"  ... {self.rows:,} rows (~{pct:.0f}%), {self.blocks} blocks, {rate:,.0f} rows/s")
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t0
+
+
+def load_ops(
+    conn: duckdb.DuckDBPyConnection,
+    scale: ScaleFactor,
+    start_utc: datetime,
+    seed: int = 42,
+    workers: int = 1,
+    target_rows: int = 2_000_000,
+    progress: bool = True,
+) -> Dict[str, int]:
+    """
+    Replace the four ops tables with a generated dataset in ONE transaction:
+    DELETE + bulk Arrow appends commit together, so readers never see a half load.
+    Blocks arrive in completion order, so tables are re-sorted by (airport, ts) before commit.
+    """
+    counts = {t: 0 for t in OPS_TABLES}
+    prog = _Progress(scale.estimated_rows(), every_sec=2.0 if progress else float("inf"))
+
+    conn.execute("BEGIN TRANSACTION;")
+    try:
+        for t in OPS_TABLES:
+            conn.execute(f"DELETE FROM {t};")
+        for block_counts, tables in iter_block_results(
+            scale, start_utc, seed=seed, target_rows=target_rows, workers=workers
+        ):
+            for t, tbl in tables.items():
+                append_to_duckdb(conn, t, tbl)
+                counts[t] += block_counts[t]
+            prog.update(sum(block_counts.values()))
+        cluster_tables(conn, OPS_TABLES)
+        conn.execute("COMMIT;")
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+    return counts
+
+
+def generate(
+    scale: ScaleFactor,
+    db_path: Optional[str] = None,
+    parquet_dir: Optional[str] = None,
+    seed: int = 42,
+    end_utc: Optional[datetime] = None,
+    target_rows: int = 2_000_000,
+    workers: int = 1,
+) -> Dict[str, int]:
+    """
+    Generate a scaled dataset and write it to DuckDB (default) or partitioned Parquet.
+    DuckDB ops tables are overwritten; Parquet output is appended to parquet_dir.
+    Returns row counts per table.
+    """
+    from app.fakedb.build_fake_db import create_tables
+
+    end = end_utc or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=scale.days)
+
+    if parquet_dir:
+        os.makedirs(parquet_dir, exist_ok=True)
+        counts = {t: 0 for t in OPS_TABLES}
+        prog = _Progress(scale.estimated_rows())
+        for block_counts, _ in iter_block_results(
+            scale, start, seed=seed, target_rows=target_rows, workers=workers, parquet_dir=parquet_dir
+        ):
+            for t, cnt in block_counts.items():
+                counts[t] += cnt
+            prog.update(sum(block_counts.values()))
+        return counts
+
+    conn = get_conn(db_path)
+    create_tables(conn)
+    write_dim_airport(conn, airports_for_scale(scale.airports, seed=seed))
+    counts = load_ops(conn, scale, start, seed=seed, workers=workers, target_rows=target_rows)
+    conn.close()
+    return counts
+
+
+def print_summary(counts: Dict[str, int], elapsed: float) -> None:
+    total = sum(counts.values())
+    for t, cnt in counts.items():
+        print(f"  - {t}: {cnt:,} rows")
+    print(f"✅ {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized synthetic ops data generator")
+    parser.add_argument("--airports", type=int, default=5)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--step-minutes", type=int, default=5, help="check-in/security event interval")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-path", default=None, help="DuckDB file (default: DUCKDB_PATH)")
+    parser.add_argument("--parquet-dir", default=None, help="write hive-partitioned Parquet here instead")
+    parser.add_argument("--target-rows", type=int, default=2_000_000, help="rows per generated block")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes")
+    args = parser.parse_args()
+
+    scale = ScaleFactor(airports=args.airports, days=args.days, step_minutes=args.step_minutes)
+    print(f"Generating ~{scale.estimated_rows():,} rows ({scale.airports} airports x {scale.days} days, "
+          f"every {scale.step_minutes} min, {args.workers} workers)")
+
+    t0 = time.perf_counter()
+    counts = generate(
+        scale,
+        db_path=args.db_path,
+        parquet_dir=args.parquet_dir,
+        seed=args.seed,
+        target_rows=args.target_rows,
+        workers=args.workers,
+    )
+    print_summary(counts, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
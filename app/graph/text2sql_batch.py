@@ -0,0 +1,118 @@
+# app/graph/text2sql_batch.py
+"""
+Batch Text2SQL for reporting jobs that ask hundreds of questions at once.
+
+  1) dedupe questions (case / whitespace-insensitive)
+  2) rewrite them with at most `concurrency` LLM calls in flight
+  3) embed all rewritten queries in ONE embedding call and search the schema
+     index by vector; identical rewritten queries share the retrieved docs
+  4) run generate -> validate -> execute -> explain per question on the same
+     bounded pool; SQL runs on cursors of the shared DuckDB connection
+
+Results are yielded in completion order.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.agents.query_rewriter import rewrite_query
+from app.graph.text2sql_graph import run_text2sql
+from app.rag.embeddings_factory import get_embeddings
+from app.rag.schema_index import get_schema_vectorstore
+
+logger = logging.getLogger(__name__)
+
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+
+
+def normalize_question(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+def dedupe_questions(questions: List[str]) -> Dict[str, List[int]]:
+    """
+    normalized question -> input indices (first-seen order).
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, q in enumerate(questions):
+        groups.setdefault(normalize_question(q), []).append(i)
+    return groups
+
+
+def _retrieve_all(rewritten: List[str], k: int) -> Dict[str, List[Any]]:
+    """
+    One batched embedding pass for all distinct queries, then vector search each.
+    """
+    distinct = list(dict.fromkeys(rewritten))
+    vectors = get_embeddings().embed_documents(distinct)
+    vs = get_schema_vectorstore()
+    return {q: vs.similarity_search_by_vector(v, k=k) for q, v in zip(distinct, vectors)}
+
+
+def run_text2sql_batch(
+    questions: List[str],
+    top_k_schema: int = 5,
+    return_rows: int = 20,
+    concurrency: int = BATCH_LLM_CONCURRENCY,
+    explain: str = "inline",
+) -> Iterator[Tuple[List[int], str, Dict[str, Any]]]:
+    """
+    Yields (input indices, question, run_text2sql output) as each distinct question finishes.
+    """
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise ValueError(f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+
+    groups = dedupe_questions(questions)
+    firsts = {key: questions[idx[0]] for key, idx in groups.items()}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        # 2) rewrite (LLM), bounded by the pool size
+        t0 = time.perf_counter()
+        rewrites: Dict[str, Dict[str, Any]] = {}
+        futures = {pool.submit(rewrite_query, q): key for key, q in firsts.items()}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            try:
+                rewrites[key] = fut.result()
+            except Exception as e:
+                logger.warning("Rewrite failed for %r: %s", firsts[key], e)
+                rewrites[key] = {"rewritten_query": firsts[key], "intent": "UNKNOWN", "entities": {}}
+        logger.info("Batch rewrite: %d questions in %.2fs", len(firsts), time.perf_counter() - t0)
+
+        # 3) shared retrieval
+        t0 = time.perf_counter()
+        rewritten = {key: r.get("rewritten_query") or firsts[key] for key, r in rewrites.items()}
+        docs_by_query = _retrieve_all(list(rewritten.values()), k=top_k_schema)
+        logger.info("Batch retrieval: %d distinct queries in %.2fs", len(docs_by_query), time.perf_counter() - t0)
+
+        # 4) the rest of the pipeline, completion order
+        futures = {
+            pool.submit(
+                run_text2sql,
+                user_question=firsts[key],
+                top_k_schema=top_k_schema,
+                return_rows=return_rows,
+                rewrite=rewrites[key],
+                schema_docs=docs_by_query[rewritten[key]],
+                explain=explain,
+            ): key
+            for key in firsts
+        }
+        try:
+            for fut in as_completed(futures):
+                key = futures[fut]
+                try:
+                    out = fut.result()
+                except Exception as e:
+                    logger.error("Batch question failed: %r", firsts[key], exc_info=True)
+                    out = {"ok": False, "stage": "exception", "message": str(e)}
+                yield groups[key], firsts[key], out
+        finally:
+            # consumer went away (client disconnected): don't start the remaining questions
+            for fut in futures:
+                fut.cancel()
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import json
+import logging
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from app.audit.langsmith_tracing import tracing_session, traceable_fn
-from app.state.agent_state import AgentState
-from app.rag.schema_index import build_schema_index
+from app.audit.local_tracing import span
+from app.state.agent_state import AgentState, Execution, Generation, Retrieval, Rewrite, Validation
+from app.rag.schema_index import get_schema_vectorstore
 from app.agents.query_rewriter import rewrite_query
-from app.agents.sql_generator import generate_sql
+from app.agents.sql_generator import edit_sql, generate_sql
 from app.agents.sql_validator import validate_and_autofix_sql
 from app.agents.sql_executor import execute_sql
-from app.agents.explainer import explain_answer
+from app.agents.explainer import explain_prepared, prepare_explanation
+from app.state.checkpoints import STAGES, get_checkpoint_store
+from app.state.explanations import get_explanation_store
+from app.state.sessions import looks_like_followup
+
+logger = logging.getLogger(__name__)
 
 
 def _safe_get_sql(candidate_sql: Any) -> str:
@@ -25,17 +34,91 @@ def _safe_get_sql(candidate_sql: Any) -> str:
     return ""
 
 
+def _preview_rows(table: Any, n: int) -> Optional[List[Dict[str, Any]]]:
+    if table is None:
+        return None
+    return json.loads(table.slice(0, n).to_pandas().to_json(orient="records", date_format="iso"))
+
+
+def _emit(on_stage: Optional[Callable[[str, Dict[str, Any]], None]], stage: str, output: Dict[str, Any]) -> None:
+    # progress hook (async jobs); must never break the pipeline
+    if on_stage is None:
+        return
+    try:
+        on_stage(stage, output)
+    except Exception:
+        logger.warning("on_stage callback failed for %s", stage, exc_info=True)
+
+
+def _checkpoint(key: Optional[str], question: str, stage: str, output: Dict[str, Any]) -> None:
+    # a retry with the same key resumes after the last saved stage; must never break the pipeline
+    if not key:
+        return
+    try:
+        get_checkpoint_store().save(key, question, stage, output)
+    except Exception:
+        logger.warning("Could not checkpoint %s", stage, exc_info=True)
+
+
+def explain_by_id(explain_id: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+    """
+    (explanation, cached) for a stored explain id, or None if unknown / expired.
+    The first call runs the explainer; later calls return the stored result.
+    """
+    store = get_explanation_store()
+    hit = store.get(explain_id)
+    if hit is None:
+        return None
+    prepared, explanation = hit
+    if explanation is not None:
+        return explanation, True
+    explanation = explain_prepared(prepared)
+    store.set_explanation(explain_id, explanation)
+    return explanation, False
+
+
 @traceable_fn("run_text2sql")
 def run_text2sql(
     user_question: str,
     top_k_schema: int = 5,
     return_rows: int = 20,
-    enable_viz: bool = False,  # reserved for future
+    enable_viz: bool = False,  # charts are built by the API from the stored result (app.api.charts)
+    on_stage: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    rewrite: Optional[Dict[str, Any]] = None,
+    schema_docs: Optional[List[Any]] = None,
+    previous: Optional[AgentState] = None,
+    followup: Optional[bool] = None,
+    explain: str = "inline",  # none | deferred | inline
+    role: Optional[str] = None,  # caller role (app.auth.policy), recorded in the query log
+    debug: bool = False,
+    checkpoint_key: Optional[str] = None,  # idempotency key: stage outputs are checkpointed under it
+    resume_from: Optional[str] = None,  # replay from this stage (app.state.checkpoints.STAGES)
 ) -> Dict[str, Any]:
     """
     End-to-end Text2SQL pipeline.
     Safe for terminal + Jupyter.
+    on_stage(stage, output) is called with JSON-safe partial outputs as stages finish.
+    rewrite / schema_docs: precomputed rewriter output / retrieved docs (batch mode shares them).
+    previous: last state of the conversation (app.state.sessions). A follow-up
+    (followup=True, or auto-detected when None) edits its validated SQL with
+    its retrieved schema in one LLM call instead of rewrite + retrieval +
+    generation; if that fails the question runs through the full pipeline.
+    explain: "inline" explains now, "deferred" only stores the explainer input
+    and returns explain_id (see explain_by_id), "none" skips it.
+    debug: include the full rewriter / generator / validator outputs under
+    "debug" (otherwise only a few scalars: follow-up, explainer, executor).
+    The result is returned once, as an Arrow table ("result").
+    checkpoint_key: rewrite / retrieval / generation / validation outputs are
+    saved under it; a retry with the same key and question continues after the
+    last saved stage. resume_from re-runs that stage and everything after it
+    (e.g. "sql_execution": the validated SQL against current data).
     """
+    if resume_from is not None:
+        if resume_from not in STAGES:
+            raise ValueError(f"Unknown stage: {resume_from!r} (expected one of {', '.join(STAGES)})")
+        if not checkpoint_key:
+            raise ValueError("resume_from needs a checkpoint_key")
+
     with tracing_session():
 
         # -----------------------------
@@ -43,135 +126,278 @@ def run_text2sql(
         # -----------------------------
         state = AgentState(user_question=user_question)
 
+        # -----------------------------
+        # Checkpoints of an earlier attempt with this key
+        # -----------------------------
+        done: Dict[str, Dict[str, Any]] = {}
+        if checkpoint_key:
+            try:
+                done = get_checkpoint_store().load(checkpoint_key, user_question, before=resume_from)
+            except Exception:
+                logger.warning("Could not load checkpoints; running every stage", exc_info=True)
+
+        # -----------------------------
+        # Follow-up turn: edit the previous SQL
+        # -----------------------------
+        edit: Optional[Dict[str, Any]] = None
+        if (
+            previous is not None
+            and "rewrite" not in done
+            and previous.validation.ok
+            and previous.validation.final_sql
+            and previous.retrieval.schema_context
+        ):
+            if followup if followup is not None else looks_like_followup(user_question):
+                edit = edit_sql(
+                    followup=user_question,
+                    previous_question=previous.rewrite.rewritten_query or previous.user_question,
+                    previous_sql=previous.validation.final_sql,
+                    schema_context=previous.retrieval.schema_context,
+                )
+                if not _safe_get_sql(edit).strip():
+                    logger.info("Follow-up edit returned no SQL; running the full pipeline")
+                    edit = None
+
         # -----------------------------
         # STEP 5: Query Rewriter
         # -----------------------------
-        rew = rewrite_query(state.user_question)
-        state.rewritten_query = rew.get("rewritten_query", state.user_question)
-        state.intent = rew.get("intent", "UNKNOWN")
-        state.entities = rew.get("entities", {}) or {}
+        if "rewrite" in done:
+            rew = done["rewrite"]
+        else:
+            if edit is not None:
+                # the editor already restated the follow-up as a standalone question
+                rew = {
+                    "rewritten_query": edit.get("rewritten_query") or state.user_question,
+                    "intent": previous.rewrite.intent,
+                    "entities": {**previous.rewrite.entities, **(edit.get("entities") or {})},
+                    "followup_of": previous.user_question,
+                }
+            else:
+                rew = rewrite if rewrite is not None else rewrite_query(state.user_question)
+            _checkpoint(checkpoint_key, user_question, "rewrite", rew)
+        state.rewrite = Rewrite(
+            rewritten_query=rew.get("rewritten_query", state.user_question),
+            intent=rew.get("intent", "UNKNOWN"),
+            entities=rew.get("entities", {}) or {},
+        )
+        _emit(on_stage, "rewrite", {
+            "rewritten_query": state.rewrite.rewritten_query,
+            "intent": state.rewrite.intent,
+            "entities": state.rewrite.entities,
+        })
 
         # -----------------------------
         # STEP 4: Schema RAG
         # -----------------------------
-        vs = build_schema_index()
-        docs = vs.similarity_search(state.rewritten_query, k=top_k_schema)
+        if "schema_rag" in done:
+            state.retrieval = Retrieval(**done["schema_rag"])
+        elif edit is not None:
+            # same topic: reuse the previous turn's schema context
+            state.retrieval = Retrieval(previous.retrieval.schema_context, list(previous.retrieval.retrieved_tables))
+        else:
+            if schema_docs is not None:
+                docs = schema_docs
+            else:
+                # cached per process; rebuilt only when the DB schema version changes
+                with span("schema_rag", {"query": state.rewrite.rewritten_query, "k": top_k_schema}) as rec:
+                    vs = get_schema_vectorstore()
+                    docs = vs.similarity_search(state.rewrite.rewritten_query, k=top_k_schema)
+                    rec["output"] = len(docs)
 
-        state.schema_context = "\n\n".join(d.page_content for d in docs)
 
-        tables: List[str] = []
-        for d in docs:
-            t = None
-            if getattr(d, "metadata", None):
-                t = d.metadata.get("table")
-            if not t:
-                first_line = (d.page_content or "").splitlines()[:1]
-                if first_line and first_line[0].lower().startswith("table:"):
-                    t = first_line[0].split(":", 1)[1].strip()
-            if t:
-                tables.append(t)
+            tables: List[str] = []
+            for d in docs:
+                t = None
+                if getattr(d, "metadata", None):
+                    t = d.metadata.get("table")
+                if not t:
+                    first_line = (d.page_content or "").splitlines()[:1]
+                    if first_line and first_line[0].lower().startswith("table:"):
+                        t = first_line[0].split(":", 1)[1].strip()
+                if t:
+                    tables.append(t)
 
-        state.retrieved_tables = list(dict.fromkeys(tables))
+            state.retrieval = Retrieval(
+                schema_context="\n\n".join(d.page_content for d in docs),
+                retrieved_tables=list(dict.fromkeys(tables)),
+            )
+        if "schema_rag" not in done:
+            _checkpoint(checkpoint_key, user_question, "schema_rag", asdict(state.retrieval))
+        _emit(on_stage, "schema_rag", {"retrieved_tables": state.retrieval.retrieved_tables, "reused": edit is not None})
 
         # -----------------------------
         # STEP 6: SQL Generator
         # -----------------------------
-        cand = generate_sql(
-            rewritten_query=state.rewritten_query,
-            schema_context=state.schema_context,
-            intent=state.intent,
-            entities=state.entities,
-            user_question=state.user_question,
+        if "sql_generation" in done:
+            cand = done["sql_generation"]
+        elif edit is not None:
+            cand = edit
+        else:
+            cand = generate_sql(
+                rewritten_query=state.rewrite.rewritten_query,
+                schema_context=state.retrieval.schema_context,
+                intent=state.rewrite.intent,
+                entities=state.rewrite.entities,
+                user_question=state.user_question,
+            )
+        state.generation = Generation(
+            sql=_safe_get_sql(cand),
+            confidence=cand.get("confidence") if isinstance(cand, dict) else None,
         )
-        state.candidate_sql = cand
 
-        candidate_sql_str = _safe_get_sql(cand)
+        candidate_sql_str = state.generation.sql
+        if candidate_sql_str.strip() and "sql_generation" not in done:
+            _checkpoint(
+                checkpoint_key, user_question, "sql_generation", cand if isinstance(cand, dict) else {"sql": cand}
+            )
+        _emit(on_stage, "sql_generation", {"sql": candidate_sql_str, "confidence": state.generation.confidence})
         if not candidate_sql_str.strip():
             return {
                 "ok": False,
                 "stage": "sql_generation",
                 "message": "SQL generator returned empty SQL.",
-                "intent": state.intent,
-                "entities": state.entities,
-                "rewritten_query": state.rewritten_query,
-                "retrieved_tables": state.retrieved_tables,
-                "candidate_sql": cand,
-                "debug": {"rewriter": rew},
+                "intent": state.rewrite.intent,
+                "entities": state.rewrite.entities,
+                "rewritten_query": state.rewrite.rewritten_query,
+                "retrieved_tables": state.retrieval.retrieved_tables,
+                "candidate_sql": candidate_sql_str,
+                "debug": {"rewriter": rew, "generator": cand} if debug else None,
             }
 
         # -----------------------------
         # STEP 7: SQL Validator + Auto-fix
         # -----------------------------
-        val = validate_and_autofix_sql(
-            rewritten_query=state.rewritten_query,
-            schema_context=state.schema_context,
-            candidate_sql=candidate_sql_str,
-            max_retries=1,
+        if "sql_validation" in done:
+            val = done["sql_validation"]
+        else:
+            val = validate_and_autofix_sql(
+                rewritten_query=state.rewrite.rewritten_query,
+                schema_context=state.retrieval.schema_context,
+                candidate_sql=candidate_sql_str,
+                max_retries=1,
+            )
+            if val.get("ok"):
+                # a failed validation is retried, not resumed
+                _checkpoint(checkpoint_key, user_question, "sql_validation", val)
+
+        state.validation = Validation(
+            ok=bool(val.get("ok")),
+            final_sql=val.get("final_sql", candidate_sql_str),
+            fixed_by_llm=bool(val.get("fixed_by_llm")),
         )
+        _emit(on_stage, "sql_validation", {
+            "ok": state.validation.ok,
+            "final_sql": state.validation.final_sql,
+            "fixed_by_llm": state.validation.fixed_by_llm,
+        })
 
-        state.validation_ok = bool(val.get("ok"))
-        state.final_sql = val.get("final_sql", candidate_sql_str)
-        state.fixed_by_llm = bool(val.get("fixed_by_llm"))
+        if not state.validation.ok and edit is not None:
+            logger.info("Edited follow-up SQL failed validation; running the full pipeline")
+            return run_text2sql(
+                user_question=user_question,
+                top_k_schema=top_k_schema,
+                return_rows=return_rows,
+                enable_viz=enable_viz,
+                on_stage=on_stage,
+                explain=explain,
+                role=role,
+                debug=debug,
+                checkpoint_key=checkpoint_key,
+                resume_from="rewrite" if checkpoint_key else None,  # don't resume the failed edit
+            )
 
-        if not state.validation_ok:
+        if not state.validation.ok:
             return {
                 "ok": False,
                 "stage": "sql_validation",
                 "message": "SQL validation failed.",
-                "intent": state.intent,
-                "entities": state.entities,
-                "rewritten_query": state.rewritten_query,
-                "retrieved_tables": state.retrieved_tables,
-                "candidate_sql": cand,
-                "final_sql": state.final_sql,
-                "fixed_by_llm": state.fixed_by_llm,
-                "debug": {"rewriter": rew, "validator": val},
+                "intent": state.rewrite.intent,
+                "entities": state.rewrite.entities,
+                "rewritten_query": state.rewrite.rewritten_query,
+                "retrieved_tables": state.retrieval.retrieved_tables,
+                "candidate_sql": candidate_sql_str,
+                "final_sql": state.validation.final_sql,
+                "fixed_by_llm": state.validation.fixed_by_llm,
+                "debug": {"rewriter": rew, "generator": cand, "validator": val} if debug else None,
             }
 
         # -----------------------------
         # STEP 8: SQL Execution
         # -----------------------------
-        exec_out = execute_sql(state.final_sql, limit_preview=return_rows)
-        state.dataframe = exec_out
-        state.result_df = exec_out.get("df")
+        exec_out = execute_sql(state.validation.final_sql, limit_preview=return_rows, role=role, question=user_question)
+        state.execution = Execution(
+            table=exec_out["table"],
+            preview_markdown=exec_out.get("preview_markdown", ""),
+            cache=exec_out.get("cache", "off"),
+            seconds=exec_out.get("seconds", 0.0),
+            slow_query_id=exec_out.get("slow_query_id"),
+        )
+        result = state.execution.table
+        _emit(on_stage, "sql_execution", {
+            "row_count": state.execution.row_count,
+            "columns": state.execution.columns,
+            "preview_markdown": state.execution.preview_markdown,
+            # JSON rows so clients can show an interactive table before the explanation
+            "rows": _preview_rows(result, return_rows) if on_stage is not None else None,
+        })
 
         # -----------------------------
         # STEP 9: Explanation
         # -----------------------------
-        explanation = explain_answer(
-            user_question=state.user_question,
-            sql=state.final_sql,
-            df=state.result_df,
-        )
-        state.explanation = explanation
+        explain_id: Optional[str] = None
+        explain_cached: Optional[bool] = None
+        if explain in ("deferred", "inline"):
+            # profile now (vectorized, cheap); the LLM call is what deferred mode postpones
+            prepared = prepare_explanation(
+                user_question=state.user_question,
+                sql=state.validation.final_sql,
+                df=result,
+            )
+            explain_id = get_explanation_store().put(prepared)
+            if explain == "inline":
+                state.explanation, explain_cached = explain_by_id(explain_id)
+                _emit(on_stage, "explanation", {"explanation": state.explanation})
 
         # -----------------------------
         # STEP 10: Final Response
         # -----------------------------
+        dbg: Dict[str, Any] = {
+            "followup": edit is not None or "followup_of" in rew,
+            "explainer": {"mode": explain, "cached": explain_cached},
+            "executor": {
+                "cache": state.execution.cache,
+                "seconds": state.execution.seconds,
+                # plan: GET /api/slow-queries/{slow_query_id}
+                "slow_query_id": state.execution.slow_query_id,
+            },
+        }
+        if checkpoint_key:
+            dbg["checkpoint"] = {"key": checkpoint_key, "resumed": list(done)}
+        if debug:
+            dbg.update({"rewriter": rew, "generator": cand, "validator": val})
+
         return {
             "ok": True,
-            "intent": state.intent,
-            "entities": state.entities,
-            "rewritten_query": state.rewritten_query,
-            "retrieved_tables": state.retrieved_tables,
-            "candidate_sql": state.candidate_sql,
-            "final_sql": state.final_sql,
-            "fixed_by_llm": state.fixed_by_llm,
-
-            # Execution outputs
-            "dataframe": state.dataframe,
-            "result_df": state.result_df,
-            "preview_markdown": (state.dataframe or {}).get("preview_markdown"),
-
-            # Explanation
+            "intent": state.rewrite.intent,
+            "entities": state.rewrite.entities,
+            "rewritten_query": state.rewrite.rewritten_query,
+            "retrieved_tables": state.retrieval.retrieved_tables,
+            "final_sql": state.validation.final_sql,
+            "fixed_by_llm": state.validation.fixed_by_llm,
+
+            # Execution outputs: the Arrow table, shared with state.execution (not copied)
+            "result": result,
+            "row_count": state.execution.row_count,
+            "columns": state.execution.columns,
+            "preview_markdown": state.execution.preview_markdown,
+
+            # Explanation (None unless explain="inline"; GET /api/explain/{explain_id} otherwise)
             "explanation": state.explanation,
+            "explain_id": explain_id,
 
-            # Visualization placeholder
-            "chart_path": None,
+            # Conversation state (app.state.sessions keeps it for follow-ups)
+            "state": state,
 
-            # Debug
-            "debug": {
-                "rewriter": rew,
-                "validator": val,
-            },
-        }
\ No newline at end of file
+            # Debug (full stage outputs only with debug=True)
+            "debug": dbg,
+        }
@@ -0,0 +1,532 @@
+# app/ingest/stream_ingest.py
+"""
+Streaming micro-batch ingestion for the ops event feeds.
+
+Sources (any combination):
+  - drop directory, tailed:  <drop_dir>/<table>/*.jsonl | *.csv   (files may keep growing)
+  - local socket:            one JSON object per line with a "table" field
+
+Every batch (up to --batch-rows or --batch-ms, whichever first):
+  1) validate + coerce records (bad ones go to a dead-letter JSONL)
+  2) append per table via Arrow, INSERT BY NAME
+  3) refresh ONLY the gold hours/days touched by the batch
+  4) commit, then persist file offsets (at-least-once)
+
+Memory is bounded by batch_rows (files are read incrementally, the socket
+queue has a max size so senders block instead of piling up).
+
+Metrics (printed + written to --metrics-path as JSON):
+  throughput, batch latency, arrival->gold lag and event-time freshness lag.
+
+  python -m app.ingest.stream_ingest --drop-dir data/drop
+  python -m app.ingest.stream_ingest --socket-port 9009 --publish-every 60
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import importlib
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+
+from app.db.clustering import existing_tables
+from app.db.duckdb_client import get_conn
+
+logger = logging.getLogger(__name__)
+
+# column -> type ("str" | "ts" | "int" | "float"); required columns per table
+TABLE_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "checkin_events": {
+        "airport": "str", "ts": "ts", "pax_count": "int", "avg_wait_min": "float", "counters_open": "int",
+    },
+    "presecurity_events": {
+        "airport": "str", "ts": "ts", "pax_count": "int", "avg_wait_min": "float",
+        "lanes_open": "int", "queue_len": "int",
+    },
+    "boarding_events": {
+        "airport": "str", "ts": "ts", "flight_id": "str", "boarding_delay_min": "float", "reason_code": "str",
+    },
+    "disruption_events": {
+        "airport": "str", "ts": "ts", "disruption_type": "str", "severity": "str",
+        "impacted_area": "str", "notes": "str",
+    },
+}
+REQUIRED: Dict[str, List[str]] = {
+    "checkin_events": ["airport", "ts", "avg_wait_min"],
+    "presecurity_events": ["airport", "ts", "avg_wait_min"],
+    "boarding_events": ["airport", "ts", "boarding_delay_min"],
+    "disruption_events": ["airport", "ts", "disruption_type"],
+}
+NON_NEGATIVE = {"pax_count", "avg_wait_min", "counters_open", "lanes_open", "queue_len", "boarding_delay_min"}
+
+# tables whose rows feed gold_airport_kpi_hourly / gold_delay_reason_daily
+KPI_SOURCES = {"checkin_events", "presecurity_events", "boarding_events"}
+
+_ARROW_TYPES = {"str": pa.string(), "ts": pa.timestamp("us"), "int": pa.int64(), "float": pa.float64()}
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+class RecordError(ValueError):
+    pass
+
+
+def _parse_ts(v: Any) -> datetime:
+    if isinstance(v, (int, float)):
+        return datetime.fromtimestamp(v, tz=timezone.utc).replace(tzinfo=None)
+    dt = datetime.fromisoformat(str(v).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def validate_record(table: str, rec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a coerced copy of rec (only known columns) or raises RecordError.
+    """
+    schema = TABLE_SCHEMAS.get(table)
+    if schema is None:
+        raise RecordError(f"unknown table: {table}")
+
+    out: Dict[str, Any] = {}
+    for col, kind in schema.items():
+        v = rec.get(col)
+        if v is None or v == "":
+            out[col] = None
+            continue
+        try:
+            if kind == "ts":
+                out[col] = _parse_ts(v)
+            elif kind == "int":
+                out[col] = int(float(v))
+            elif kind == "float":
+                out[col] = float(v)
+            else:
+                out[col] = str(v).strip()
+        except (TypeError, ValueError) as e:
+            raise RecordError(f"{col}: cannot parse {v!r} as {kind} ({e})")
+        if col in NON_NEGATIVE and out[col] < 0:
+            raise RecordError(f"{col}: negative value {out[col]}")
+
+    missing = [c for c in REQUIRED[table] if out.get(c) is None]
+    if missing:
+        raise RecordError(f"missing required columns: {missing}")
+
+    ap = out["airport"].upper()
+    if not (2 <= len(ap) <= 5 and ap.isalnum()):
+        raise RecordError(f"airport: invalid code {out['airport']!r}")
+    out["airport"] = ap
+    return out
+
+
+# -----------------------------
+# Sources
+# -----------------------------
+class DropDirSource:
+    """
+    Tails <drop_dir>/<table>/*.jsonl|*.csv. Only complete lines are consumed; byte
+    offsets are persisted in <drop_dir>/.offsets.json after each committed batch.
+    """
+
+    def __init__(self, drop_dir: str):
+        self.drop_dir = drop_dir
+        self.offsets_path = os.path.join(drop_dir, ".offsets.json")
+        self.offsets: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._headers: Dict[str, List[str]] = {}
+        if os.path.exists(self.offsets_path):
+            with open(self.offsets_path) as f:
+                self.offsets = json.load(f)
+        for table in TABLE_SCHEMAS:
+            os.makedirs(os.path.join(drop_dir, table), exist_ok=True)
+
+    def _files(self) -> List[Tuple[str, str]]:
+        out = []
+        for table in TABLE_SCHEMAS:
+            d = os.path.join(self.drop_dir, table)
+            for name in sorted(os.listdir(d)):
+                if name.endswith((".jsonl", ".csv")):
+                    out.append((table, os.path.join(d, name)))
+        return out
+
+    def _csv_header(self, path: str) -> List[str]:
+        if path not in self._headers:
+            with open(path, newline="") as f:
+                self._headers[path] = next(csv.reader([f.readline()]))
+        return self._headers[path]
+
+    def poll(self, max_rows: int) -> List[Tuple[str, Any]]:
+        """
+        Returns up to max_rows (table, raw record) pairs. A raw record is a dict,
+        or a RecordError-worthy string (bytes if not UTF-8) when the line couldn't be parsed.
+        """
+        got: List[Tuple[str, Any]] = []
+        for table, path in self._files():
+            if len(got) >= max_rows:
+                break
+            offset = self._pending.get(path, self.offsets.get(path, 0))
+            if os.path.getsize(path) <= offset:
+                continue
+
+            is_csv = path.endswith(".csv")
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while len(got) < max_rows:
+                    line = f.readline()
+                    if not line or not line.endswith(b"\n"):
+                        break  # partial line still being written
+                    offset += len(line)
+                    try:
+                        text = line.decode("utf-8").strip()
+                    except UnicodeDecodeError:
+                        got.append((table, line.rstrip(b"\r\n")))  # dead-lettered, the loop goes on
+                        continue
+                    if not text:
+                        continue
+                    if is_csv:
+                        if offset == len(line):
+                            continue  # header row
+                        row = next(csv.reader([text]))
+                        got.append((table, dict(zip(self._csv_header(path), row))))
+                    else:
+                        try:
+                            got.append((table, json.loads(text)))
+                        except json.JSONDecodeError:
+                            got.append((table, text))
+            self._pending[path] = offset
+        return got
+
+    def commit(self) -> None:
+        self.offsets.update(self._pending)
+        self._pending.clear()
+        tmp = self.offsets_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.offsets, f)
+        os.replace(tmp, self.offsets_path)
+
+
+class SocketSource:
+    """
+    Local TCP line server: each line is JSON with a "table" field.
+    The queue is bounded, so a fast sender blocks instead of growing memory.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9009, max_queue: int = 50_000):
+        self.q: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max_queue)
+        q = self.q
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        text = line.decode("utf-8").strip()
+                    except UnicodeDecodeError:
+                        q.put(("", line.rstrip(b"\r\n")))
+                        continue
+                    if not text:
+                        continue
+                    try:
+                        rec = json.loads(text)
+                        q.put((rec.pop("table", ""), rec))
+                    except (json.JSONDecodeError, AttributeError):
+                        q.put(("", text))
+
+        self.server = socketserver.ThreadingTCPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logger.info("Socket ingestion listening on %s:%s", host, port)
+
+    def poll(self, max_rows: int) -> List[Tuple[str, Any]]:
+        got = []
+        while len(got) < max_rows:
+            try:
+                got.append(self.q.get_nowait())
+            except queue.Empty:
+                break
+        return got
+
+    def commit(self) -> None:
+        pass  # socket records are acked by being committed to DuckDB
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+@dataclass
+class IngestMetrics:
+    started_at: float = field(default_factory=time.time)
+    batches: int = 0
+    rows_ingested: int = 0
+    rows_rejected: int = 0
+    rows_by_table: Dict[str, int] = field(default_factory=dict)
+    last_batch_rows: int = 0
+    last_batch_ms: float = 0.0
+    # first record read -> gold refreshed + committed
+    last_arrival_lag_ms: float = 0.0
+    max_arrival_lag_ms: float = 0.0
+    # newest event ts in batch -> visible in gold (end-to-end freshness)
+    last_freshness_lag_sec: Optional[float] = None
+    throughput_rows_per_sec: float = 0.0
+
+    def record_batch(self, rows: int, rejected: int, by_table: Dict[str, int], batch_ms: float,
+                     arrival_lag_ms: float, freshness_lag_sec: Optional[float]) -> None:
+        self.batches += 1
+        self.rows_ingested += rows
+        self.rows_rejected += rejected
+        for t, n in by_table.items():
+            self.rows_by_table[t] = self.rows_by_table.get(t, 0) + n
+        self.last_batch_rows = rows
+        self.last_batch_ms = round(batch_ms, 2)
+        self.last_arrival_lag_ms = round(arrival_lag_ms, 2)
+        self.max_arrival_lag_ms = max(self.max_arrival_lag_ms, self.last_arrival_lag_ms)
+        self.last_freshness_lag_sec = None if freshness_lag_sec is None else round(freshness_lag_sec, 3)
+        self.throughput_rows_per_sec = round(self.rows_ingested / max(time.time() - self.started_at, 1e-9), 1)
+
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(tmp, path)
+
+
+# -----------------------------
+# Micro-batch writer
+# -----------------------------
+class MicroBatchIngestor:
+    def __init__(self, conn: duckdb.DuckDBPyConnection, dead_letter_path: Optional[str] = None):
+        self.conn = conn
+        self.dead_letter_path = dead_letter_path
+        self.metrics = IngestMetrics()
+        self._gold = importlib.import_module("app.pipelines.02_build_gold_tables")
+        self._ensure_tables()
+
+    def _ensure_tables(self) -> None:
+        from app.fakedb.build_fake_db import create_tables
+
+        create_tables(self.conn)
+        # only insert columns the target tables actually have (silver vs fake schemas differ)
+        self._columns = {
+            t: {r[0] for r in self.conn.execute(f"DESCRIBE {t}").fetchall()} for t in TABLE_SCHEMAS
+        }
+
+    def _dead_letter(self, bad: List[Dict[str, Any]]) -> None:
+        if not bad or not self.dead_letter_path:
+            return
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with open(self.dead_letter_path, "a") as f:
+            for b in bad:
+                f.write(json.dumps(b, default=str) + "\n")
+
+    def ingest(self, records: List[Tuple[str, Any]], read_started: float) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+
+        good: Dict[str, List[Dict[str, Any]]] = {}
+        bad: List[Dict[str, Any]] = []
+        for table, rec in records:
+            try:
+                if isinstance(rec, bytes):
+                    raise RecordError("not valid UTF-8")
+                if not isinstance(rec, dict):
+                    raise RecordError("not a JSON object")
+                good.setdefault(table, []).append(validate_record(table, rec))
+            except RecordError as e:
+                bad.append({"table": table, "record": rec, "error": str(e)})
+
+        hours = set()
+        days = set()
+        max_ts: Optional[datetime] = None
+        for table, rows in good.items():
+            for r in rows:
+                max_ts = r["ts"] if max_ts is None or r["ts"] > max_ts else max_ts
+                if table in KPI_SOURCES:
+                    hours.add((r["airport"], r["ts"].replace(minute=0, second=0, microsecond=0)))
+                if table == "boarding_events":
+                    days.add((r["airport"], r["ts"].date()))
+
+        conn = self.conn
+        conn.execute("BEGIN TRANSACTION;")
+        try:
+            for table, rows in good.items():
+                cols = [c for c in TABLE_SCHEMAS[table] if c in self._columns[table]]
+                schema = pa.schema([(c, _ARROW_TYPES[TABLE_SCHEMAS[table][c]]) for c in cols])
+                tbl = pa.Table.from_pylist(rows, schema=schema)
+                conn.register("ingest_batch", tbl)
+                conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM ingest_batch;")
+                conn.unregister("ingest_batch")
+            self._refresh_gold(hours, days)
+            conn.execute("COMMIT;")
+        except Exception:
+            conn.execute("ROLLBACK;")
+            raise
+
+        self._dead_letter(bad)
+
+        by_table = {t: len(rows) for t, rows in good.items()}
+        n_good = sum(by_table.values())
+        now = time.time()
+        freshness = (datetime.now(timezone.utc).replace(tzinfo=None) - max_ts).total_seconds() if max_ts else None
+        self.metrics.record_batch(
+            rows=n_good,
+            rejected=len(bad),
+            by_table=by_table,
+            batch_ms=(time.perf_counter() - t0) * 1000,
+            arrival_lag_ms=(now - read_started) * 1000,
+            freshness_lag_sec=freshness,
+        )
+        return {"rows": n_good, "rejected": len(bad), "hours": len(hours), "days": len(days)}
+
+    def _refresh_gold(self, hours: set, days: set) -> None:
+        present = set(existing_tables(self.conn))
+        conn = self.conn
+
+        if hours:
+            conn.register("affected_hours_arrow", pa.table({
+                "airport": [h[0] for h in hours],
+                "hour": pa.array([h[1] for h in hours], type=pa.timestamp("us")),
+            }))
+            conn.execute("CREATE OR REPLACE TEMP TABLE _affected_hours AS SELECT * FROM affected_hours_arrow;")
+            conn.unregister("affected_hours_arrow")
+            if "gold_airport_kpi_hourly" in present:
+                self._gold.refresh_kpi_hourly(conn)
+            if "gold_anomaly_scores" in present:
+                self._gold.refresh_anomaly_scores(conn)
+            if "gold_kpi_rollup" in present:
+                self._gold.refresh_kpi_rollup(conn)
+
+        if days:
+            conn.register("affected_days_arrow", pa.table({
+                "airport": [d[0] for d in days],
+                "day": pa.array([d[1] for d in days], type=pa.date32()),
+            }))
+            conn.execute("CREATE OR REPLACE TEMP TABLE _affected_days AS SELECT * FROM affected_days_arrow;")
+            conn.unregister("affected_days_arrow")
+            if "gold_delay_reason_daily" in present:
+                self._gold.refresh_delay_reason_daily(conn)
+
+
+# -----------------------------
+# Service loop
+# -----------------------------
+def run(
+    sources: List[Any],
+    conn: duckdb.DuckDBPyConnection,
+    db_path: str,
+    batch_rows: int = 5000,
+    batch_ms: int = 1000,
+    poll_interval_ms: int = 100,
+    metrics_path: Optional[str] = None,
+    dead_letter_path: Optional[str] = None,
+    publish_every_sec: float = 0,
+    once: bool = False,
+) -> IngestMetrics:
+    """
+    Main loop. once=True drains what is currently available and returns.
+    publish_every_sec > 0 periodically publishes the ingest DB as a blue/green snapshot.
+    """
+    ingestor = MicroBatchIngestor(conn, dead_letter_path=dead_letter_path)
+    last_publish = time.time()
+
+    while True:
+        records: List[Tuple[str, Any]] = []
+        read_started = time.time()
+        deadline = time.perf_counter() + batch_ms / 1000
+        while len(records) < batch_rows:
+            for src in sources:
+                records.extend(src.poll(batch_rows - len(records)))
+            if len(records) >= batch_rows or time.perf_counter() >= deadline or (once and not records):
+                break
+            if not records:
+                read_started = time.time()
+            time.sleep(poll_interval_ms / 1000)
+
+        if records:
+            out = ingestor.ingest(records, read_started)
+            for src in sources:
+                src.commit()
+            m = ingestor.metrics
+            print(
+                f"batch {m.batches}: {out['rows']} rows (+{out['rejected']} rejected), "
+                f"{out['hours']} gold hours refreshed, {m.last_batch_ms:.0f} ms, "
+                f"lag {m.last_arrival_lag_ms:.0f} ms, {m.throughput_rows_per_sec:,.0f} rows/s"
+            )
+            if metrics_path:
+                m.write(metrics_path)
+        elif once:
+            break
+
+        if publish_every_sec and time.time() - last_publish >= publish_every_sec:
+            _publish(conn, db_path)
+            last_publish = time.time()
+
+    return ingestor.metrics
+
+
+def _publish(conn: duckdb.DuckDBPyConnection, db_path: str) -> None:
+    from app.db.snapshots import writable_snapshot
+
+    # no other writer on db_path: after a checkpoint the file is consistent to copy
+    conn.execute("CHECKPOINT;")
+    with writable_snapshot(base_path=db_path):
+        pass
+    print("✅ Published ingest snapshot from", db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batch ingestion of ops event feeds")
+    parser.add_argument("--db-path", default=os.getenv("DUCKDB_PATH", os.path.join("data", "amadeus_ops.duckdb")))
+    parser.add_argument("--drop-dir", default=None, help="tail <dir>/<table>/*.jsonl|*.csv")
+    parser.add_argument("--socket-port", type=int, default=0, help="also accept JSON lines on 127.0.0.1:<port>")
+    parser.add_argument("--batch-rows", type=int, default=5000)
+    parser.add_argument("--batch-ms", type=int, default=1000)
+    parser.add_argument("--metrics-path", default=os.path.join("data", "ingest_metrics.json"))
+    parser.add_argument("--dead-letter", default=os.path.join("data", "ingest_rejected.jsonl"))
+    parser.add_argument("--publish-every", type=float, default=0, help="seconds between snapshot publishes")
+    parser.add_argument("--once", action="store_true", help="drain available input and exit")
+    args = parser.parse_args()
+
+    sources: List[Any] = []
+    if args.drop_dir:
+        sources.append(DropDirSource(args.drop_dir))
+    if args.socket_port:
+        sources.append(SocketSource(port=args.socket_port))
+    if not sources:
+        parser.error("provide --drop-dir and/or --socket-port")
+
+    conn = get_conn(args.db_path)
+    try:
+        m = run(
+            sources,
+            conn,
+            args.db_path,
+            batch_rows=args.batch_rows,
+            batch_ms=args.batch_ms,
+            metrics_path=args.metrics_path,
+            dead_letter_path=args.dead_letter,
+            publish_every_sec=args.publish_every,
+            once=args.once,
+        )
+        print(f"✅ {m.rows_ingested:,} rows ingested, {m.rows_rejected:,} rejected, {m.batches} batches")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,40 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
+from typing import Optional
+
 from dotenv import load_dotenv
 
 from app.graph.text2sql_graph import run_text2sql
 
 
-def run_cli(question: str) -> None:
-    out = run_text2sql(question)
+def run_cli(question: str, profile: Optional[str] = None) -> None:
+    if profile:
+        from app.audit.profiling import format_summary, profile_call
+
+        out, summary = profile_call(run_text2sql, question, mode=profile)
+    else:
+        out = run_text2sql(question)
     print("\n=== FINAL SQL ===")
     print(out.get("final_sql"))
     print("\n=== PREVIEW ===")
     print(out.get("preview_markdown"))
     print("\n=== EXPLANATION ===")
     print(json.dumps(out.get("explanation"), indent=2, default=str))
+    if profile:
+        print("\n=== PROFILE ===")
+        print(format_summary(summary))
 
 
 def build_api():
     from fastapi import FastAPI
+    from fastapi.middleware.gzip import GZipMiddleware
     from app.api.routes import router
+    from app.api.warmup import lifespan
 
-    api = FastAPI(title="GARV Text2SQL API", version="0.1")
+    # lifespan warms embeddings / schema index / DuckDB before /api/ready reports ready
+    api = FastAPI(title="GARV Text2SQL API", version="0.1", lifespan=lifespan)
 
     # simple root so hitting http://127.0.0.1:8000 doesn't show Not Found
     @api.get("/")
@@ -30,23 +44,28 @@ def build_api():
             "message": "GARV Text2SQL API is running",
             "endpoints": {
                 "health": "/api/health",
+                "ready": "/api/ready",
                 "text2sql": "/api/text2sql",
+                "jobs": "/api/jobs",
                 "docs": "/docs",
                 "openapi": "/openapi.json",
             },
         }
 
+    # JSON / NDJSON bodies compressed for clients sending Accept-Encoding: gzip
+    # (arrow / parquet results carry their own lz4 / zstd codecs)
+    api.add_middleware(GZipMiddleware, minimum_size=1024)
+
     api.include_router(router, prefix="/api")
     return api
 
 
-def run_api(host: str = "127.0.0.1", port: int = 8000) -> None:
-    import uvicorn
-
-    api = build_api()
+def run_api(host: str = "127.0.0.1", port: int = 8000, workers: int = 1) -> None:
+    from app.api.server import serve
 
     # IMPORTANT: do not enable reload here unless you run uvicorn with import string
-    uvicorn.run(api, host=host, port=port, log_level="info")
+    # workers > 1: read-only models are loaded once, then workers are forked (see app/api/server.py)
+    serve(host=host, port=port, workers=workers, log_level="info")
 
 
 def main():
@@ -57,21 +76,29 @@ def main():
     parser.add_argument("--api", action="store_true", help="Run FastAPI server")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")))
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="sample",
+        choices=["sample", "cprofile"],
+        help="Profile the question's pipeline run (collapsed stacks or a pstats file under data/profiles/)",
+    )
 
     args = parser.parse_args()
 
     if args.api:
-        run_api(host=args.host, port=args.port)
+        run_api(host=args.host, port=args.port, workers=args.workers)
         return
 
     if not args.question:
         print("Provide a question or run with --api")
         print("Example:")
         print('  python -m app.main "Top 5 airports by avg security wait time last 7 days"')
-        print("  python -m app.main --api --host 127.0.0.1 --port 8000")
+        print("  python -m app.main --api --host 127.0.0.1 --port 8000 --workers 4")
         return
 
-    run_cli(args.question)
+    run_cli(args.question, profile=args.profile)
 
 
 if __name__ == "__main__":
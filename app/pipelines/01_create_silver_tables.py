@@ -1,20 +1,19 @@
 # app/pipelines/01_create_silver_tables.py
 from __future__ import annotations
 
-import os
 from datetime import datetime, timedelta
-import random
 
 import duckdb
+import numpy as np
+import pyarrow as pa
 
-DB_PATH = os.getenv("DUCKDB_PATH", "data/garv.duckdb")
+from app.db.clustering import cluster_tables
+from app.db.duckdb_client import standalone_write_path
 
 AIRPORTS = ["DOH", "DXB", "LHR", "CDG", "FRA"]
+SILVER_TABLES = ["checkin_events", "presecurity_events", "boarding_events"]
 REASONS = ["GATE_CHANGE", "LATE_ARRIVAL", "CREW", "TECH", "SECURITY", "WEATHER"]
 
-def _ensure_dir(path: str) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-
 def create_silver_tables(conn: duckdb.DuckDBPyConnection) -> None:
     conn.execute("""
     CREATE TABLE IF NOT EXISTS checkin_events (
@@ -44,53 +43,66 @@ def create_silver_tables(conn: duckdb.DuckDBPyConnection) -> None:
     );
     """)
 
-def seed_dummy_data(conn: duckdb.DuckDBPyConnection, days: int = 14, rows_per_hour: int = 3) -> None:
+def seed_dummy_data(
+    conn: duckdb.DuckDBPyConnection,
+    days: int = 14,
+    rows_per_hour: int = 3,
+    seed: int | None = None,
+) -> None:
     # Clear old demo data (safe for PoC)
     conn.execute("DELETE FROM checkin_events;")
     conn.execute("DELETE FROM presecurity_events;")
     conn.execute("DELETE FROM boarding_events;")
 
     now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-    start = now - timedelta(days=days)
-
-    checkin_rows = []
-    sec_rows = []
-    boarding_rows = []
-
-    ts = start
-    while ts <= now:
-        for ap in AIRPORTS:
-            # multiple rows per hour to simulate raw events
-            for _ in range(rows_per_hour):
-                checkin_wait = max(0, random.gauss(12, 4))
-                pax = max(10, int(random.gauss(220, 60)))
-
-                sec_wait = max(0, random.gauss(18, 6))
-                lanes = max(1, random.gauss(6, 1.5))
-                qlen = max(0, random.gauss(120, 50))
-
-                delay = max(0, random.gauss(7, 6))
-                reason = random.choice(REASONS)
-
-                checkin_rows.append((ts, ap, float(checkin_wait), int(pax)))
-                sec_rows.append((ts, ap, float(sec_wait), float(lanes), float(qlen)))
-                boarding_rows.append((ts, ap, float(delay), reason))
-
-        ts += timedelta(hours=1)
-
-    conn.executemany("INSERT INTO checkin_events VALUES (?, ?, ?, ?);", checkin_rows)
-    conn.executemany("INSERT INTO presecurity_events VALUES (?, ?, ?, ?, ?);", sec_rows)
-    conn.executemany("INSERT INTO boarding_events VALUES (?, ?, ?, ?);", boarding_rows)
-
-def main():
-    _ensure_dir(DB_PATH)
-    conn = duckdb.connect(DB_PATH)
-
+    start = np.datetime64(now - timedelta(days=days), "us")
+
+    # hourly grid x airports x rows_per_hour, drawn as whole arrays (ordered by ts, airport)
+    n_hours = days * 24 + 1
+    per_hour = len(AIRPORTS) * rows_per_hour
+    n = n_hours * per_hour
+
+    rng = np.random.default_rng(seed)
+    ts = np.repeat(start + np.arange(n_hours).astype("timedelta64[h]"), per_hour)
+    airport = np.tile(np.repeat(np.array(AIRPORTS, dtype=object), rows_per_hour), n_hours)
+
+    checkin_wait = np.maximum(0, rng.normal(12, 4, n))
+    pax = np.maximum(10, rng.normal(220, 60, n).astype(np.int64))
+
+    sec_wait = np.maximum(0, rng.normal(18, 6, n))
+    lanes = np.maximum(1, rng.normal(6, 1.5, n))
+    qlen = np.maximum(0, rng.normal(120, 50, n))
+
+    delay = np.maximum(0, rng.normal(7, 6, n))
+    reason = np.array(REASONS, dtype=object)[rng.integers(0, len(REASONS), n)]
+
+    _append_arrow(conn, "checkin_events", pa.table({
+        "ts": ts, "airport": airport, "avg_wait_min": checkin_wait, "pax_count": pax,
+    }))
+    _append_arrow(conn, "presecurity_events", pa.table({
+        "ts": ts, "airport": airport, "avg_wait_min": sec_wait, "lanes_open": lanes, "queue_len": qlen,
+    }))
+    _append_arrow(conn, "boarding_events", pa.table({
+        "ts": ts, "airport": airport, "boarding_delay_min": delay, "reason_code": reason,
+    }))
+
+def _append_arrow(conn: duckdb.DuckDBPyConnection, table: str, tbl: pa.Table) -> None:
+    # BY NAME: also works when build_fake_db created the tables (different column order)
+    conn.register("arrow_batch", tbl)
+    conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM arrow_batch;")
+    conn.unregister("arrow_batch")
+
+def build_silver(conn: duckdb.DuckDBPyConnection, days: int = 14, rows_per_hour: int = 3) -> None:
     create_silver_tables(conn)
-    seed_dummy_data(conn, days=14, rows_per_hour=3)
+    seed_dummy_data(conn, days=days, rows_per_hour=rows_per_hour)
+    cluster_tables(conn, SILVER_TABLES)
 
-    conn.close()
-    print("✅ Silver tables created + dummy data loaded into:", DB_PATH)
+def main():
+    with standalone_write_path() as db_path:
+        conn = duckdb.connect(db_path)
+        build_silver(conn, days=14, rows_per_hour=3)
+        conn.close()
+    print("✅ Silver tables created + dummy data loaded into:", db_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,42 +1,51 @@
 # app/pipelines/02_build_gold_tables.py
 from __future__ import annotations
 
+import argparse
 import os
 import duckdb
 
-DB_PATH = os.getenv("DUCKDB_PATH", "data/garv.duckdb")
+from app.db.clustering import export_parquet
+from app.db.duckdb_client import standalone_write_path
+from app.pipelines import anomaly_engine, rollup_cube
 
-def build_gold(conn: duckdb.DuckDBPyConnection) -> None:
+# Gold tables are written sorted by (airport, time) so zonemaps can prune
+# row groups for the usual airport + time-window filters.
+
+# -----------------------------
+# Gold SELECTs
+# `event_filter` restricts the source rows (e.g. a SEMI JOIN on affected keys)
+# so the same SQL serves full builds and incremental refreshes.
+# -----------------------------
+def kpi_hourly_select(event_filter: str = "") -> str:
     # 1) Hourly KPI
-    conn.execute("DROP TABLE IF EXISTS gold_airport_kpi_hourly;")
-    conn.execute("""
-    CREATE TABLE gold_airport_kpi_hourly AS
+    return f"""
     WITH
     c AS (
         SELECT
-            airport,
-            date_trunc('hour', ts) AS hour,
-            AVG(avg_wait_min) AS checkin_wait_min,
-            SUM(pax_count) AS pax_volume
-        FROM checkin_events
+            e.airport,
+            date_trunc('hour', e.ts) AS hour,
+            AVG(e.avg_wait_min) AS checkin_wait_min,
+            SUM(e.pax_count) AS pax_volume
+        FROM checkin_events e {event_filter}
         GROUP BY 1,2
     ),
     s AS (
         SELECT
-            airport,
-            date_trunc('hour', ts) AS hour,
-            AVG(avg_wait_min) AS security_wait_min,
-            AVG(lanes_open) AS avg_lanes_open,
-            AVG(queue_len) AS avg_queue_len
-        FROM presecurity_events
+            e.airport,
+            date_trunc('hour', e.ts) AS hour,
+            AVG(e.avg_wait_min) AS security_wait_min,
+            AVG(e.lanes_open) AS avg_lanes_open,
+            AVG(e.queue_len) AS avg_queue_len
+        FROM presecurity_events e {event_filter}
         GROUP BY 1,2
     ),
     b AS (
         SELECT
-            airport,
-            date_trunc('hour', ts) AS hour,
-            AVG(boarding_delay_min) AS boarding_delay_min
-        FROM boarding_events
+            e.airport,
+            date_trunc('hour', e.ts) AS hour,
+            AVG(e.boarding_delay_min) AS boarding_delay_min
+        FROM boarding_events e {event_filter}
         GROUP BY 1,2
     )
     SELECT
@@ -50,21 +59,21 @@ def build_gold(conn: duckdb.DuckDBPyConnection) -> None:
         b.boarding_delay_min
     FROM c
     LEFT JOIN s USING (airport, hour)
-    LEFT JOIN b USING (airport, hour);
-    """)
+    LEFT JOIN b USING (airport, hour)
+    ORDER BY c.airport, c.hour
+    """
 
+def delay_reason_daily_select(event_filter: str = "") -> str:
     # 2) Daily top delay reason (by count)
-    conn.execute("DROP TABLE IF EXISTS gold_delay_reason_daily;")
-    conn.execute("""
-    CREATE TABLE gold_delay_reason_daily AS
+    return f"""
     WITH delay_daily AS (
         SELECT
-            airport,
-            CAST(ts AS DATE) AS day,
-            reason_code,
-            AVG(boarding_delay_min) AS avg_delay_min,
+            e.airport,
+            CAST(e.ts AS DATE) AS day,
+            e.reason_code,
+            AVG(e.boarding_delay_min) AS avg_delay_min,
             COUNT(*) AS cnt
-        FROM boarding_events
+        FROM boarding_events e {event_filter}
         GROUP BY 1,2,3
     ),
     ranked AS (
@@ -80,50 +89,89 @@ def build_gold(conn: duckdb.DuckDBPyConnection) -> None:
         avg_delay_min AS top_reason_avg_delay_min,
         cnt AS top_reason_count
     FROM ranked
-    WHERE rn = 1;
+    WHERE rn = 1
+    ORDER BY airport, day
+    """
+
+# -----------------------------
+# Full builds
+# -----------------------------
+def build_kpi_hourly(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute("DROP TABLE IF EXISTS gold_airport_kpi_hourly;")
+    conn.execute("CREATE TABLE gold_airport_kpi_hourly AS " + kpi_hourly_select() + ";")
+
+def build_delay_reason_daily(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute("DROP TABLE IF EXISTS gold_delay_reason_daily;")
+    conn.execute("CREATE TABLE gold_delay_reason_daily AS " + delay_reason_daily_select() + ";")
+
+def build_anomaly_scores(conn: duckdb.DuckDBPyConnection) -> None:
+    # 3) Anomaly scores: every KPI metric vs. a rolling hour-of-day baseline
+    anomaly_engine.build_scores(conn)
+
+def build_kpi_rollup(conn: duckdb.DuckDBPyConnection) -> None:
+    # 4) Rollup cube (hour/day/week x metric, mergeable aggregates)
+    rollup_cube.build_cube(conn)
+
+# -----------------------------
+# Incremental refresh (streaming ingestion)
+# Callers fill temp tables with the keys touched by a batch:
+#   _affected_hours(airport, hour), _affected_days(airport, day)
+# Appended rows are not re-clustered; the next full build re-sorts.
+# -----------------------------
+_HOURS_FILTER = "SEMI JOIN _affected_hours a ON a.airport = e.airport AND a.hour = date_trunc('hour', e.ts)"
+_DAYS_FILTER = "SEMI JOIN _affected_days a ON a.airport = e.airport AND a.day = CAST(e.ts AS DATE)"
+
+def refresh_kpi_hourly(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute("""
+        DELETE FROM gold_airport_kpi_hourly g
+        USING _affected_hours a
+        WHERE g.airport = a.airport AND g.hour = a.hour;
     """)
+    conn.execute("INSERT INTO gold_airport_kpi_hourly " + kpi_hourly_select(_HOURS_FILTER) + ";")
 
-    # 3) Anomaly scores (z-score per airport on security_wait_min)
-    conn.execute("DROP TABLE IF EXISTS gold_anomaly_scores;")
+def refresh_delay_reason_daily(conn: duckdb.DuckDBPyConnection) -> None:
     conn.execute("""
-    CREATE TABLE gold_anomaly_scores AS
-    WITH k AS (
-        SELECT *
-        FROM gold_airport_kpi_hourly
-        WHERE security_wait_min IS NOT NULL
-    ),
-    stats AS (
-        SELECT
-            airport,
-            AVG(security_wait_min) AS mu,
-            STDDEV_SAMP(security_wait_min) AS sigma
-        FROM k
-        GROUP BY 1
-    )
-    SELECT
-        k.airport,
-        k.hour AS ts,
-        'security_wait_min' AS metric,
-        ABS(
-            (k.security_wait_min - s.mu)
-            /
-            CASE WHEN s.sigma IS NULL OR s.sigma = 0 THEN 1 ELSE s.sigma END
-        ) AS score,
-        (ABS(
-            (k.security_wait_min - s.mu)
-            /
-            CASE WHEN s.sigma IS NULL OR s.sigma = 0 THEN 1 ELSE s.sigma END
-        ) >= 2.5) AS is_anomaly,
-        'demo_zscore_v1' AS model_version
-    FROM k
-    JOIN stats s USING (airport);
+        DELETE FROM gold_delay_reason_daily g
+        USING _affected_days a
+        WHERE g.airport = a.airport AND g.day = a.day;
     """)
+    conn.execute("INSERT INTO gold_delay_reason_daily " + delay_reason_daily_select(_DAYS_FILTER) + ";")
+
+def refresh_anomaly_scores(conn: duckdb.DuckDBPyConnection) -> None:
+    anomaly_engine.rescore_affected(conn)
+
+def refresh_kpi_rollup(conn: duckdb.DuckDBPyConnection) -> None:
+    rollup_cube.refresh_cube(conn)
+
+# table -> (builder, input tables); used by build_gold() and the pipeline DAG runner
+GOLD_BUILDERS = {
+    "gold_airport_kpi_hourly": (build_kpi_hourly, ["checkin_events", "presecurity_events", "boarding_events"]),
+    "gold_delay_reason_daily": (build_delay_reason_daily, ["boarding_events"]),
+    "gold_anomaly_scores": (build_anomaly_scores, ["gold_airport_kpi_hourly"]),
+    "gold_kpi_rollup": (build_kpi_rollup, ["checkin_events", "presecurity_events", "boarding_events"]),
+}
+
+def build_gold(conn: duckdb.DuckDBPyConnection) -> None:
+    for builder, _ in GOLD_BUILDERS.values():
+        builder(conn)
 
 def main():
-    conn = duckdb.connect(DB_PATH)
-    build_gold(conn)
-    conn.close()
-    print("✅ Gold tables built in:", DB_PATH)
+    parser = argparse.ArgumentParser(description="Build gold tables")
+    parser.add_argument(
+        "--export-parquet",
+        default=os.getenv("DUCKDB_PARQUET_DIR"),
+        help="also export silver + gold as hive-partitioned Parquet (day/airport) to this dir",
+    )
+    args = parser.parse_args()
+
+    with standalone_write_path() as db_path:
+        conn = duckdb.connect(db_path)
+        build_gold(conn)
+        if args.export_parquet:
+            exported = export_parquet(conn, args.export_parquet)
+            print("✅ Parquet layout exported:", args.export_parquet, sorted(exported))
+        conn.close()
+    print("✅ Gold tables built in:", db_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
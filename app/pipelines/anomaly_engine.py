@@ -0,0 +1,215 @@
+# app/pipelines/anomaly_engine.py
+"""
+Rolling anomaly scoring for every metric in gold_airport_kpi_hourly.
+
+Baseline = same airport, same metric, same hour-of-day over the previous
+BASELINE_DAYS days (the point being scored is excluded). Peaks at 07:00 are
+compared with other 07:00s, not with 03:00.
+
+  score = |value - expected| / max(sigma, MIN_REL_SIGMA * |expected|)
+
+Scores are computed in one DuckDB window pass (UNPIVOT + RANGE frame), so a
+full rebuild is a single query and increments only touch the rows they need:
+
+  - score_pending(): hours in the KPI table that have no scores yet
+  - rescore_affected(): hours in _affected_hours (streaming ingestion) plus the
+    later same-hour-of-day points whose baseline window includes them
+
+Rows with fewer than MIN_PERIODS baseline points get score NULL / is_anomaly false.
+
+  python -m app.pipelines.anomaly_engine          # append newly arrived hours
+  python -m app.pipelines.anomaly_engine --full   # rebuild the table
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from typing import List
+
+import duckdb
+
+from app.db.duckdb_client import standalone_write_path
+
+MODEL_VERSION = "rolling_hod_v1"
+BASELINE_DAYS = int(os.getenv("ANOMALY_BASELINE_DAYS", "28"))
+MIN_PERIODS = int(os.getenv("ANOMALY_MIN_PERIODS", "5"))
+THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "2.5"))
+MIN_REL_SIGMA = 0.05  # near-constant series (lanes open) shouldn't alarm on tiny moves
+
+KPI_TABLE = "gold_airport_kpi_hourly"
+SCORES_TABLE = "gold_anomaly_scores"
+KEY_COLUMNS = ("airport", "hour")
+
+SCORES_DDL = f"""
+CREATE TABLE IF NOT EXISTS {SCORES_TABLE} (
+    airport VARCHAR,
+    ts TIMESTAMP,
+    metric VARCHAR,
+    value DOUBLE,
+    expected DOUBLE,
+    score DOUBLE,
+    is_anomaly BOOLEAN,
+    model_version VARCHAR
+);
+"""
+
+
+def kpi_metrics(conn: duckdb.DuckDBPyConnection) -> List[str]:
+    """
+    Numeric KPI columns to score (everything except the keys).
+    """
+    rows = conn.execute(f"DESCRIBE {KPI_TABLE}").fetchall()
+    numeric = ("DOUBLE", "FLOAT", "DECIMAL", "INTEGER", "BIGINT", "HUGEINT", "SMALLINT")
+    return [r[0] for r in rows if r[0] not in KEY_COLUMNS and str(r[1]).upper().startswith(numeric)]
+
+
+def scores_select(conn: duckdb.DuckDBPyConnection, kpi_filter: str = "", keep_filter: str = "") -> str:
+    """
+    kpi_filter:  restricts KPI rows fed to the window pass (must keep each kept row's history)
+    keep_filter: restricts which scored rows are returned (on alias s)
+    """
+    metrics = kpi_metrics(conn)
+    casts = ", ".join(f"CAST(k.{m} AS DOUBLE) AS {m}" for m in metrics)
+    return f"""
+    WITH
+    long AS (
+        UNPIVOT (
+            SELECT k.airport, k.hour, {casts}
+            FROM {KPI_TABLE} k {kpi_filter}
+        )
+        ON {", ".join(metrics)}
+        INTO NAME metric VALUE value
+    ),
+    w AS (
+        SELECT
+            airport,
+            hour AS ts,
+            metric,
+            value,
+            AVG(value) OVER baseline AS mu,
+            STDDEV_SAMP(value) OVER baseline AS sigma,
+            COUNT(value) OVER baseline AS n
+        FROM long
+        WINDOW baseline AS (
+            PARTITION BY airport, metric, hour(hour)
+            ORDER BY hour
+            RANGE BETWEEN INTERVAL {BASELINE_DAYS} DAYS PRECEDING AND INTERVAL 1 HOUR PRECEDING
+        )
+    ),
+    s AS (
+        SELECT
+            airport,
+            ts,
+            metric,
+            value,
+            mu AS expected,
+            CASE WHEN n >= {MIN_PERIODS}
+                THEN ABS(value - mu) / GREATEST(COALESCE(sigma, 0), {MIN_REL_SIGMA} * ABS(mu), 1e-9)
+            END AS score
+        FROM w
+    )
+    SELECT
+        s.airport,
+        s.ts,
+        s.metric,
+        s.value,
+        s.expected,
+        s.score,
+        COALESCE(s.score >= {THRESHOLD}, false) AS is_anomaly,
+        '{MODEL_VERSION}' AS model_version
+    FROM s {keep_filter}
+    ORDER BY s.airport, s.ts, s.metric
+    """
+
+
+def build_scores(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute(f"DROP TABLE IF EXISTS {SCORES_TABLE};")
+    conn.execute(SCORES_DDL)
+    conn.execute(f"INSERT INTO {SCORES_TABLE} " + scores_select(conn) + ";")
+
+
+def _rescore(conn: duckdb.DuckDBPyConnection) -> int:
+    """
+    Recompute scores for the (airport, hour) keys in temp table _rescore.
+    Only history within BASELINE_DAYS of those keys is read.
+    """
+    conn.execute(SCORES_DDL)
+    n = conn.execute("SELECT COUNT(*) FROM _rescore").fetchone()[0]
+    if not n:
+        return 0
+
+    kpi_filter = f"""
+        SEMI JOIN (
+            SELECT airport, MIN(hour) - INTERVAL {BASELINE_DAYS} DAYS AS since
+            FROM _rescore GROUP BY 1
+        ) r ON r.airport = k.airport AND k.hour >= r.since
+    """
+    keep_filter = "SEMI JOIN _rescore r ON r.airport = s.airport AND r.hour = s.ts"
+
+    conn.execute(f"""
+        DELETE FROM {SCORES_TABLE} g
+        USING _rescore r
+        WHERE g.airport = r.airport AND g.ts = r.hour;
+    """)
+    conn.execute(f"INSERT INTO {SCORES_TABLE} " + scores_select(conn, kpi_filter, keep_filter) + ";")
+    return n
+
+
+def score_pending(conn: duckdb.DuckDBPyConnection) -> int:
+    """
+    Append scores for KPI hours that have none yet. Returns hours scored.
+    """
+    conn.execute(SCORES_DDL)
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rescore AS
+        SELECT k.airport, k.hour
+        FROM {KPI_TABLE} k
+        ANTI JOIN (SELECT DISTINCT airport, ts FROM {SCORES_TABLE}) g
+            ON g.airport = k.airport AND g.ts = k.hour;
+    """)
+    return _rescore(conn)
+
+
+def rescore_affected(conn: duckdb.DuckDBPyConnection) -> int:
+    """
+    Rescore the hours in temp table _affected_hours(airport, hour) and every later
+    same-hour-of-day KPI row whose baseline window contains one of them.
+    """
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rescore AS
+        SELECT DISTINCT k.airport, k.hour
+        FROM {KPI_TABLE} k
+        JOIN _affected_hours a
+            ON a.airport = k.airport
+           AND hour(a.hour) = hour(k.hour)
+           AND k.hour >= a.hour
+           AND k.hour <= a.hour + INTERVAL {BASELINE_DAYS} DAYS;
+    """)
+    # hours whose KPI row disappeared must lose their scores too
+    conn.execute(f"""
+        DELETE FROM {SCORES_TABLE} g
+        USING _affected_hours a
+        WHERE g.airport = a.airport AND g.ts = a.hour;
+    """)
+    return _rescore(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score KPI anomalies (rolling hour-of-day baseline)")
+    parser.add_argument("--full", action="store_true", help="rebuild instead of appending new hours")
+    args = parser.parse_args()
+
+    with standalone_write_path() as db_path:
+        conn = duckdb.connect(db_path)
+        if args.full:
+            build_scores(conn)
+            n = conn.execute(f"SELECT COUNT(DISTINCT (airport, ts)) FROM {SCORES_TABLE}").fetchone()[0]
+        else:
+            n = score_pending(conn)
+        flagged = conn.execute(f"SELECT COUNT(*) FROM {SCORES_TABLE} WHERE is_anomaly").fetchone()[0]
+        conn.close()
+    print(f"✅ {SCORES_TABLE}: {n:,} hours scored ({MODEL_VERSION}), {flagged:,} anomalies flagged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# app/pipelines/dag.py
+"""
+Small pipeline orchestrator for the data steps that used to be run by hand:
+
+  fake_ops (build_fake_db) | silver_demo (01_create_silver_tables)
+      -> gold_airport_kpi_hourly, gold_delay_reason_daily, gold_kpi_rollup   (parallel)
+      -> gold_anomaly_scores (anomaly_engine: rolling hour-of-day baseline)
+      -> schema_index (03_build_schema_index)
+
+Each step declares the tables it reads and writes; dependencies are derived
+from that. Before running, a step's inputs are fingerprinted (row count,
+max timestamp and schema hash per input table, step params and the run ids
+of upstream steps). If the fingerprint matches the last successful run and
+the outputs still exist, the step is skipped.
+
+With --snapshot the whole run writes into a new blue/green snapshot file
+(app/db/snapshots.py) that is published only if every step succeeds.
+
+Usage:
+  python -m app.pipelines.dag
+  python -m app.pipelines.dag --snapshot
+  python -m app.pipelines.dag --source silver --force
+  python -m app.pipelines.dag --only gold_anomaly_scores
+  python -m app.pipelines.dag --materializations data/materializations.json
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import duckdb
+
+from app.db.clustering import CLUSTER_KEYS, existing_tables
+from app.db.duckdb_client import DEFAULT_DB_PATH, get_conn
+from app.db.snapshots import SNAPSHOT_DIR, begin_snapshot, gc_snapshots, publish_snapshot, read_pointer
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[duckdb.DuckDBPyConnection], Any]
+    inputs: List[str] = field(default_factory=list)        # tables read
+    outputs: List[str] = field(default_factory=list)       # tables written
+    output_paths: List[str] = field(default_factory=list)  # non-table artifacts (e.g. Chroma dir)
+    params: Dict[str, Any] = field(default_factory=dict)
+    schema_only: bool = False  # fingerprint input schemas only (e.g. schema index)
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str  # ran | skipped | failed | blocked
+    seconds: float = 0.0
+    detail: str = ""
+    # new state entry of a step that ran; written to the state file by the runner's thread only
+    state: Optional[Dict[str, Any]] = None
+
+
+# -----------------------------
+# Fingerprints
+# -----------------------------
+def table_fingerprint(conn: duckdb.DuckDBPyConnection, table: str, schema_only: bool = False) -> Dict[str, Any]:
+    cols = conn.execute(f"DESCRIBE {table}").fetchall()
+    schema_hash = hashlib.sha256(json.dumps([(c[0], c[1]) for c in cols]).encode()).hexdigest()[:16]
+    if schema_only:
+        return {"schema": schema_hash}
+
+    fp: Dict[str, Any] = {"schema": schema_hash}
+    ts_col = CLUSTER_KEYS.get(table, (None, None))[1]
+    if ts_col:
+        rows, max_ts = conn.execute(f"SELECT COUNT(*), MAX({ts_col}) FROM {table}").fetchone()
+        fp.update({"rows": rows, "max_ts": str(max_ts)})
+    else:
+        fp["rows"] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return fp
+
+
+def step_fingerprint(
+    conn: duckdb.DuckDBPyConnection,
+    step: Step,
+    upstream_runs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Hash of step params + input table fingerprints + the run ids of upstream steps
+    (so a rebuild upstream propagates even if counts / max ts happen to match).
+    """
+    present = set(existing_tables(conn))
+    inputs = {
+        t: table_fingerprint(conn, t, schema_only=step.schema_only) if t in present else None
+        for t in sorted(step.inputs)
+    }
+    payload = json.dumps(
+        {"params": step.params, "inputs": inputs, "upstream": upstream_runs or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _outputs_exist(conn: duckdb.DuckDBPyConnection, step: Step) -> bool:
+    present = set(existing_tables(conn))
+    return all(t in present for t in step.outputs) and all(os.path.exists(p) for p in step.output_paths)
+
+
+def _load_state(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(path: str, state: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _dependencies(steps: List[Step]) -> Dict[str, List[str]]:
+    producers: Dict[str, str] = {}
+    for s in steps:
+        for t in s.outputs:
+            producers[t] = s.name
+    return {
+        s.name: sorted({producers[t] for t in s.inputs if t in producers and producers[t] != s.name})
+        for s in steps
+    }
+
+
+def run_dag(
+    steps: List[Step],
+    conn: duckdb.DuckDBPyConnection,
+    state_path: str,
+    force: bool = False,
+    only: Optional[List[str]] = None,
+    max_workers: int = 4,
+) -> List[StepResult]:
+    """
+    Run steps in dependency order; independent steps run in parallel threads
+    (each on its own DuckDB cursor). Returns per-step results in completion order.
+    """
+    by_name = {s.name: s for s in steps}
+    deps = _dependencies(steps)
+    state = _load_state(state_path)
+    forced = set(by_name) if force else set(only or [])
+
+    results: Dict[str, StepResult] = {}
+    order: List[str] = []
+
+    def _execute(step: Step) -> StepResult:
+        cur = conn.cursor()
+        try:
+            upstream = {d: state.get(d, {}).get("run_id") for d in deps[step.name]}
+            fp = step_fingerprint(cur, step, upstream)
+            prev = state.get(step.name, {})
+            if step.name not in forced and prev.get("fingerprint") == fp and _outputs_exist(cur, step):
+                return StepResult(step.name, "skipped", 0.0, "inputs unchanged")
+
+            t0 = time.perf_counter()
+            step.run(cur)
+            elapsed = time.perf_counter() - t0
+            return StepResult(step.name, "ran", elapsed, state={
+                "fingerprint": fp,
+                "run_id": uuid.uuid4().hex,
+                "seconds": round(elapsed, 3),
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+        except Exception as e:
+            return StepResult(step.name, "failed", 0.0, str(e))
+        finally:
+            cur.close()
+
+    pending = {s.name for s in steps}
+    if only:
+        # run the selected steps (and nothing downstream)
+        pending &= set(only)
+        for name in set(by_name) - pending:
+            results[name] = StepResult(name, "skipped", 0.0, "not selected")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while pending or running:
+            for name in sorted(pending):
+                if any(d not in results for d in deps[name]):
+                    continue
+                if any(results[d].status in ("failed", "blocked") for d in deps[name]):
+                    results[name] = StepResult(name, "blocked", 0.0, "upstream failed")
+                    order.append(name)
+                else:
+                    running[pool.submit(_execute, by_name[name])] = name
+                pending.discard(name)
+
+            if not running:
+                # nothing runnable left (dependency cycle): don't spin
+                for name in pending:
+                    results[name] = StepResult(name, "blocked", 0.0, "unresolvable dependencies")
+                    order.append(name)
+                pending.clear()
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                results[name] = fut.result()
+                order.append(name)
+                if results[name].state is not None:
+                    state[name] = results[name].state
+                    _save_state(state_path, state)
+
+    return [results[n] for n in order]
+
+
+def print_report(results: List[StepResult], wall: float) -> None:
+    print(f"\n{'step':<28}{'status':<10}{'seconds':>9}  detail")
+    for r in results:
+        print(f"{r.name:<28}{r.status:<10}{r.seconds:>9.2f}  {r.detail}")
+    print(f"\nTotal wall time: {wall:.2f}s")
+
+
+# -----------------------------
+# Step declarations
+# -----------------------------
+SILVER_OUTPUTS = ["checkin_events", "presecurity_events", "boarding_events"]
+
+
+def materialization_steps(path: str) -> List[Step]:
+    """
+    Gold tables recommended by the query log report (python -m app.db.query_log
+    report --out <path>). Each is rebuilt when its source table changes.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+
+    steps: List[Step] = []
+    for mv in spec.get("materializations", []):
+        name = mv["name"]
+        if not re.fullmatch(r"gold_mv_\w+", name):
+            raise ValueError(f"Unexpected materialization name: {name}")
+
+        def _build(c: duckdb.DuckDBPyConnection, mv: Dict[str, Any] = mv) -> None:
+            c.execute(f"CREATE OR REPLACE TABLE {mv['name']} AS {mv['sql']}")
+            if mv.get("comment"):
+                c.execute(f"COMMENT ON TABLE {mv['name']} IS '{mv['comment'].replace(chr(39), chr(39) * 2)}'")
+
+        steps.append(Step(
+            name=name,
+            run=_build,
+            inputs=[mv["source_table"]],
+            outputs=[name],
+            params={"sql": mv["sql"]},
+        ))
+    return steps
+
+
+def default_steps(
+    source: str = "fake",
+    days: float = 7,
+    airports: int = 5,
+    workers: int = 1,
+    materializations: Optional[str] = None,
+) -> List[Step]:
+    """
+    source="fake"   -> build_fake_db (all ops tables + dims)
+    source="silver" -> 01_create_silver_tables (minimal silver demo data)
+    materializations -> JSON from the query log report; adds one step per table
+    """
+    silver_mod = importlib.import_module("app.pipelines.01_create_silver_tables")
+    gold_mod = importlib.import_module("app.pipelines.02_build_gold_tables")
+
+    steps: List[Step] = []
+    if source == "fake":
+        from app.fakedb.build_fake_db import build
+
+        steps.append(Step(
+            name="fake_ops",
+            run=lambda c: build(c, days=days, airports=airports, workers=workers),
+            outputs=["dim_airport", "flights", *SILVER_OUTPUTS, "disruption_events"],
+            # no "workers": the generated data is the same for any worker count
+            params={"days": days, "airports": airports},
+        ))
+    else:
+        steps.append(Step(
+            name="silver_demo",
+            run=lambda c: silver_mod.build_silver(c, days=int(days)),
+            outputs=SILVER_OUTPUTS,
+            params={"days": days},
+        ))
+
+    for table, (builder, inputs) in gold_mod.GOLD_BUILDERS.items():
+        steps.append(Step(name=table, run=builder, inputs=inputs, outputs=[table]))
+
+    if materializations:
+        steps.extend(materialization_steps(materializations))
+
+    from app.rag.schema_index import DEFAULT_CHROMA_DIR
+
+    def _schema_index(_conn):
+        from app.rag.schema_index import build_schema_index
+        build_schema_index()
+
+    all_tables = sorted({t for s in steps for t in s.outputs})
+    steps.append(Step(
+        name="schema_index",
+        run=_schema_index,
+        inputs=all_tables,
+        output_paths=[DEFAULT_CHROMA_DIR],
+        schema_only=True,
+    ))
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data pipeline DAG")
+    parser.add_argument("--db-path", default=os.getenv("DUCKDB_PATH", DEFAULT_DB_PATH))
+    parser.add_argument("--source", choices=["fake", "silver"], default="fake")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--airports", type=int, default=5)
+    parser.add_argument("--gen-workers", type=int, default=1, help="processes for fake data generation")
+    parser.add_argument("--workers", type=int, default=4, help="parallel independent steps")
+    parser.add_argument("--force", action="store_true", help="ignore fingerprints and rerun everything")
+    parser.add_argument("--only", nargs="*", help="run just these steps")
+    parser.add_argument(
+        "--materializations",
+        default=None,
+        help="JSON from `python -m app.db.query_log report --out`: build the recommended gold tables too",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="write into a new blue/green snapshot and publish it on success (API keeps serving the old one)",
+    )
+    args = parser.parse_args()
+
+    steps = default_steps(
+        args.source,
+        days=args.days,
+        airports=args.airports,
+        workers=args.gen_workers,
+        materializations=args.materializations,
+    )
+
+    if args.snapshot:
+        # first snapshot starts from the legacy single DB file (if any)
+        base = None if read_pointer() else args.db_path
+        db_path = begin_snapshot(base_path=base)
+        state_path = os.path.join(SNAPSHOT_DIR, "pipeline.json")
+    else:
+        db_path = args.db_path
+        state_path = db_path + ".pipeline.json"
+
+    # every step (and get_conn() inside them) must agree on one DB file
+    os.environ["DUCKDB_PATH"] = db_path
+    conn = get_conn(db_path)
+
+    t0 = time.perf_counter()
+    results = run_dag(steps, conn, state_path, force=args.force, only=args.only, max_workers=args.workers)
+    conn.close()
+    failed = any(r.status in ("failed", "blocked") for r in results)
+
+    if args.snapshot:
+        if failed:
+            os.remove(db_path)
+            print("❌ Snapshot discarded:", db_path)
+        elif all(r.status == "skipped" for r in results):
+            os.remove(db_path)
+            print("✅ Nothing changed; current snapshot kept")
+        else:
+            del os.environ["DUCKDB_PATH"]
+            published = publish_snapshot(db_path)
+            removed = gc_snapshots()
+            print(f"✅ Published snapshot {published['version']} (gc removed {len(removed)})")
+
+    print_report(results, time.perf_counter() - t0)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
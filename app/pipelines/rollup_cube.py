@@ -0,0 +1,214 @@
+# app/pipelines/rollup_cube.py
+"""
+Rollup cube of mergeable KPI aggregates: (airport, grain, period_start, metric)
+with n, sum, sum_sq, min, max.
+
+  grain = 'hour'  built from the raw event tables
+  grain = 'day'   merged from hour rows
+  grain = 'week'  merged from hour rows (weeks start Monday)
+
+Because the aggregates merge (SUM the sums/counts, MIN the mins ...), averages
+and standard deviations at any coarser grain or across airports are exact and
+come from a table that is orders of magnitude smaller than the events:
+
+  avg    = SUM(sum) / SUM(n)
+  stddev = SQRT((SUM(sum_sq) - SUM(sum)^2 / SUM(n)) / (SUM(n) - 1))
+
+gold_kpi_rollup_stats is a view with avg / stddev precomputed per row.
+
+  python -m app.pipelines.rollup_cube
+"""
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import duckdb
+
+from app.db.clustering import cluster_table
+from app.db.duckdb_client import standalone_write_path
+
+CUBE_TABLE = "gold_kpi_rollup"
+STATS_VIEW = "gold_kpi_rollup_stats"
+COARSE_GRAINS = ("day", "week")
+
+# metric -> (event table, column); only those whose column exists are built (cube_metrics)
+CUBE_METRICS = {
+    "checkin_wait_min": ("checkin_events", "avg_wait_min"),
+    "checkin_pax": ("checkin_events", "pax_count"),
+    "security_wait_min": ("presecurity_events", "avg_wait_min"),
+    "security_pax": ("presecurity_events", "pax_count"),
+    "security_lanes_open": ("presecurity_events", "lanes_open"),
+    "security_queue_len": ("presecurity_events", "queue_len"),
+    "boarding_delay_min": ("boarding_events", "boarding_delay_min"),
+}
+
+CUBE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (
+    airport VARCHAR,
+    grain VARCHAR,
+    period_start TIMESTAMP,
+    metric VARCHAR,
+    n BIGINT,
+    sum DOUBLE,
+    sum_sq DOUBLE,
+    min DOUBLE,
+    max DOUBLE
+);
+"""
+
+# picked up by app/rag/schema_docs.py so the SQL generator knows when to use the cube
+CUBE_COMMENTS = {
+    None: (
+        "Pre-aggregated KPI rollup cube. PREFER this over event tables and gold_airport_kpi_hourly for "
+        "daily/weekly/monthly trends and airport rankings. One row per (airport, grain, period_start, metric); "
+        "grain is 'hour', 'day' or 'week'. Metrics: {metrics}. "
+        "Merge rows for coarser grains or several airports: avg = SUM(sum)/SUM(n), "
+        "stddev = SQRT((SUM(sum_sq) - SUM(sum)*SUM(sum)/SUM(n)) / (SUM(n)-1)), MIN(min), MAX(max). "
+        "Always filter on grain."
+    ),
+    "grain": "'hour' | 'day' | 'week' (week starts Monday)",
+    "period_start": "start of the hour/day/week bucket",
+    "n": "number of source events",
+    "sum": "sum of metric values (pax metrics: total passengers)",
+    "sum_sq": "sum of squared values, for stddev",
+}
+STATS_COMMENT = (
+    "gold_kpi_rollup with avg and stddev already computed per row (airport, grain, period_start, metric). "
+    "Use for per-bucket averages; to combine buckets, aggregate gold_kpi_rollup instead of averaging avg."
+)
+
+
+def cube_metrics(conn: duckdb.DuckDBPyConnection) -> Dict[str, Tuple[str, str]]:
+    """
+    CUBE_METRICS whose event column exists here (e.g. the silver schema's
+    presecurity_events has no pax_count).
+    """
+    present = set(conn.execute(
+        "SELECT table_name, column_name FROM information_schema.columns "
+        "WHERE table_catalog = current_database() AND table_schema = current_schema()"
+    ).fetchall())
+    return {metric: (table, col) for metric, (table, col) in CUBE_METRICS.items() if (table, col) in present}
+
+
+def hour_rows_select(metrics: Dict[str, Tuple[str, str]], event_filter: str = "") -> str:
+    parts = [
+        f"""
+        SELECT
+            e.airport,
+            'hour' AS grain,
+            date_trunc('hour', e.ts) AS period_start,
+            '{metric}' AS metric,
+            COUNT(e.{col}) AS n,
+            SUM(e.{col}::DOUBLE) AS sum,
+            SUM(e.{col}::DOUBLE * e.{col}::DOUBLE) AS sum_sq,
+            MIN(e.{col}::DOUBLE) AS min,
+            MAX(e.{col}::DOUBLE) AS max
+        FROM {table} e {event_filter}
+        WHERE e.{col} IS NOT NULL
+        GROUP BY 1, 2, 3, 4"""
+        for metric, (table, col) in metrics.items()
+    ]
+    return "\nUNION ALL\n".join(parts)
+
+
+def coarse_rows_select(grain: str, hour_filter: str = "") -> str:
+    return f"""
+    SELECT
+        h.airport,
+        '{grain}' AS grain,
+        date_trunc('{grain}', h.period_start) AS period_start,
+        h.metric,
+        SUM(h.n) AS n,
+        SUM(h.sum) AS sum,
+        SUM(h.sum_sq) AS sum_sq,
+        MIN(h.min) AS min,
+        MAX(h.max) AS max
+    FROM {CUBE_TABLE} h {hour_filter}
+    WHERE h.grain = 'hour'
+    GROUP BY 1, 2, 3, 4
+    """
+
+
+def _escape(text: str) -> str:
+    return text.replace("'", "''")
+
+
+def _create_stats_view(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {STATS_VIEW} AS
+        SELECT
+            airport, grain, period_start, metric, n, min, max,
+            sum / n AS avg,
+            CASE WHEN n > 1 THEN SQRT(GREATEST(sum_sq - sum * sum / n, 0) / (n - 1)) END AS stddev
+        FROM {CUBE_TABLE};
+    """)
+    conn.execute(f"COMMENT ON VIEW {STATS_VIEW} IS '{_escape(STATS_COMMENT)}';")
+
+
+def apply_comments(conn: duckdb.DuckDBPyConnection, metrics: Dict[str, Tuple[str, str]]) -> None:
+    for col, text in CUBE_COMMENTS.items():
+        text = _escape(text.format(metrics=", ".join(metrics)) if col is None else text)
+        if col is None:
+            conn.execute(f"COMMENT ON TABLE {CUBE_TABLE} IS '{text}';")
+        else:
+            conn.execute(f"COMMENT ON COLUMN {CUBE_TABLE}.{col} IS '{text}';")
+
+
+def build_cube(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute(f"DROP VIEW IF EXISTS {STATS_VIEW};")
+    conn.execute(f"DROP TABLE IF EXISTS {CUBE_TABLE};")
+    conn.execute(CUBE_DDL)
+    metrics = cube_metrics(conn)
+    if not metrics:
+        raise RuntimeError(f"None of the {CUBE_TABLE} metric columns exist; are the event tables loaded?")
+    conn.execute(f"INSERT INTO {CUBE_TABLE} " + hour_rows_select(metrics) + ";")
+    for grain in COARSE_GRAINS:
+        conn.execute(f"INSERT INTO {CUBE_TABLE} " + coarse_rows_select(grain) + ";")
+    # sorted like the other gold tables so airport/time filters prune row groups
+    cluster_table(conn, CUBE_TABLE)
+    apply_comments(conn, metrics)
+    _create_stats_view(conn)
+
+
+def refresh_cube(conn: duckdb.DuckDBPyConnection) -> None:
+    """
+    Recompute hour rows for temp table _affected_hours(airport, hour), then re-merge
+    the days / weeks containing them from hour rows.
+    """
+    conn.execute(CUBE_DDL)
+    conn.execute(f"""
+        DELETE FROM {CUBE_TABLE} c
+        USING _affected_hours a
+        WHERE c.grain = 'hour' AND c.airport = a.airport AND c.period_start = a.hour;
+    """)
+    event_filter = "SEMI JOIN _affected_hours a ON a.airport = e.airport AND a.hour = date_trunc('hour', e.ts)"
+    conn.execute(f"INSERT INTO {CUBE_TABLE} " + hour_rows_select(cube_metrics(conn), event_filter) + ";")
+
+    for grain in COARSE_GRAINS:
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE _affected_buckets AS
+            SELECT DISTINCT airport, date_trunc('{grain}', hour) AS period_start FROM _affected_hours;
+        """)
+        conn.execute(f"""
+            DELETE FROM {CUBE_TABLE} c
+            USING _affected_buckets b
+            WHERE c.grain = '{grain}' AND c.airport = b.airport AND c.period_start = b.period_start;
+        """)
+        hour_filter = (
+            f"SEMI JOIN _affected_buckets b "
+            f"ON b.airport = h.airport AND b.period_start = date_trunc('{grain}', h.period_start)"
+        )
+        conn.execute(f"INSERT INTO {CUBE_TABLE} " + coarse_rows_select(grain, hour_filter) + ";")
+
+
+def main():
+    with standalone_write_path() as db_path:
+        conn = duckdb.connect(db_path)
+        build_cube(conn)
+        rows = conn.execute(f"SELECT grain, COUNT(*) FROM {CUBE_TABLE} GROUP BY 1 ORDER BY 2 DESC").fetchall()
+        conn.close()
+    print(f"✅ {CUBE_TABLE} built:", ", ".join(f"{g}={n:,}" for g, n in rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 # app/rag/embeddings_factory.py
 from __future__ import annotations
 
+from functools import lru_cache
+
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
 
+@lru_cache(maxsize=1)
 def get_embeddings():
     """
     Local embeddings using sentence-transformers.
+    One instance per process: loading the model is the slow part.
     """
     return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
\ No newline at end of file
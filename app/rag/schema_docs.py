@@ -11,7 +11,8 @@ def extract_schema_docs() -> List[Document]:
     """
     Builds LangChain Documents for each DuckDB table schema.
     Each Document has:
-      - page_content: human-readable schema text
+      - page_content: human-readable schema text (+ table / column comments, e.g. usage
+        hints for gold_kpi_rollup)
       - metadata: {"table": "<table_name>"}
     """
 
@@ -24,6 +25,20 @@ def extract_schema_docs() -> List[Document]:
         ORDER BY table_name
     """).fetchall()
 
+    table_comments = dict(conn.execute("""
+        SELECT table_name, comment FROM duckdb_tables() WHERE schema_name = 'main' AND comment IS NOT NULL
+        UNION ALL
+        SELECT view_name, comment FROM duckdb_views() WHERE schema_name = 'main' AND comment IS NOT NULL
+    """).fetchall())
+    column_comments = {
+        (t, c): txt
+        for t, c, txt in conn.execute("""
+            SELECT table_name, column_name, comment
+            FROM duckdb_columns()
+            WHERE schema_name = 'main' AND comment IS NOT NULL
+        """).fetchall()
+    }
+
     docs: List[Document] = []
 
     for (table,) in tables:
@@ -35,8 +50,14 @@ def extract_schema_docs() -> List[Document]:
             ORDER BY ordinal_position
         """).fetchall()
 
-        schema_text = "Table: " + table + "\nColumns:\n" + "\n".join(
-            [f"- {c} ({t})" for c, t in cols]
+        schema_text = "Table: " + table + "\n"
+        if table in table_comments:
+            schema_text += "Description: " + table_comments[table] + "\n"
+        schema_text += "Columns:\n" + "\n".join(
+            [
+                f"- {c} ({t})" + (f": {column_comments[(table, c)]}" if (table, c) in column_comments else "")
+                for c, t in cols
+            ]
         )
 
         docs.append(
@@ -1,68 +1,110 @@
 # app/rag/schema_index.py
 from __future__ import annotations
 
+import fcntl
 import os
-from typing import Optional, List
+from contextlib import contextmanager
+from typing import Iterator, Optional, List
 
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
+from app.db.duckdb_client import get_schema_version
 from app.rag.embeddings_factory import get_embeddings
 from app.rag.schema_docs import extract_schema_docs
 
 DEFAULT_CHROMA_DIR = os.getenv("CHROMA_SCHEMA_DIR", "data/chroma_schema_index")
+SCHEMA_VERSION_FILE = "schema_version.txt"
+REBUILD_LOCK_FILE = ".rebuild.lock"
 
 _vectorstore: Optional[Chroma] = None
+_vectorstore_version: Optional[str] = None
 
 
-def build_schema_index(persist_dir: str = DEFAULT_CHROMA_DIR) -> Chroma:
-    """
-    Build and persist schema index into Chroma.
-    """
+def _read_index_version(persist_dir: str) -> str:
+    try:
+        with open(os.path.join(persist_dir, SCHEMA_VERSION_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+@contextmanager
+def _rebuild_lock(persist_dir: str) -> Iterator[None]:
+    # pre-fork workers share the directory: one rebuilds, the others wait and then load its result
     os.makedirs(persist_dir, exist_ok=True)
+    with open(os.path.join(persist_dir, REBUILD_LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _open(persist_dir: str) -> Chroma:
+    return Chroma(persist_directory=persist_dir, embedding_function=get_embeddings())
+
+
+def _is_current(vs: Chroma, persist_dir: str, version: str) -> bool:
+    try:
+        count = vs._collection.count()
+    except Exception:
+        count = 0
+    return count > 0 and _read_index_version(persist_dir) == version
+
 
+def _rebuild(persist_dir: str) -> Chroma:
     docs: List[Document] = extract_schema_docs()
     if not docs:
         raise RuntimeError("No schema docs found. Is DuckDB loaded with tables?")
 
-    embeddings = get_embeddings()
+    # from_documents on an existing directory appends to the same collection:
+    # drop it first so re-indexed tables aren't duplicated and dropped tables go away
+    _open(persist_dir).delete_collection()
 
-    # Build from documents and persist
+    # Build from documents and persist; one doc per table, keyed by its name
     vs = Chroma.from_documents(
         documents=docs,
-        embedding=embeddings,
+        embedding=get_embeddings(),
+        ids=[d.metadata.get("table") or f"doc-{i}" for i, d in enumerate(docs)],
         persist_directory=persist_dir,
     )
     vs.persist()
+
+    # remember which DB schema this index describes (see get_schema_vectorstore)
+    with open(os.path.join(persist_dir, SCHEMA_VERSION_FILE), "w") as f:
+        f.write(get_schema_version())
     return vs
 
 
+def build_schema_index(persist_dir: str = DEFAULT_CHROMA_DIR) -> Chroma:
+    """
+    Build and persist schema index into Chroma (replaces any existing index).
+    """
+    with _rebuild_lock(persist_dir):
+        return _rebuild(persist_dir)
+
+
 def get_schema_vectorstore(persist_dir: str = DEFAULT_CHROMA_DIR) -> Chroma:
     """
     Load the persisted Chroma schema index.
-    If missing/empty, rebuild.
+    If missing/empty, or built for a different schema version (new snapshot), rebuild.
     """
-    global _vectorstore
-    if _vectorstore is not None:
+    global _vectorstore, _vectorstore_version
+    version = get_schema_version()
+    if _vectorstore is not None and _vectorstore_version == version:
         return _vectorstore
 
-    embeddings = get_embeddings()
-
     # Try load
-    vs = Chroma(
-        persist_directory=persist_dir,
-        embedding_function=embeddings,
-    )
+    vs = _open(persist_dir)
 
-    # If empty -> rebuild
-    try:
-        count = vs._collection.count()
-    except Exception:
-        count = 0
-
-    if count == 0:
-        vs = build_schema_index(persist_dir=persist_dir)
+    # If empty / stale -> rebuild, unless another worker did while we waited for the lock
+    if not _is_current(vs, persist_dir, version):
+        with _rebuild_lock(persist_dir):
+            vs = _open(persist_dir)
+            if not _is_current(vs, persist_dir, version):
+                vs = _rebuild(persist_dir)
 
     _vectorstore = vs
+    _vectorstore_version = version
     return _vectorstore
-
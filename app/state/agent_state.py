@@ -1,74 +1,100 @@
 # app/state/agent_state.py
-from __future__ import annotations
-
-from typing import Any, Dict, List, Optional
+"""
+State passed through the Text2SQL pipeline: one small slots dataclass per
+stage, filled in as the stages finish.
 
-from pydantic import BaseModel, Field
+No validation on assignment (the stages produce well-formed values and this
+is on every request's path) and no per-instance __dict__. The query result is
+held once, as the executor's Arrow table (Execution.table); DataFrames are
+made from it only where pandas is actually needed (result profiling).
 
+Sessions persist only the text stages (to_session / from_session).
+"""
+from __future__ import annotations
 
-class AgentState(BaseModel):
-    """
-    Shared state object passed through the Text2SQL pipeline.
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
 
-    This model is intentionally permissive and notebook-friendly:
-    - candidate_sql can be dict (metadata) or string
-    - dataframe stores executor output dict (with df + preview)
-    - result_df stores direct pandas df reference for convenience
-    """
+import pyarrow as pa
 
-    # -----------------------------
-    # Inputs
-    # -----------------------------
-    user_question: str
 
-    # -----------------------------
-    # Step 5: Query Rewriter
-    # -----------------------------
+@dataclass(slots=True)
+class Rewrite:
     rewritten_query: str = ""
     intent: str = "UNKNOWN"
-    entities: Dict[str, Any] = Field(default_factory=dict)
+    entities: Dict[str, Any] = field(default_factory=dict)
 
-    # -----------------------------
-    # Step 4: Schema RAG
-    # -----------------------------
+
+@dataclass(slots=True)
+class Retrieval:
     schema_context: str = ""
-    retrieved_tables: List[str] = Field(default_factory=list)
+    retrieved_tables: List[str] = field(default_factory=list)
+
 
-    # -----------------------------
-    # Step 6: SQL Generator
-    # -----------------------------
-    candidate_sql: Any = None  # dict returned by generate_sql() or raw string
+@dataclass(slots=True)
+class Generation:
+    sql: str = ""
+    confidence: Optional[float] = None
 
-    # -----------------------------
-    # Step 7: SQL Validator + Auto-fix
-    # -----------------------------
-    validation_ok: bool = False
+
+@dataclass(slots=True)
+class Validation:
+    ok: bool = False
     final_sql: str = ""
     fixed_by_llm: bool = False
 
-    # -----------------------------
-    # Step 8: SQL Execution
-    # executor returns dict: {row_count, columns, df, preview_markdown}
-    # -----------------------------
-    dataframe: Optional[Dict[str, Any]] = None
-    result_df: Optional[Any] = None  # pandas.DataFrame stored here (optional shortcut)
 
-    # -----------------------------
-    # Step 9: Explanation
-    # -----------------------------
-    explanation: Optional[Dict[str, Any]] = None
+@dataclass(slots=True)
+class Execution:
+    table: pa.Table
+    preview_markdown: str = ""
+    cache: str = "off"
+    seconds: float = 0.0
+    slow_query_id: Optional[str] = None
+
+    @property
+    def row_count(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
 
-    # -----------------------------
-    # Optional: Visualization
-    # -----------------------------
-    chart_path: Optional[str] = None
 
-    # -----------------------------
-    # Debug / tracing info
-    # -----------------------------
-    debug: Dict[str, Any] = Field(default_factory=dict)
+@dataclass(slots=True)
+class AgentState:
+    user_question: str
+    rewrite: Rewrite = field(default_factory=Rewrite)
+    retrieval: Retrieval = field(default_factory=Retrieval)
+    generation: Generation = field(default_factory=Generation)
+    validation: Validation = field(default_factory=Validation)
+    execution: Optional[Execution] = None
+    explanation: Optional[Dict[str, Any]] = None
+
+    def to_session(self) -> Dict[str, Any]:
+        """
+        What a follow-up needs from this turn (JSON-safe; no result data).
+        """
+        return {
+            "user_question": self.user_question,
+            "rewrite": asdict(self.rewrite),
+            "retrieval": asdict(self.retrieval),
+            "validation": asdict(self.validation),
+        }
 
-    model_config = {
-        "arbitrary_types_allowed": True,  # allows pandas DF in result_df/dataframe["df"]
-        "extra": "allow",                 # safe if you add new fields later
-    }
\ No newline at end of file
+    @classmethod
+    def from_session(cls, data: Dict[str, Any]) -> "AgentState":
+        if "rewrite" not in data:
+            # flat layout written before the per-stage state
+            return cls(
+                user_question=data.get("user_question", ""),
+                rewrite=Rewrite(data.get("rewritten_query", ""), data.get("intent", "UNKNOWN"), data.get("entities") or {}),
+                retrieval=Retrieval(data.get("schema_context", ""), list(data.get("retrieved_tables") or [])),
+                validation=Validation(bool(data.get("validation_ok")), data.get("final_sql", "")),
+            )
+        return cls(
+            user_question=data["user_question"],
+            rewrite=Rewrite(**data["rewrite"]),
+            retrieval=Retrieval(**data["retrieval"]),
+            validation=Validation(**data["validation"]),
+        )
@@ -0,0 +1,127 @@
+# app/state/checkpoints.py
+"""
+Stage checkpoints of pipeline runs, keyed by the caller's idempotency key.
+
+run_text2sql(checkpoint_key=...) saves the output of each LLM / retrieval
+stage as it completes (rewrite, schema_rag, sql_generation, and
+sql_validation once the SQL is valid). A retry with the same key and
+question skips the stages already done and continues at the first missing
+one, so an executor / explainer failure or a client timeout does not cost
+the rewrite, retrieval, generation and validation calls again.
+
+resume_from=<stage> replays from that stage: earlier checkpoints are used,
+that stage and everything after it run again (and replace their
+checkpoints). "sql_execution" re-runs the validated SQL against the current
+data without regenerating it. Execution itself is never checkpointed (result
+data stays in the result cache / store); the explanation is cached by
+app.state.explanations.
+
+SQLite like the session / job stores: every API worker sees every key.
+Checkpoints expire CHECKPOINT_TTL_SEC after they were written.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join("data", "checkpoints.sqlite"))
+CHECKPOINT_TTL_SEC = float(os.getenv("CHECKPOINT_TTL_SEC", "3600"))
+
+CHECKPOINT_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
+
+# pipeline order; the last one is replayable but never stored
+STAGES = ("rewrite", "schema_rag", "sql_generation", "sql_validation", "sql_execution")
+CHECKPOINTED = STAGES[:-1]
+
+
+def _question_key(question: str) -> str:
+    return " ".join((question or "").split())
+
+
+class CheckpointStore:
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, ttl_sec: float = CHECKPOINT_TTL_SEC):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL;")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    key TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (key, stage)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def load(self, key: str, question: str, before: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        {stage: output} of the completed stages of this key + question, in
+        pipeline order up to the first gap; only stages before `before` if given.
+        """
+        if before is not None and before not in STAGES:
+            raise ValueError(f"Unknown stage: {before!r} (expected one of {', '.join(STAGES)})")
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT stage, output FROM checkpoints WHERE key = ? AND question = ? AND expires_at >= ?",
+                (key, _question_key(question), time.time()),
+            ).fetchall()
+        found = {stage: output for stage, output in rows}
+        out: Dict[str, Dict[str, Any]] = {}
+        for stage in CHECKPOINTED:
+            if stage == before or stage not in found:
+                break
+            out[stage] = json.loads(found[stage])
+        return out
+
+    def save(self, key: str, question: str, stage: str, output: Dict[str, Any]) -> None:
+        """
+        Store one stage's output; checkpoints of later stages (from an earlier
+        run of this key) no longer follow from it and are dropped.
+        """
+        now = time.time()
+        later = CHECKPOINTED[CHECKPOINTED.index(stage) + 1:]
+        with self._connect() as db:
+            db.execute("DELETE FROM checkpoints WHERE expires_at < ?", (now,))
+            if stage == CHECKPOINTED[0]:
+                # a new run for this key (maybe another question): start over
+                db.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+            elif later:
+                db.execute(
+                    f"DELETE FROM checkpoints WHERE key = ? AND stage IN ({','.join('?' * len(later))})",
+                    (key, *later),
+                )
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints (key, stage, question, output, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, stage, _question_key(question), json.dumps(output, default=str), now + self.ttl_sec),
+            )
+
+    def delete(self, key: str) -> bool:
+        with self._connect() as db:
+            return db.execute("DELETE FROM checkpoints WHERE key = ?", (key,)).rowcount > 0
+
+
+_store: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    global _store
+    if _store is None:
+        _store = CheckpointStore()
+    return _store
@@ -0,0 +1,115 @@
+# app/state/explanations.py
+"""
+Stored explanation requests + cached explanations.
+
+After execution the pipeline keeps only the explainer's input (question,
+SQL, result profile digest; see explainer.prepare_explanation) under an
+explain id. Deferred mode returns the id and GET /api/explain/{id} runs the
+LLM on first view; every later view, and inline runs of the same question
+over the same result, reuse the stored explanation.
+
+The id is a hash of question + SQL + result digest, so identical questions
+on unchanged data share one explanation. SQLite like the job / session
+stores: every API worker can serve any id.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+EXPLAIN_DB_PATH = os.getenv("EXPLAIN_DB_PATH", os.path.join("data", "explanations.sqlite"))
+EXPLAIN_TTL_SEC = float(os.getenv("EXPLAIN_TTL_SEC", str(24 * 3600)))
+
+
+def explain_key(prepared: Dict[str, Any]) -> str:
+    material = json.dumps(
+        [" ".join(prepared["user_question"].lower().split()), prepared["sql"].strip(), prepared["digest"]],
+        default=str,
+    )
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+
+class ExplanationStore:
+    def __init__(self, path: str = EXPLAIN_DB_PATH, ttl_sec: float = EXPLAIN_TTL_SEC):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL;")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS explanations (
+                    id TEXT PRIMARY KEY,
+                    prepared TEXT NOT NULL,
+                    explanation TEXT,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def put(self, prepared: Dict[str, Any]) -> str:
+        """
+        Store the explainer input; a trivial result's templated explanation is stored with it.
+        """
+        explain_id = explain_key(prepared)
+        now = time.time()
+        explanation = prepared.get("explanation")
+        with self._connect() as db:
+            db.execute("DELETE FROM explanations WHERE expires_at < ?", (now,))
+            db.execute(
+                "INSERT INTO explanations (id, prepared, explanation, created_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET expires_at = excluded.expires_at",
+                (
+                    explain_id,
+                    json.dumps(prepared, default=str),
+                    json.dumps(explanation, default=str) if explanation is not None else None,
+                    now,
+                    now + self.ttl_sec,
+                ),
+            )
+        return explain_id
+
+    def get(self, explain_id: str) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        (prepared, explanation or None if not generated yet), or None for unknown / expired ids.
+        """
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT prepared, explanation FROM explanations WHERE id = ? AND expires_at >= ?",
+                (explain_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), (json.loads(row[1]) if row[1] else None)
+
+    def set_explanation(self, explain_id: str, explanation: Dict[str, Any]) -> None:
+        if explanation.get("error"):
+            return  # failed LLM call: try again on the next view
+        with self._connect() as db:
+            db.execute(
+                "UPDATE explanations SET explanation = ? WHERE id = ?",
+                (json.dumps(explanation, default=str), explain_id),
+            )
+
+
+_store: Optional[ExplanationStore] = None
+
+
+def get_explanation_store() -> ExplanationStore:
+    global _store
+    if _store is None:
+        _store = ExplanationStore()
+    return _store
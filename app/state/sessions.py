@@ -0,0 +1,125 @@
+# app/state/sessions.py
+"""
+Conversation sessions: the last AgentState of each session, so a follow-up
+("now only for LHR", "same but weekly") can edit the previous SQL instead of
+running rewrite -> retrieval -> generation from scratch.
+
+Stored in a local SQLite file like the job store (visible from every API
+worker, survives restarts). Only the text stages are kept (question, rewrite,
+schema context, final SQL; AgentState.to_session); result data is not. Sessions expire
+SESSION_TTL_SEC after their last turn and at most SESSION_MAX are kept.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.state.agent_state import AgentState
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join("data", "sessions.sqlite"))
+SESSION_TTL_SEC = float(os.getenv("SESSION_TTL_SEC", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# openers that only make sense as a continuation; not "top 5 ...", "for each ...",
+# "in which ..." etc., which also start plenty of self-contained questions
+_FOLLOWUP_START = re.compile(
+    r"^\s*(now|and|but|also|only|just|instead|same|what about|how about|and what|"
+    r"then|ok|okay|exclude|without|except|break (it|that|them) down|"
+    r"show (me )?(only|just|the same)|(sort|order|group|split|filter|limit) (it|that|them|those|these)\b)\b",
+    re.IGNORECASE,
+)
+# words that point back at the previous answer; bare "it" / "this" / "that" are
+# too common in new questions ("in this month", "is it highest") to count
+_FOLLOWUP_REF = re.compile(
+    r"\b(those|these|them|same|previous|above|earlier|instead|"
+    r"that (one|result|query|list|table|chart)|(it|that) (again|instead))\b",
+    re.IGNORECASE,
+)
+
+
+def looks_like_followup(question: str, max_words: int = 12) -> bool:
+    """
+    Short questions that start like a continuation or point back at the
+    previous answer. Long, self-contained questions start a new topic, and so
+    does anything without such a cue: a wrong "no" costs a full run, a wrong
+    "yes" edits unrelated SQL.
+    """
+    q = question or ""
+    if len(q.split()) > max_words:
+        return False
+    return bool(_FOLLOWUP_START.search(q) or _FOLLOWUP_REF.search(q))
+
+
+class SessionStore:
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_sec: float = SESSION_TTL_SEC, max_sessions: int = SESSION_MAX):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.max_sessions = max_sessions
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL;")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    turns INTEGER NOT NULL DEFAULT 1,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def load(self, session_id: str) -> Optional[AgentState]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT state FROM sessions WHERE id = ? AND expires_at >= ?", (session_id, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return AgentState.from_session(json.loads(row[0]))
+
+    def save(self, session_id: str, state: AgentState) -> None:
+        now = time.time()
+        data = json.dumps(state.to_session(), default=str)
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO sessions (id, state, updated_at, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET state = excluded.state, turns = turns + 1, "
+                "updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+                (session_id, data, now, now + self.ttl_sec),
+            )
+            db.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+            db.execute(
+                "DELETE FROM sessions WHERE id IN "
+                "(SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+
+    def delete(self, session_id: str) -> bool:
+        with self._connect() as db:
+            return db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = SessionStore()
+    return _store
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import copy
 import time
 import requests
 import streamlit as st
-from typing import Dict, Any, List
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, Optional, Tuple
 
 
 # -----------------------------
@@ -12,6 +14,14 @@ from typing import Dict, Any, List
 API_BASE = "http://127.0.0.1:8000"
 HEALTH_ENDPOINT = "/api/health"
 TEXT2SQL_ENDPOINT = "/api/text2sql"
+JOBS_ENDPOINT = "/api/jobs"
+RESULTS_ENDPOINT = "/api/results"
+RESULT_PAGE_SIZE = 200
+JOB_POLL_SEC = 1.0
+JOB_MAX_WAIT_SEC = 900  # slow local models: we poll instead of holding one HTTP call open
+HEALTH_TTL_SEC = 10
+ANSWER_CACHE_TTL_SEC = 600
+ANSWER_CACHE_MAX = 50
 
 
 # -----------------------------
@@ -134,12 +144,25 @@ header[data-testid="stHeader"] {
 )
 
 
+# -----------------------------
+# HTTP (pooled keep-alive session)
+# -----------------------------
+@st.cache_resource
+def http() -> requests.Session:
+    # shared by every rerun / browser session of this Streamlit server
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+
 # -----------------------------
 # HEALTH CHECK
 # -----------------------------
+@st.cache_data(ttl=HEALTH_TTL_SEC, show_spinner=False)
 def is_api_alive() -> bool:
+    # cached: every widget interaction reruns the script
     try:
-        r = requests.get(API_BASE + HEALTH_ENDPOINT, timeout=1)
+        r = http().get(API_BASE + HEALTH_ENDPOINT, timeout=1)
         return r.status_code == 200
     except Exception:
         return False
@@ -186,6 +209,8 @@ if "chats" not in st.session_state:
     st.session_state.chats = []
 if "active_chat" not in st.session_state:
     st.session_state.active_chat = None
+if "answer_cache" not in st.session_state:
+    st.session_state.answer_cache = {}
 
 
 def new_chat():
@@ -234,6 +259,170 @@ with st.sidebar:
     st.caption("Keep FastAPI running on 127.0.0.1:8000")
 
 
+# -----------------------------
+# ANSWERS (staged rendering)
+# -----------------------------
+def format_answer(job: Dict[str, Any]) -> str:
+    out = job.get("result") or {}
+    if job.get("status") == "failed":
+        return f"❌ Error: {job.get('error')}"
+    if job.get("status") != "done":
+        return f"⏳ Still running after {JOB_MAX_WAIT_SEC}s (job {job.get('job_id')})"
+    if out.get("ok"):
+        return (out.get("explanation") or {}).get("summary", "")
+    return f"❌ Error: {out.get('message')}"
+
+
+def answer_message(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Chat message for a finished job: SQL, preview rows, explanation, and the
+    server-side result handle when there are more rows than the preview.
+    """
+    msg = {"role": "assistant", "content": format_answer(job)}
+    out = job.get("result") or {}
+    if not (job.get("status") == "done" and out.get("ok")):
+        return msg
+
+    msg["sql"] = out.get("final_sql")
+    msg["chart_url"] = out.get("chart_url")
+    msg["rows"] = (job.get("stages", {}).get("sql_execution") or {}).get("rows")
+    if msg["rows"] is None:
+        msg["content"] += f"\n\n**Preview**\n{out.get('preview_markdown') or ''}"
+    if out.get("result_id") and out.get("next_cursor"):
+        msg["result"] = {
+            "result_id": out["result_id"],
+            "next_cursor": out["next_cursor"],
+            "row_count": out.get("row_count"),
+            "rows": [],
+        }
+    return msg
+
+
+def new_view() -> Dict[str, Any]:
+    # filled in stage order: SQL -> table -> explanation -> chart
+    return {"sql": st.empty(), "rows": st.empty(), "content": st.empty(), "chart": st.empty()}
+
+
+def show_stage(view: Dict[str, Any], stage: str, output: Dict[str, Any]) -> None:
+    if stage == "sql_validation" and output.get("final_sql"):
+        view["sql"].code(output["final_sql"], language="sql")
+    elif stage == "sql_execution" and output.get("rows") is not None:
+        view["rows"].dataframe(output["rows"], use_container_width=True, hide_index=True)
+    elif stage == "explanation":
+        view["content"].markdown((output.get("explanation") or {}).get("summary", ""))
+
+
+def show_message(view: Dict[str, Any], m: Dict[str, Any]) -> None:
+    if m.get("sql"):
+        view["sql"].code(m["sql"], language="sql")
+    if m.get("rows"):
+        view["rows"].dataframe(m["rows"], use_container_width=True, hide_index=True)
+    view["content"].markdown(m["content"])
+    if m.get("chart"):
+        view["chart"].vega_lite_chart(m["chart"], use_container_width=True)
+
+
+def load_chart(m: Dict[str, Any]) -> None:
+    """
+    Fetched after the answer is on screen; the API builds it in the background.
+    """
+    if not m.get("chart_url") or "chart" in m:
+        return
+    try:
+        r = http().get(API_BASE + m["chart_url"], timeout=30)
+        m["chart"] = r.json().get("spec") if r.status_code == 200 else None
+    except Exception:
+        m["chart"] = None
+
+
+def wait_for_job(job_id: str, status, view: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Poll the job; each stage is listed in the status box and rendered as soon
+    as it completes (SQL, then the table, then the explanation).
+    """
+    seen = set()
+    deadline = time.time() + JOB_MAX_WAIT_SEC
+    job: Dict[str, Any] = {"job_id": job_id}
+    while time.time() < deadline:
+        r = http().get(f"{API_BASE}{JOBS_ENDPOINT}/{job_id}", timeout=10)
+        if r.status_code == 404:
+            return {"job_id": job_id, "status": "failed", "error": "Job expired or unknown"}
+        job = r.json()
+        for stage, output in job.get("stages", {}).items():
+            if stage not in seen:
+                seen.add(stage)
+                status.write(f"✓ {stage.replace('_', ' ')}")
+                show_stage(view, stage, output)
+        if job.get("status") in ("done", "failed"):
+            break
+        time.sleep(JOB_POLL_SEC)
+    return job
+
+
+# -----------------------------
+# CLIENT ANSWER CACHE (per browser session)
+# -----------------------------
+def _norm(q: Optional[str]) -> str:
+    return " ".join((q or "").lower().split())
+
+
+def cache_key(chat: Dict[str, Any], question: str) -> Tuple[str, str]:
+    # follow-ups mean different things after different questions
+    users = [m["content"] for m in chat["messages"] if m["role"] == "user"]
+    previous = users[-2] if len(users) >= 2 else ""
+    return _norm(previous), _norm(question)
+
+
+def cached_answer(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    hit = st.session_state.answer_cache.get(key)
+    if hit is None or time.time() - hit[0] > ANSWER_CACHE_TTL_SEC:
+        return None
+    return copy.deepcopy(hit[1])
+
+
+def remember_answer(key: Tuple[str, str], msg: Dict[str, Any]) -> None:
+    if not msg.get("sql"):
+        return  # only successful answers
+    cache = st.session_state.answer_cache
+    cache[key] = (time.time(), copy.deepcopy(msg))
+    while len(cache) > ANSWER_CACHE_MAX:
+        cache.pop(min(cache, key=lambda k: cache[k][0]))
+
+
+# -----------------------------
+# MORE ROWS (server-side result pages)
+# -----------------------------
+def load_more_rows(result: Dict[str, Any]) -> None:
+    r = http().get(
+        f"{API_BASE}{RESULTS_ENDPOINT}/{result['result_id']}",
+        params={"cursor": result["next_cursor"], "page_size": RESULT_PAGE_SIZE},
+        timeout=30,
+    )
+    if r.status_code == 404:
+        result["next_cursor"] = None
+        result["expired"] = True
+        return
+    r.raise_for_status()
+    page = r.json()
+    result["rows"].extend(page["rows"])
+    result["next_cursor"] = page["next_cursor"]
+
+
+def render_more_rows(result: Dict[str, Any], key: str) -> None:
+    if result["rows"]:
+        st.dataframe(result["rows"], use_container_width=True, hide_index=True)
+    if result.get("expired"):
+        st.caption("Result expired on the server; ask again to see more rows.")
+    elif result["next_cursor"] and st.button(
+        f"Load more rows ({result['row_count']} total)", key=f"more-{key}"
+    ):
+        try:
+            load_more_rows(result)
+        except Exception as e:
+            st.error(f"❌ API error: {e}")
+        st.rerun()
+
+
 # -----------------------------
 # CHAT UI
 # -----------------------------
@@ -241,9 +430,30 @@ st.markdown('<div class="chat-container">', unsafe_allow_html=True)
 
 chat = get_chat()
 
-for m in chat["messages"]:
+for i, m in enumerate(chat["messages"]):
     with st.chat_message(m["role"]):
-        st.markdown(m["content"])
+        show_message(new_view(), m)
+        if m.get("result"):
+            render_more_rows(m["result"], f"{chat['id']}-{i}")
+
+# browser refresh while a job was running: session_state is gone, the job id is in the URL
+resume_job = st.query_params.get("job")
+if resume_job:
+    with st.chat_message("assistant"):
+        status = st.status("Resuming previous question…", expanded=False)
+        view = new_view()
+        try:
+            msg = answer_message(wait_for_job(resume_job, status, view))
+        except Exception as e:
+            msg = {"role": "assistant", "content": f"❌ API error: {e}"}
+        st.query_params.pop("job", None)
+        status.update(label="Done", state="complete")
+        show_message(view, msg)
+        load_chart(msg)
+        show_message(view, msg)
+        chat["messages"].append(msg)
+        if msg.get("result"):
+            render_more_rows(msg["result"], f"{chat['id']}-{len(chat['messages']) - 1}")
 
 prompt = st.chat_input("Ask a question… e.g. Top 5 airports by avg security wait time last 7 days")
 
@@ -255,29 +465,38 @@ if prompt:
     with st.chat_message("user"):
         st.markdown(prompt)
 
+    key = cache_key(chat, prompt)
     with st.chat_message("assistant"):
-        with st.spinner("Generating SQL and results…"):
+        msg = cached_answer(key)
+        if msg is not None:
+            view = new_view()
+            # the server's session didn't see this turn: don't let the next question edit older SQL
+            chat["server_synced"] = False
+        else:
+            status = st.status("Generating SQL and results…", expanded=False)
+            view = new_view()
             try:
-                r = requests.post(
-                    API_BASE + TEXT2SQL_ENDPOINT,
-                    json={"question": prompt},
-                    timeout=120,
-                )
-                out = r.json()
-
-                if out.get("ok"):
-                    answer = (
-                        f"{out['explanation']['summary']}\n\n"
-                        f"**SQL**\n```sql\n{out['final_sql']}\n```\n\n"
-                        f"**Preview**\n{out['preview_markdown']}"
-                    )
-                else:
-                    answer = f"❌ Error: {out.get('message')}"
-
+                # one server-side session per chat: follow-ups edit the previous SQL
+                payload = {"question": prompt, "session_id": chat["id"], "enable_viz": True}
+                if not chat.get("server_synced", True):
+                    payload["followup"] = False
+                r = http().post(API_BASE + JOBS_ENDPOINT, json=payload, timeout=10)
+                r.raise_for_status()
+                job_id = r.json()["job_id"]
+                st.query_params["job"] = job_id  # lets a browser refresh resume this job
+                msg = answer_message(wait_for_job(job_id, status, view))
+                chat["server_synced"] = True
+                remember_answer(key, msg)
             except Exception as e:
-                answer = f"❌ API error: {e}"
-
-        st.markdown(answer)
-        chat["messages"].append({"role": "assistant", "content": answer})
-
-st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+                msg = {"role": "assistant", "content": f"❌ API error: {e}"}
+            st.query_params.pop("job", None)
+            status.update(label="Done", state="complete")
+
+        show_message(view, msg)
+        load_chart(msg)
+        show_message(view, msg)
+        chat["messages"].append(msg)
+        if msg.get("result"):
+            render_more_rows(msg["result"], f"{chat['id']}-{len(chat['messages']) - 1}")
+
+st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,113 @@
+# scripts/bench_clustering.py
+"""
+Benchmark: "last 7 days at LHR" on synthetic "before" layouts (a hash
+shuffle, a time-major feed) vs (airport, ts)-clustered storage, plus the
+hive-partitioned Parquet export. The before layouts are re-sorted copies of
+the same table, not the output of any real load path.
+
+Reports row groups the zonemaps can't prune (scanned / total) and query latency.
+
+  python scripts/bench_clustering.py --airports 40 --days 90 --step-minutes 1
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import duckdb  # noqa: E402
+
+from app.db.clustering import CLUSTER_KEYS, attach_parquet_views, count_scanned_row_groups, export_parquet  # noqa: E402
+from app.fakedb.vectorized_gen import ScaleFactor, generate  # noqa: E402
+
+TABLE = "presecurity_events"
+
+QUERY = """
+SELECT date_trunc('hour', ts) AS hour, AVG(avg_wait_min) AS security_wait_min, SUM(pax_count) AS pax
+FROM {table}
+WHERE airport = 'LHR' AND ts >= TIMESTAMP '{ts_from}'
+GROUP BY 1
+ORDER BY 1
+"""
+
+
+def _time_query(conn: duckdb.DuckDBPyConnection, sql: str, repeat: int) -> float:
+    conn.execute(sql).fetchall()  # warm
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql).fetchall()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--airports", type=int, default=40)
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--step-minutes", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_clustering_")
+    db_path = os.path.join(tmp, "bench.duckdb")
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    ts_from = (end - timedelta(days=7)).replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S")
+
+    scale = ScaleFactor(airports=args.airports, days=args.days, step_minutes=args.step_minutes)
+    print(f"Generating {scale.airports} airports x {scale.days} days every {scale.step_minutes} min -> {db_path}")
+    generate(scale, db_path=db_path, end_utc=end, workers=args.workers)
+
+    conn = duckdb.connect(db_path)
+
+    # synthetic "before" layouts (re-sorted copies, not a measured load path):
+    # - shuffled: rows in hash order, the worst case for zonemaps
+    # - time-major: like a live feed appending all airports as events arrive
+    conn.execute(f"CREATE TABLE {TABLE}_feed AS SELECT * FROM {TABLE} ORDER BY ts, airport;")
+    conn.execute(f"CREATE TABLE {TABLE}_shuffled AS SELECT * FROM {TABLE} ORDER BY hash(ts, airport);")
+    CLUSTER_KEYS[f"{TABLE}_feed"] = CLUSTER_KEYS[TABLE]
+    CLUSTER_KEYS[f"{TABLE}_shuffled"] = CLUSTER_KEYS[TABLE]
+
+    n_rows = conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+    print(f"\n{TABLE}: {n_rows:,} rows, query = LHR since {ts_from}\n")
+    print(f"{'layout':<28}{'row groups scanned':>22}{'avg ms':>10}")
+
+    layouts = [
+        ("shuffled (synthetic)", f"{TABLE}_shuffled"),
+        ("time-major (synthetic)", f"{TABLE}_feed"),
+        ("clustered (airport, ts)", TABLE),
+    ]
+    for label, table in layouts:
+        scanned, total = count_scanned_row_groups(conn, table, "LHR", ts_from)
+        ms = _time_query(conn, QUERY.format(table=table, ts_from=ts_from), args.repeat)
+        print(f"{label:<28}{f'{scanned} / {total}':>22}{ms:>10.1f}")
+
+    # Parquet: partition pruning on day=/airport= directories, then row groups inside files
+    pq_dir = os.path.join(tmp, "parquet")
+    export_parquet(conn, pq_dir, tables=[TABLE])
+    conn.close()
+
+    files = glob.glob(os.path.join(pq_dir, TABLE, "**", "*.parquet"), recursive=True)
+    pconn = duckdb.connect()
+    attach_parquet_views(pconn, pq_dir)
+    day_from = ts_from[:10]
+    kept = [f for f in files if "airport=LHR" in f and f.split("day=")[1][:10] >= day_from]
+    rg_total = pconn.execute(
+        f"SELECT COUNT(DISTINCT (file_name, row_group_id)) FROM parquet_metadata('{os.path.join(pq_dir, TABLE, '**', '*.parquet')}')"
+    ).fetchone()[0]
+    rg_kept = pconn.execute(
+        "SELECT COUNT(DISTINCT (file_name, row_group_id)) FROM parquet_metadata(?)", [kept]
+    ).fetchone()[0] if kept else 0
+    ms = _time_query(pconn, QUERY.format(table=TABLE, ts_from=ts_from), args.repeat)
+    print(f"{'parquet (day, airport)':<28}{f'{rg_kept} / {rg_total}':>22}{ms:>10.1f}")
+    print(f"\n(parquet: {len(kept)} of {len(files)} files survive partition pruning)")
+    pconn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# scripts/bench_state_memory.py
+"""
+Benchmark: memory held by N concurrent in-flight requests, old vs new
+pipeline state.
+
+  legacy  executor .df() DataFrame; the result cache keeps an Arrow copy of it,
+          the result store / binary responses convert it again (from_pandas);
+          state is a pydantic model with the full debug dicts
+  arrow   one Arrow table (fetch_arrow_table), shared by the cache, the state,
+          the result store and the response; slots dataclasses, no debug dicts
+
+Each shape runs in its own process (peak RSS is per process); all N threads
+hold their state at a barrier before releasing it, like N requests in flight.
+
+  python scripts/bench_state_memory.py --rows 200000 --threads 16
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import duckdb  # noqa: E402
+import pyarrow as pa  # noqa: E402
+from pydantic import BaseModel, Field  # noqa: E402
+
+from app.agents.sql_executor import _decimals_to_double  # noqa: E402
+from app.state.agent_state import AgentState, Execution, Generation, Retrieval, Rewrite, Validation  # noqa: E402
+
+SQL = "SELECT * FROM results"
+
+# stand-ins for the LLM stage outputs carried in debug
+REWRITER = {"rewritten_query": "hourly security wait at LHR", "intent": "AGGREGATE", "entities": {"airport": "LHR"}}
+GENERATOR = {"sql": SQL, "confidence": 0.9, "reasoning": "x" * 2000}
+VALIDATOR = {"ok": True, "final_sql": SQL, "fixed_by_llm": False, "errors": [], "explain": "x" * 4000}
+SCHEMA_CONTEXT = "table: results\n" + "column: value DOUBLE -- measurement\n" * 200
+
+
+class LegacyState(BaseModel):
+    # the pre-dataclass AgentState
+    user_question: str
+    rewritten_query: str = ""
+    intent: str = "UNKNOWN"
+    entities: Dict[str, Any] = Field(default_factory=dict)
+    schema_context: str = ""
+    retrieved_tables: List[str] = Field(default_factory=list)
+    candidate_sql: Any = None
+    validation_ok: bool = False
+    final_sql: str = ""
+    fixed_by_llm: bool = False
+    dataframe: Optional[Dict[str, Any]] = None
+    result_df: Optional[Any] = None
+    explanation: Optional[Dict[str, Any]] = None
+    chart_path: Optional[str] = None
+    debug: Dict[str, Any] = Field(default_factory=dict)
+
+    model_config = {"arbitrary_types_allowed": True, "extra": "allow"}
+
+
+def _legacy(cur: duckdb.DuckDBPyConnection) -> Any:
+    df = cur.execute(SQL).df()
+    cached = pa.Table.from_pandas(df, preserve_index=False)
+    spilled = pa.Table.from_pandas(df, preserve_index=False)
+    exec_out = {"row_count": len(df), "columns": list(df.columns), "df": df, "preview_markdown": ""}
+    state = LegacyState(
+        user_question="q",
+        rewritten_query=REWRITER["rewritten_query"],
+        intent=REWRITER["intent"],
+        entities=REWRITER["entities"],
+        schema_context=SCHEMA_CONTEXT,
+        retrieved_tables=["results"],
+        candidate_sql=dict(GENERATOR),
+        validation_ok=True,
+        final_sql=SQL,
+        dataframe=exec_out,
+        result_df=df,
+        debug={"rewriter": dict(REWRITER), "validator": dict(VALIDATOR)},
+    )
+    return state, cached, spilled
+
+
+def _arrow(cur: duckdb.DuckDBPyConnection) -> Any:
+    table = _decimals_to_double(cur.execute(SQL).fetch_arrow_table())
+    state = AgentState(
+        user_question="q",
+        rewrite=Rewrite(REWRITER["rewritten_query"], REWRITER["intent"], REWRITER["entities"]),
+        retrieval=Retrieval(SCHEMA_CONTEXT, ["results"]),
+        generation=Generation(SQL, 0.9),
+        validation=Validation(True, SQL, False),
+    )
+    state.execution = Execution(table=table)
+    return state, table, table
+
+
+SHAPES = {"legacy": _legacy, "arrow": _arrow}
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+
+def run_shape(shape: str, rows: int, threads: int) -> Dict[str, Any]:
+    conn = duckdb.connect()
+    conn.execute(f"""
+        CREATE TABLE results AS
+        SELECT range AS id,
+               'airport_' || (range % 40) AS airport,
+               TIMESTAMP '2024-01-01' + to_seconds(range) AS ts,
+               random() AS wait_min,
+               CAST(range % 1000 AS DECIMAL(18, 2)) AS pax
+        FROM range({int(rows)})
+    """)
+    build = SHAPES[shape]
+    build(conn.cursor())  # warm: imports, allocator pools
+    base = _rss_mb()
+
+    barrier = threading.Barrier(threads + 1)
+    held: List[Any] = [None] * threads
+
+    def worker(i: int) -> None:
+        cur = conn.cursor()
+        held[i] = build(cur)
+        barrier.wait()  # everyone in flight
+        barrier.wait()  # released
+        held[i] = None
+        cur.close()
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    seconds = time.perf_counter() - t0
+    peak = _rss_mb()
+    barrier.wait()
+    for t in pool:
+        t.join()
+
+    # state construction alone (no result data), per request
+    n = 20000
+    t1 = time.perf_counter()
+    if shape == "legacy":
+        for _ in range(n):
+            LegacyState(user_question="q", entities=REWRITER["entities"], retrieved_tables=["results"], debug={})
+    else:
+        for _ in range(n):
+            AgentState(user_question="q", rewrite=Rewrite(entities=REWRITER["entities"]), retrieval=Retrieval("", ["results"]))
+    state_us = (time.perf_counter() - t1) / n * 1e6
+
+    return {
+        "shape": shape,
+        "rows": rows,
+        "threads": threads,
+        "peak_rss_delta_mb": round(peak - base, 1),
+        "per_request_mb": round((peak - base) / threads, 2),
+        "build_all_sec": round(seconds, 3),
+        "state_init_us": round(state_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--shape", choices=sorted(SHAPES), help=argparse.SUPPRESS)  # child process
+    args = parser.parse_args()
+
+    if args.shape:
+        print(json.dumps(run_shape(args.shape, args.rows, args.threads)))
+        return
+
+    results = []
+    for shape in ("legacy", "arrow"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--shape", shape, "--rows", str(args.rows), "--threads", str(args.threads)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{args.threads} concurrent requests x {args.rows} rows")
+    print(f"{'shape':<8} {'peak RSS +MB':>13} {'MB/request':>11} {'build s':>8} {'state init us':>14}")
+    for r in results:
+        print(
+            f"{r['shape']:<8} {r['peak_rss_delta_mb']:>13} {r['per_request_mb']:>11} "
+            f"{r['build_all_sec']:>8} {r['state_init_us']:>14}"
+        )
+    legacy, arrow = results
+    if arrow["peak_rss_delta_mb"] > 0:
+        print(f"\nmemory: {legacy['peak_rss_delta_mb'] / arrow['peak_rss_delta_mb']:.1f}x less with the Arrow state")
+
+
+if __name__ == "__main__":
+    main()
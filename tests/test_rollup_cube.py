@@ -0,0 +1,32 @@
+# tests/test_rollup_cube.py
+import importlib
+
+import duckdb
+
+from app.pipelines import rollup_cube
+
+silver = importlib.import_module("app.pipelines.01_create_silver_tables")
+
+
+def test_cube_builds_on_silver_schema():
+    conn = duckdb.connect()
+    silver.build_silver(conn, days=2, rows_per_hour=1)
+
+    metrics = rollup_cube.cube_metrics(conn)
+    assert "security_pax" not in metrics  # silver presecurity_events has no pax_count
+    assert "security_wait_min" in metrics
+
+    rollup_cube.build_cube(conn)
+    built = {m for (m,) in conn.execute(f"SELECT DISTINCT metric FROM {rollup_cube.CUBE_TABLE}").fetchall()}
+    assert built == set(metrics)
+    grains = {g for (g,) in conn.execute(f"SELECT DISTINCT grain FROM {rollup_cube.CUBE_TABLE}").fetchall()}
+    assert grains == {"hour", "day", "week"}
+
+    before = conn.execute(f"SELECT COUNT(*) FROM {rollup_cube.CUBE_TABLE}").fetchone()[0]
+    conn.execute("""
+        CREATE TEMP TABLE _affected_hours AS
+        SELECT DISTINCT airport, date_trunc('hour', ts) AS hour FROM presecurity_events LIMIT 3
+    """)
+    rollup_cube.refresh_cube(conn)
+    assert conn.execute(f"SELECT COUNT(*) FROM {rollup_cube.CUBE_TABLE}").fetchone()[0] == before
+    conn.close()
@@ -0,0 +1,34 @@
+# tests/test_sessions.py
+import pytest
+
+from app.state.sessions import looks_like_followup
+
+
+@pytest.mark.parametrize("question", [
+    "now only for LHR",
+    "what about CDG",
+    "same but weekly",
+    "and by airline?",
+    "break it down by hour",
+    "sort them by delay",
+    "exclude JFK",
+    "show me only the top 3 of those",
+    "do that again for last month",
+])
+def test_followups(question):
+    assert looks_like_followup(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Top 5 airports by avg security wait time last 7 days",
+    "Which airport had the most delays in this month?",
+    "In which airport is boarding delay highest?",
+    "For each airport, show average check-in wait",
+    "By hour, what is the average queue length at LHR?",
+    "Per airport, how many disruptions were there yesterday?",
+    "With the most lanes open, which airport has the shortest wait?",
+    "Is it true that security waits are longest at JFK?",
+    "Which airports had the longest security queues over the last thirty days overall",
+])
+def test_new_questions(question):
+    assert not looks_like_followup(question)
@@ -0,0 +1,32 @@
+# tests/test_vectorized_gen.py
+from datetime import datetime
+
+import duckdb
+
+from app.fakedb.build_fake_db import create_tables
+from app.fakedb.vectorized_gen import OPS_TABLES, ScaleFactor, load_ops, plan_blocks
+
+SCALE = ScaleFactor(airports=12, days=3, step_minutes=5)
+START = datetime(2024, 1, 1)
+
+
+def _load(workers: int):
+    conn = duckdb.connect()
+    create_tables(conn)
+    load_ops(conn, SCALE, START, seed=7, workers=workers, target_rows=20_000, progress=False)
+    return conn
+
+
+def test_block_plan_has_work_for_a_pool():
+    assert len(plan_blocks(SCALE, target_rows=2_000_000)) > 1
+
+
+def test_same_data_for_any_worker_count():
+    serial, parallel = _load(1), _load(3)
+    for t in OPS_TABLES:
+        a = serial.execute(f"SELECT * FROM {t} ORDER BY ALL").fetchall()
+        b = parallel.execute(f"SELECT * FROM {t} ORDER BY ALL").fetchall()
+        assert len(a) > 0
+        assert a == b, t
+    serial.close()
+    parallel.close()